@@ -0,0 +1,122 @@
+# core/activity.py
+#
+# Счётчики активности пользователя: User.total_questions (посты), total_answers
+# (комментарии) и post/comment/course_likes_cnt (лайки, полученные его постами,
+# комментариями и курсами). Меняются одним UPDATE ... SET cnt = cnt ± n в той же
+# транзакции, что и событие: создание/удаление постов, комментариев и курсов
+# (core/signals.py) и изменение счётчиков лайков (core/likes.py, core/like_buffer.py).
+# Расхождения исправляет команда reconcile_activity_counters.
+# UPDATE не вызывает сигналы, поэтому кэш профиля автора сбрасывается здесь же.
+
+from django.db.models import Count, F, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from . import profiles
+from .models import User, Post, Comment, Course
+
+# Модель -> поле счётчика «сколько создано»
+CONTENT_COUNTERS = {
+    Post: 'total_questions',
+    Comment: 'total_answers',
+}
+
+# Тип цели лайка -> (модель, поле счётчика лайков автора)
+LIKE_COUNTERS = {
+    'post': (Post, 'post_likes_cnt'),
+    'comment': (Comment, 'comment_likes_cnt'),
+    'course': (Course, 'course_likes_cnt'),
+}
+_LIKE_FIELDS = {model: field for model, field in LIKE_COUNTERS.values()}
+
+FIELDS = [*CONTENT_COUNTERS.values(), *_LIKE_FIELDS.values()]
+
+
+def _change(users, deltas):
+    if deltas:
+        users.update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def content_created(instance):
+    """Пост, комментарий или курс создан: +1 к счётчику автора и его лайки, если они уже есть."""
+    deltas = {_LIKE_FIELDS[type(instance)]: instance.likes_count} if instance.likes_count else {}
+    if type(instance) in CONTENT_COUNTERS:
+        deltas[CONTENT_COUNTERS[type(instance)]] = 1
+    _change(User.objects.filter(id=instance.user_id), deltas)
+    profiles.invalidate(instance.user_id)
+
+
+def content_deleted(instance):
+    """Пост, комментарий или курс удаляется (pre_delete): автор теряет его и полученные им лайки.
+
+    Лайки читаются подзапросом из ещё не удалённой строки — у переданного
+    экземпляра likes_count может быть устаревшим.
+    """
+    model = type(instance)
+    likes = Subquery(model.objects.filter(id=instance.id).values('likes_count')[:1])
+    updates = {_LIKE_FIELDS[model]: F(_LIKE_FIELDS[model]) - Coalesce(likes, 0)}
+    if model in CONTENT_COUNTERS:
+        updates[CONTENT_COUNTERS[model]] = F(CONTENT_COUNTERS[model]) - 1
+    User.objects.filter(id=instance.user_id).update(**updates)
+    profiles.invalidate(instance.user_id)
+
+
+def likes_changed(target_type, target_id, delta):
+    """Счётчик лайков цели изменился на delta: тот же UPDATE у её автора.
+
+    Автор читается отдельным запросом — его id нужен, чтобы сбросить кэш профиля.
+    """
+    if target_type not in LIKE_COUNTERS:
+        return
+    model, field = LIKE_COUNTERS[target_type]
+    author_id = model.objects.filter(id=target_id).values_list('user_id', flat=True).first()
+    if author_id is None:
+        return
+    _change(User.objects.filter(id=author_id), {field: delta})
+    profiles.invalidate(author_id)
+
+
+def expected_counters():
+    """Поле -> {user_id: значение} по исходным таблицам, по одному GROUP BY на поле."""
+    expected = {}
+    for model, field in CONTENT_COUNTERS.items():
+        expected[field] = dict(model.objects.order_by().values('user_id').annotate(total=Count('id')).values_list('user_id', 'total'))
+    for model, field in _LIKE_FIELDS.items():
+        expected[field] = dict(
+            model.objects.filter(likes_count__gt=0).order_by()
+            .values('user_id').annotate(total=Sum('likes_count')).values_list('user_id', 'total')
+        )
+    return expected
+
+
+def drift(expected=None):
+    """Пользователи с неверными счётчиками: {user_id: {поле: (сейчас, должно быть)}}."""
+    expected = expected_counters() if expected is None else expected
+    found = {}
+    for row in User.objects.order_by('id').values_list('id', *FIELDS).iterator(chunk_size=5000):
+        user_id, current = row[0], dict(zip(FIELDS, row[1:]))
+        wrong = {
+            field: (value, expected[field].get(user_id, 0))
+            for field, value in current.items()
+            if value != expected[field].get(user_id, 0)
+        }
+        if wrong:
+            found[user_id] = wrong
+    return found
+
+
+def reconcile(batch_size=1000):
+    """Исправляет расхождения. Возвращает то же, что drift(), — что было исправлено.
+
+    Пишутся только строки с расхождениями; bulk_update задаёт все поля счётчиков,
+    поэтому верные значения подставляются и для совпавших полей.
+    """
+    expected = expected_counters()
+    found = drift(expected)
+    users = []
+    for user_id in found:
+        user = User(id=user_id)
+        for field in FIELDS:
+            setattr(user, field, expected[field].get(user_id, 0))
+        users.append(user)
+    User.objects.bulk_update(users, FIELDS, batch_size=batch_size)
+    return found
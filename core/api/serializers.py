@@ -1,14 +1,52 @@
 from rest_framework import serializers
+from django.db.models.functions import Left
 from django.contrib.auth import get_user_model
+from core import chats, highlighting, like_buffer, likes
 from core.models import (
     User, Post, Comment, Course, Chat, 
     Message, Code, CodeComment, Bookmark, 
-    Report, Review, UserWarning, Admin
+    Report, ModerationItem, Review, UserWarning, Admin, AdminAction, Like
 )
 
 VALID_LANGUAGES = ['python', 'javascript', 'java', 'cpp', 'ruby']
 
-class UserSerializer(serializers.ModelSerializer):
+PREVIEW_LENGTH = 200
+
+class UpdateFieldsMixin:
+    """``update()`` сохраняет только переданные поля.
+
+    Счётчики строки (лайки, активность автора) меняются параллельными
+    F()-обновлениями, и полный ``save()`` прочитанного раньше экземпляра затёр бы
+    их. Текст кода присваивается через свойство модели, а в базу пишется ссылка на blob.
+    """
+    blob_text_fields = {}
+
+    def update(self, instance, validated_data):
+        fields = []
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+            fields.append(self.blob_text_fields.get(attr, attr))
+        instance.save(update_fields=fields)
+        return instance
+
+class EagerLoadingMixin:
+    """Сериализатор сам объявляет связи, которые он обходит.
+
+    Списки вызывают ``setup_eager_loading(queryset)``, и любая страница стоит
+    постоянного числа запросов вместо запроса на каждый вложенный объект.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+class UserSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
@@ -16,32 +54,190 @@ class UserSerializer(serializers.ModelSerializer):
             'role', 'total_questions', 'total_answers',
             'is_blocked', 'post_likes_cnt', 'comment_likes_cnt'
         ]
-        read_only_fields = ['id', 'is_blocked']
+        # Счётчики ведёт core/activity.py, по ним строятся рейтинг и лидерборд
+        read_only_fields = [
+            'id', 'is_blocked', 'total_questions', 'total_answers', 'post_likes_cnt', 'comment_likes_cnt'
+        ]
 
     def validate_email(self, value):
         if User.objects.filter(email=value).exists():
             raise serializers.ValidationError("Email already exists")
         return value
 
-class PostSerializer(serializers.ModelSerializer):
+class AuthorSerializer(serializers.ModelSerializer):
+    """Минимальный автор для лент."""
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'profile_img_url']
+        read_only_fields = fields
+
+def _split_param(value):
+    return {item.strip() for item in (value or '').split(',') if item.strip()}
+
+class SparseFieldsetMixin:
+    """Клиент выбирает поля ответа.
+
+    ``?fields=id,title`` — только перечисленные поля; ``?expand=content,code`` —
+    добавить к набору по умолчанию тяжёлые поля из ``Meta.expandable_fields``.
+    Колонки из ``Meta.deferred_columns``, которые не попали в ответ, не читаются
+    из базы вовсе, а ``preview`` считается в SQL по первым ``PREVIEW_LENGTH`` символам.
+    Если колонка — внешний ключ (например, code_blob), запрошенная связь
+    подтягивается тем же запросом через select_related.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        requested = self.get_requested_fields(request)
+        for name in list(self.fields):
+            if name not in requested:
+                self.fields.pop(name)
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        only = _split_param(request.query_params.get('fields'))
+        expand = _split_param(request.query_params.get('expand'))
+        if only:
+            return {name for name in cls.Meta.fields if name in only or name in expand}
+        return {name for name in cls.Meta.fields if name not in expandable or name in expand}
+
+    @classmethod
+    def setup_field_loading(cls, queryset, request):
+        requested = cls.get_requested_fields(request)
+        deferred = [column for name, column in cls.Meta.deferred_columns.items() if name not in requested]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        relations = [
+            column for name, column in cls.Meta.deferred_columns.items()
+            if name in requested and cls.Meta.model._meta.get_field(column).is_relation
+        ]
+        if relations:
+            queryset = queryset.select_related(*relations)
+        if 'preview' in requested:
+            # На символ больше, чтобы понять, был ли текст обрезан
+            queryset = queryset.annotate(preview_text=Left(cls.Meta.preview_source, PREVIEW_LENGTH + 1))
+        return queryset
+
+    def get_preview(self, obj):
+        text = getattr(obj, 'preview_text', None)
+        if text is None:
+            text = getattr(obj, self.Meta.preview_source)[:PREVIEW_LENGTH + 1]
+        if len(text) > PREVIEW_LENGTH:
+            return text[:PREVIEW_LENGTH] + '…'
+        return text
+
+class PendingLikesMixin:
+    """Добавляет к счётчику лайков ещё не записанные лайки из буфера."""
+    like_target_type = None
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        _, field = likes.LIKE_TARGETS[self.like_target_type]
+        if field in data:
+            data[field] = likes.get_likes_count(instance, self.like_target_type)
+        return data
+
+class ViewerFlagsListSerializer(serializers.ListSerializer):
+    """Считает флаги текущего пользователя для всей страницы одним запросом на флаг."""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        self.child.viewer_flags = self.child.load_viewer_flags(items)
+        return super().to_representation(items)
+
+class ViewerFlagsMixin:
+    """Поля ``is_liked``/``is_bookmarked`` относительно текущего пользователя.
+
+    В списках флаги загружаются ``ViewerFlagsListSerializer`` пачкой по id страницы,
+    для одного объекта — отдельным запросом. Во вложенных сериализаторах флаги не
+    считаются и равны None, чтобы не делать запрос на каждый родительский объект.
+    """
+    bookmarkable = False
+    viewer_flags = None
+
+    def get_viewer(self):
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        return user
+
+    def load_viewer_flags(self, items):
+        flags = {'liked': set(), 'bookmarked': set()}
+        user = self.get_viewer()
+        ids = [item.id for item in items]
+        if user is None or not ids:
+            return flags
+        flags['liked'] = set(Like.objects.filter(
+            user=user, target_type=self.like_target_type, target_id__in=ids
+        ).values_list('target_id', flat=True))
+        if self.bookmarkable:
+            flags['bookmarked'] = set(Bookmark.objects.filter(
+                user=user, post_id__in=ids
+            ).values_list('post_id', flat=True))
+        return flags
+
+    def get_viewer_flags(self, obj):
+        if self.viewer_flags is None:
+            is_root = self.parent is None or (
+                isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+            )
+            if not is_root:
+                return None
+            self.viewer_flags = self.load_viewer_flags([obj])
+        return self.viewer_flags
+
+    def get_is_liked(self, obj):
+        flags = self.get_viewer_flags(obj)
+        if flags is None:
+            return None
+        if obj.id in flags['liked']:
+            return True
+        user = self.get_viewer()
+        return user is not None and like_buffer.buffer.is_pending(user.id, self.like_target_type, obj.id)
+
+    def get_is_bookmarked(self, obj):
+        flags = self.get_viewer_flags(obj)
+        if flags is None:
+            return None
+        return obj.id in flags['bookmarked']
+
+class PostSerializer(ViewerFlagsMixin, PendingLikesMixin, EagerLoadingMixin, UpdateFieldsMixin, serializers.ModelSerializer):
+    like_target_type = 'post'
+    bookmarkable = True
+    select_related_fields = ('user', 'code_blob')
+    blob_text_fields = {'code': 'code_blob'}
     user = UserSerializer(read_only=True)
+    code = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+    is_liked = serializers.SerializerMethodField()
+    is_bookmarked = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = [
             'id', 'user', 'title', 'content', 
             'image_url', 'code', 'likes_count', 
-            'created_at', 'is_resolved'
+            'created_at', 'is_resolved', 'is_liked', 'is_bookmarked'
         ]
-        read_only_fields = ['id', 'user', 'created_at']
+        # Счётчик лайков меняет только core/likes.py атомарным F()-обновлением
+        read_only_fields = ['id', 'user', 'likes_count', 'created_at']
+        list_serializer_class = ViewerFlagsListSerializer
 
     def validate_title(self, value):
         if len(value) < 5:
             raise serializers.ValidationError("Title must be at least 5 characters long")
         return value
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(PendingLikesMixin, EagerLoadingMixin, UpdateFieldsMixin, serializers.ModelSerializer):
+    like_target_type = 'comment'
+    select_related_fields = ('user', 'code_blob')
+    blob_text_fields = {'code': 'code_blob'}
     user = UserSerializer(read_only=True)
+    code = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
 
     class Meta:
         model = Comment
@@ -50,30 +246,79 @@ class CommentSerializer(serializers.ModelSerializer):
             'code', 'image_url', 'likes_count', 
             'created_at'
         ]
-        read_only_fields = ['id', 'user', 'created_at']
+        read_only_fields = ['id', 'user', 'likes_count', 'created_at']
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(ViewerFlagsMixin, PendingLikesMixin, EagerLoadingMixin, UpdateFieldsMixin, serializers.ModelSerializer):
+    like_target_type = 'course'
+    select_related_fields = ('user', 'code_blob')
+    blob_text_fields = {'code': 'code_blob'}
     user = UserSerializer(read_only=True)
+    code = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+    is_liked = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
         fields = [
             'id', 'user', 'title', 'image_url', 
             'content', 'code', 'likes_count', 
-            'created_at'
+            'created_at', 'is_liked'
         ]
-        read_only_fields = ['id', 'user', 'created_at']
+        read_only_fields = ['id', 'user', 'likes_count', 'created_at']
+        list_serializer_class = ViewerFlagsListSerializer
 
-class ChatSerializer(serializers.ModelSerializer):
+class ChatSerializer(PendingLikesMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    like_target_type = 'chat'
+    select_related_fields = ('user1', 'user2')
     user1 = UserSerializer(read_only=True)
     user2 = UserSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Chat
-        fields = ['id', 'user1', 'user2', 'chat_likes_cnt', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'user1', 'user2', 'chat_likes_cnt', 'unread_count', 'created_at']
+        read_only_fields = ['id', 'chat_likes_cnt', 'created_at']
+
+    def get_unread_count(self, obj):
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return None
+        return chats.get_unread_count(obj, request.user)
 
-class MessageSerializer(serializers.ModelSerializer):
+class LastMessageSerializer(serializers.ModelSerializer):
+    preview = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Message
+        fields = ['id', 'sender', 'preview', 'is_code', 'is_read', 'created_at']
+        read_only_fields = fields
+
+    def get_preview(self, obj):
+        if len(obj.content) > PREVIEW_LENGTH:
+            return obj.content[:PREVIEW_LENGTH] + '…'
+        return obj.content
+
+class InboxChatSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """Строка списка диалогов: собеседник, последнее сообщение, непрочитанные."""
+    select_related_fields = ('user1', 'user2', 'last_message')
+    other_user = serializers.SerializerMethodField()
+    last_message = LastMessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Chat
+        fields = ['id', 'other_user', 'last_message', 'unread_count', 'chat_likes_cnt', 'last_activity_at']
+        read_only_fields = fields
+
+    def get_other_user(self, obj):
+        user = self.context['request'].user
+        other = obj.user2 if obj.user1_id == user.id else obj.user1
+        return AuthorSerializer(other).data
+
+    def get_unread_count(self, obj):
+        return chats.get_unread_count(obj, self.context['request'].user)
+
+class MessageSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('sender', 'receiver')
     sender = UserSerializer(read_only=True)
     receiver = UserSerializer(read_only=True)
 
@@ -84,26 +329,99 @@ class MessageSerializer(serializers.ModelSerializer):
             'content', 'image_url', 'is_read', 
             'is_code', 'created_at'
         ]
-        read_only_fields = ['id', 'sender', 'created_at']
+        # Прочтение — только через chats.mark_read, иначе разойдутся счётчики непрочитанных в Chat
+        read_only_fields = ['id', 'sender', 'is_read', 'created_at']
+
+class PostListSerializer(SparseFieldsetMixin, ViewerFlagsMixin, PendingLikesMixin,
+                         EagerLoadingMixin, serializers.ModelSerializer):
+    like_target_type = 'post'
+    bookmarkable = True
+    select_related_fields = ('user',)
+    user = AuthorSerializer(read_only=True)
+    preview = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
+    is_bookmarked = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = [
+            'id', 'user', 'title', 'preview', 'content', 'code',
+            'image_url', 'likes_count', 'created_at', 'is_resolved',
+            'is_liked', 'is_bookmarked'
+        ]
+        read_only_fields = fields
+        expandable_fields = ['content', 'code']
+        deferred_columns = {'content': 'content', 'code': 'code_blob'}
+        preview_source = 'content'
+        list_serializer_class = ViewerFlagsListSerializer
+
+class CourseListSerializer(SparseFieldsetMixin, ViewerFlagsMixin, PendingLikesMixin,
+                           EagerLoadingMixin, serializers.ModelSerializer):
+    like_target_type = 'course'
+    select_related_fields = ('user',)
+    user = AuthorSerializer(read_only=True)
+    preview = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
 
-class CodeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Course
+        fields = [
+            'id', 'user', 'title', 'image_url', 'preview', 'content',
+            'code', 'likes_count', 'created_at', 'is_liked'
+        ]
+        read_only_fields = fields
+        expandable_fields = ['content', 'code']
+        deferred_columns = {'content': 'content', 'code': 'code_blob'}
+        preview_source = 'content'
+        list_serializer_class = ViewerFlagsListSerializer
+
+class MessageListSerializer(SparseFieldsetMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('sender',)
+    sender = AuthorSerializer(read_only=True)
+    preview = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Message
+        fields = [
+            'id', 'chat', 'sender', 'receiver', 'preview', 'content',
+            'image_url', 'is_read', 'is_code', 'created_at'
+        ]
+        read_only_fields = fields
+        expandable_fields = ['content']
+        deferred_columns = {'content': 'content'}
+        preview_source = 'content'
+
+class CodeSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user', 'code_blob')
     user = UserSerializer(read_only=True)
+    code_content = serializers.CharField(trim_whitespace=False)
+    highlighted = serializers.SerializerMethodField()
 
     class Meta:
         model = Code
         fields = [
             'id', 'post', 'comment', 'user', 
-            'code_content', 'message', 'language', 
+            'code_content', 'highlighted', 'message', 'language', 
             'start_line', 'end_line', 'created_at'
         ]
         read_only_fields = ['id', 'user', 'created_at']
 
+    def get_highlighted(self, obj):
+        return highlighting.highlight_blob(obj.code_blob, obj.language)
+
     def validate_language(self, value):
         if value.lower() not in VALID_LANGUAGES:
             raise serializers.ValidationError("Unsupported programming language")
         return value.lower()
 
-class CodeCommentSerializer(serializers.ModelSerializer):
+    def validate_code_content(self, value):
+        # Пробелы не тримим, но фрагмент из одних пробелов не даёт blob'а (code_blobs.intern)
+        if not value.strip():
+            raise serializers.ValidationError("Code cannot be empty")
+        return value
+
+class CodeCommentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user',)
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -115,7 +433,31 @@ class CodeCommentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'created_at']
 
-class BookmarkSerializer(serializers.ModelSerializer):
+    def validate(self, attrs):
+        code = attrs.get('code', getattr(self.instance, 'code', None))
+        start = attrs.get('start_line', getattr(self.instance, 'start_line', None))
+        end = attrs.get('end_line', getattr(self.instance, 'end_line', None))
+        if start < 1 or end < start:
+            raise serializers.ValidationError("Line range must satisfy 1 <= start_line <= end_line")
+        if end > code.code_blob.line_count:
+            raise serializers.ValidationError("Line range is outside of the code snippet")
+        return attrs
+
+class CodeReviewSerializer(CodeSerializer):
+    """Фрагмент кода со всеми комментариями, сгруппированными по первой строке."""
+    comments_by_line = serializers.SerializerMethodField()
+
+    class Meta(CodeSerializer.Meta):
+        fields = CodeSerializer.Meta.fields + ['comments_by_line']
+
+    def get_comments_by_line(self, obj):
+        grouped = {}
+        for comment in obj.comments.all():
+            grouped.setdefault(str(comment.start_line), []).append(CodeCommentSerializer(comment).data)
+        return grouped
+
+class BookmarkSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user', 'post__user', 'post__code_blob')
     user = UserSerializer(read_only=True)
     post = PostSerializer(read_only=True)
 
@@ -124,7 +466,8 @@ class BookmarkSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'post']
         read_only_fields = ['id']
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('reporting_user', 'processed_by')
     reporting_user = UserSerializer(read_only=True)
     processed_by = UserSerializer(read_only=True)
 
@@ -134,11 +477,65 @@ class ReportSerializer(serializers.ModelSerializer):
             'id', 'reporting_user', 'reporting_target_type', 
             'reporting_target_id', 'report_description', 
             'created_at', 'status', 'processed_by', 
-            'resolved_at'
+            'resolved_at', 'item'
         ]
-        read_only_fields = ['id', 'created_at', 'status', 'processed_by', 'resolved_at']
+        read_only_fields = ['id', 'created_at', 'status', 'processed_by', 'resolved_at', 'item']
+
+class AdminActionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('admin__user',)
+    admin_username = serializers.CharField(source='admin.user.username', read_only=True)
 
-class ReviewSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AdminAction
+        fields = ['id', 'admin', 'admin_username', 'action_type', 'target_type', 'target_id', 'data', 'created_at']
+        read_only_fields = fields
+
+class AdminUserSerializer(serializers.ModelSerializer):
+    """Строка каталога пользователей в админке."""
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'email', 'role', 'is_active', 'is_blocked', 'active_warnings_cnt',
+            'muted_until', 'date_joined', 'total_questions', 'total_answers'
+        ]
+        read_only_fields = fields
+
+class ModerationReportSerializer(serializers.ModelSerializer):
+    """Жалоба внутри элемента очереди: автор — минимальный, цель уже есть у элемента."""
+    reporting_user = AuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Report
+        fields = ['id', 'reporting_user', 'report_description', 'created_at', 'status']
+        read_only_fields = fields
+
+class ModerationItemSerializer(serializers.ModelSerializer):
+    """Элемент очереди модерации без вложенных жалоб."""
+
+    class Meta:
+        model = ModerationItem
+        fields = [
+            'id', 'target_type', 'target_id', 'status', 'reports_count', 'popularity',
+            'priority', 'first_reported_at', 'last_reported_at', 'processed_by', 'resolved_at'
+        ]
+        read_only_fields = fields
+
+class ModerationItemDetailSerializer(ModerationItemSerializer):
+    """Элемент с последними жалобами; остальные — ``reports/?item=<id>``."""
+    RECENT_REPORTS = 20
+    recent_reports = serializers.SerializerMethodField()
+
+    class Meta(ModerationItemSerializer.Meta):
+        fields = ModerationItemSerializer.Meta.fields + ['recent_reports']
+        read_only_fields = fields
+
+    def get_recent_reports(self, obj):
+        reports = obj.reports.select_related('reporting_user').order_by('-created_at', '-id')[:self.RECENT_REPORTS]
+        return ModerationReportSerializer(reports, many=True).data
+
+class ReviewSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user', 'target_user')
     user = UserSerializer(read_only=True)
     target_user = UserSerializer(read_only=True)
         
@@ -147,7 +544,17 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'target_user', 'content', 'created_at']
         read_only_fields = ['id', 'user', 'created_at']
 
-class UserWarningSerializer(serializers.ModelSerializer):
+class ProfileReviewSerializer(serializers.ModelSerializer):
+    """Отзыв на странице профиля: получатель и так известен, автор — компактно."""
+    user = AuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ['id', 'user', 'content', 'created_at']
+        read_only_fields = fields
+
+class UserWarningSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('user', 'admin__user')
     user = UserSerializer(read_only=True)
     admin = serializers.SerializerMethodField()
 
@@ -11,8 +11,12 @@ router.register(r'chats', views.ChatViewSet, basename='chats')
 router.register(r'messages', views.MessageViewSet, basename='messages')
 router.register(r'reports', views.ReportViewSet, basename='reports')
 router.register(r'codes', views.CodeViewSet, basename='codes')
+router.register(r'code-comments', views.CodeCommentViewSet, basename='code-comments')
+router.register(r'admin/moderation', views.ModerationQueueViewSet, basename='moderation')
 
 urlpatterns = [
+    # До роутера, иначе messages/<pk>/ перехватит этот путь
+    path('messages/poll/', views.messages_poll, name='api-messages_poll'),
     path('', include(router.urls)),
     path('register/', views.register, name='api-register'),
     path('login/', views.login_view, name='api-login'),
@@ -24,13 +28,23 @@ urlpatterns = [
     path('bookmarks/add/<int:post_id>/', views.add_bookmark, name='api-add_bookmark'),
     path('bookmarks/remove/<int:post_id>/', views.remove_bookmark, name='api-remove_bookmark'),
     path('like/<str:target_type>/<int:target_id>/', views.add_like, name='api-add_like'),
+    path('like/<str:target_type>/<int:target_id>/remove/', views.remove_like, name='api-remove_like'),
     path('reviews/add/<int:user_id>/', views.add_review, name='api-add_review'),
     path('admin/reports/', views.admin_report_list, name='api-admin_report_list'),
     path('admin/reports/<int:report_id>/process/', views.process_report, name='api-process_report'),
+    path('admin/reports/bulk-process/', views.bulk_process_reports, name='api-bulk_process_reports'),
     path('admin/warnings/create/<int:user_id>/', views.create_warning, name='api-create_warning'),
+    path('admin/warnings/bulk-create/', views.bulk_create_warnings, name='api-bulk_create_warnings'),
+    path('admin/users/bulk-block/', views.bulk_block_users, name='api-bulk_block_users'),
+    path('admin/users/bulk-ban/', views.bulk_ban_users, name='api-bulk_ban_users'),
     path('admin/users/<int:user_id>/block/', views.block_user, name='api-block_user'),
     path('admin/users/<int:user_id>/ban/', views.ban_user, name='api-ban_user'),
     path('admin/users/', views.admin_user_list, name='api-admin_user_list'),
+    path('admin/users/export/', views.admin_user_export, name='api-admin_user_export'),
+    path('admin/audit/', views.audit_log, name='api-audit_log'),
+    path('admin/audit/export/', views.audit_log_export, name='api-audit_log_export'),
     path('messages/unread/count/', views.unread_messages_count, name='api-unread_messages_count'),
+    path('leaderboard/', views.leaderboard_top, name='api-leaderboard'),
+    path('leaderboard/me/', views.leaderboard_me, name='api-leaderboard_me'),
     path('rate-for-help/<int:user_id>/', views.rate_for_help, name='api-rate-for-help'),  # Убедись, что этот путь есть
 ]
\ No newline at end of file
@@ -1,29 +1,56 @@
+from datetime import datetime
+
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate, login, logout
-from django.db.models import Q
+from django.db.models import F, Prefetch, Q
 from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, AuthenticationFailed, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from core import audit, chats, directory, leaderboard, likes, longpoll, moderation, profiles, ratings, sanctions, search
 from core.models import (
     User, Post, Comment, Course, Chat, 
     Message, Code, CodeComment, Bookmark, 
-    Report, Review, UserWarning, Like, Admin, AdminAction, ProfileView
+    Report, ModerationItem, Review, UserWarning, Like, Admin, AdminAction, ProfileView, Rating
 )
 from .serializers import (
     UserSerializer, PostSerializer, CommentSerializer, 
     CourseSerializer, ChatSerializer, MessageSerializer, 
     CodeSerializer, CodeCommentSerializer, BookmarkSerializer, 
-    ReportSerializer, ReviewSerializer, UserWarningSerializer
+    ReportSerializer, ReviewSerializer, UserWarningSerializer, CodeReviewSerializer,
+    PostListSerializer, CourseListSerializer, MessageListSerializer,
+    InboxChatSerializer, ProfileReviewSerializer, AuthorSerializer,
+    ModerationItemSerializer, ModerationItemDetailSerializer, AdminActionSerializer, AdminUserSerializer
 )
+from .pagination import FeedPagination, KeysetPagination
+
+class EagerLoadingViewMixin:
+    """Подгружает связи, объявленные сериализатором, для list и retrieve."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        queryset = serializer_class.setup_eager_loading(queryset)
+        if hasattr(serializer_class, 'setup_field_loading'):
+            queryset = serializer_class.setup_field_loading(queryset, self.request)
+        return queryset
 
-class CustomPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+class ListSerializerMixin:
+    """Для action list отдаёт облегчённый сериализатор ``list_serializer_class``."""
+    list_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.list_serializer_class is not None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
@@ -37,7 +64,7 @@ def register(request):
             return Response({'error': 'Используйте почту @urfu.me'}, status=status.HTTP_400_BAD_REQUEST)
         user = serializer.save()
         user.set_password(request.data.get('password'))
-        user.save()
+        user.save(update_fields=['password'])
         # Указываем бэкенд аутентификации при вызове login
         login(request, user, backend='core.backends.EmailBackend')
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -63,10 +90,11 @@ def logout_view(request):
     logout(request)
     return Response({'message': 'Successfully logged out'})
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ListSerializerMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
-    pagination_class = CustomPagination
+    list_serializer_class = PostListSerializer
+    pagination_class = FeedPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def perform_create(self, serializer):
@@ -78,19 +106,20 @@ class PostViewSet(viewsets.ModelViewSet):
         resolved = self.request.query_params.get('resolved', None)
         sort_by = self.request.query_params.get('sort', None)
 
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) | 
-                Q(content__icontains=search_query)
-            )
-        
         if resolved is not None:
             queryset = queryset.filter(is_resolved=(resolved.lower() == 'true'))
-        
+
+        if search_query:
+            queryset = search.search_posts(search_query, queryset)
+            # Без явной сортировки результаты поиска идут по релевантности
+            if sort_by is None:
+                return queryset
+
+        # id замыкает ключ сортировки, чтобы работала курсорная пагинация
         if sort_by == 'likes':
-            queryset = queryset.order_by('-likes_count')
+            queryset = queryset.order_by('-likes_count', '-id')
         else:
-            queryset = queryset.order_by('-created_at')
+            queryset = queryset.order_by('-created_at', '-id')
         
         return queryset
 
@@ -103,13 +132,14 @@ def mark_post_resolved(request, post_id):
                         status=status.HTTP_403_FORBIDDEN)
     
     post.is_resolved = True
-    post.save()
+    post.save(update_fields=['is_resolved'])
     return Response(PostSerializer(post).data)
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ListSerializerMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
-    pagination_class = CustomPagination
+    list_serializer_class = CourseListSerializer
+    pagination_class = FeedPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def perform_create(self, serializer):
@@ -120,22 +150,20 @@ class CourseViewSet(viewsets.ModelViewSet):
         search_query = self.request.query_params.get('search', None)
 
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) | 
-                Q(content__icontains=search_query)
-            )
+            return search.search_courses(search_query, queryset)
         
-        return queryset.order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
 
-class ChatViewSet(viewsets.ModelViewSet):
+class ChatViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Chat.objects.all()
     serializer_class = ChatSerializer
+    pagination_class = FeedPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return Chat.objects.filter(
             Q(user1=self.request.user) | Q(user2=self.request.user)
-        )
+        ).order_by('-created_at', '-id')
 
     def create(self, request):
         user2_id = request.data.get('user2')
@@ -144,52 +172,116 @@ class ChatViewSet(viewsets.ModelViewSet):
         if request.user.is_blocked or user2.is_blocked:
             return Response({'error': 'Blocked users cannot create chats'}, 
                            status=status.HTTP_403_FORBIDDEN)
+        if sanctions.is_muted(request.user):
+            return Response({'error': 'Muted users cannot create chats'},
+                           status=status.HTTP_403_FORBIDDEN)
         
-        existing_chat = Chat.objects.filter(
-            (Q(user1=request.user, user2=user2) | 
-             Q(user1=user2, user2=request.user))
-        ).first()
-        
-        if existing_chat:
-            serializer = self.get_serializer(existing_chat)
-            return Response(serializer.data)
-        
-        chat = Chat.objects.create(user1=request.user, user2=user2)
+        if user2 == request.user:
+            return Response({'error': 'Cannot start a chat with yourself'},
+                           status=status.HTTP_400_BAD_REQUEST)
+
+        chat, created = chats.get_or_create_chat(request.user, user2)
         serializer = self.get_serializer(chat)
+        if not created:
+            return Response(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class MessageViewSet(viewsets.ModelViewSet):
+    @action(detail=False, serializer_class=InboxChatSerializer)
+    def inbox(self, request):
+        page = self.paginate_queryset(chats.inbox(request.user))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        chat = self.get_object()
+        up_to = request.data.get('up_to')
+        if up_to is not None:
+            try:
+                up_to = int(up_to)
+            except (TypeError, ValueError):
+                return Response({'error': 'up_to must be a message id'}, status=status.HTTP_400_BAD_REQUEST)
+        marked = chats.mark_read(chat, request.user, up_to)
+        chat.refresh_from_db(fields=['user1_unread_cnt', 'user2_unread_cnt'])
+        return Response({'marked': marked, 'unread_count': chats.get_unread_count(chat, request.user)})
+
+class MessageViewSet(ListSerializerMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
+    list_serializer_class = MessageListSerializer
+    pagination_class = FeedPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         chat_id = self.request.query_params.get('chat', None)
         if chat_id:
-            return Message.objects.filter(chat_id=chat_id).order_by('created_at')
+            return Message.objects.filter(chat_id=chat_id).order_by('created_at', 'id')
         return Message.objects.none()
 
     def perform_create(self, serializer):
         chat_id = self.request.data.get('chat')
         chat = get_object_or_404(Chat, id=chat_id)
         
-        if chat.user1 != self.request.user and chat.user2 != self.request.user:
+        if not chats.is_participant(chat, self.request.user):
             raise PermissionDenied()
+        if not sanctions.can_write(self.request.user):
+            raise PermissionDenied('You cannot send messages')
         
-        receiver = chat.user1 if chat.user2 == self.request.user else chat.user2
-        
-        serializer.save(
-            sender=self.request.user, 
-            receiver=receiver,
-            chat=chat
-        )
+        fields = {key: value for key, value in serializer.validated_data.items() if key != 'chat'}
+        serializer.instance = chats.send_message(chat, self.request.user, **fields)
+
+def _poll_context(request):
+    # Async-представление живёт вне DRF, поэтому аутентифицируем теми же классами вручную
+    drf_request = Request(request, authenticators=[cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except AuthenticationFailed:
+        return None, None
+    if not user.is_authenticated:
+        return None, None
+    chat = Chat.objects.filter(id=request.GET.get('chat')).first() if request.GET.get('chat', '').isdigit() else None
+    return user, chat
+
+async def messages_poll(request):
+    """Long-poll: GET ?chat=<id>&after_id=<id>[&timeout=<сек>] — только новые сообщения.
+
+    Держит запрос, пока в чате не появится сообщение с id > after_id или не истечёт timeout.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': 'Method not allowed'}, status=405)
+    user, chat = await sync_to_async(_poll_context)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if chat is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    if not chats.is_participant(chat, user):
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+    try:
+        after_id = int(request.GET.get('after_id', 0))
+        timeout = float(request.GET.get('timeout', settings.LONGPOLL_TIMEOUT))
+    except ValueError:
+        return JsonResponse({'detail': 'after_id and timeout must be numbers'}, status=400)
+    timeout = min(max(timeout, 0), settings.LONGPOLL_TIMEOUT)
+
+    messages = await longpoll.wait_for_messages(chat, after_id, timeout)
+    data = await sync_to_async(lambda: MessageListSerializer(messages, many=True).data)()
+    return JsonResponse({
+        'results': data,
+        'last_id': messages[-1].id if messages else after_id,
+    })
 
 @api_view(['GET'])
 def unread_messages_count(request):
-    count = Message.objects.filter(receiver=request.user, is_read=False).count()
-    return Response({'unread_count': count})
+    return Response({'unread_count': chats.total_unread(request.user)})
+
+def _visible_code(user, prefix=''):
+    """Условие на Code: фрагменты постов и комментариев, свои и из чатов, где пользователь участник."""
+    return (
+        Q(**{f'{prefix}message__isnull': True}) | Q(**{f'{prefix}user': user})
+        | Q(**{f'{prefix}message__chat__user1': user}) | Q(**{f'{prefix}message__chat__user2': user})
+    )
 
-class CodeViewSet(viewsets.ModelViewSet):
+class CodeViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Code.objects.all()
     serializer_class = CodeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -197,15 +289,71 @@ class CodeViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         post_id = self.request.query_params.get('post', None)
         message_id = self.request.query_params.get('message', None)
+        visible = Code.objects.filter(_visible_code(self.request.user))
         if post_id:
-            return Code.objects.filter(post_id=post_id)
+            return visible.filter(post_id=post_id).order_by('id')
         if message_id:
-            return Code.objects.filter(message_id=message_id)
-        return Code.objects.filter(user=self.request.user)
+            return visible.filter(message_id=message_id).order_by('id')
+        return Code.objects.filter(user=self.request.user).order_by('-id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=True)
+    def review(self, request, pk=None):
+        """Фрагмент и все комментарии к нему за один запрос — для экрана ревью."""
+        comments = CodeCommentSerializer.setup_eager_loading(CodeComment.objects.order_by('start_line', 'end_line', 'id'))
+        queryset = CodeSerializer.setup_eager_loading(Code.objects.filter(_visible_code(request.user))).prefetch_related(
+            Prefetch('comments', queryset=comments)
+        )
+        code = get_object_or_404(queryset, pk=pk)
+        return Response(CodeReviewSerializer(code).data)
+
+class CodeCommentViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet):
+    """Комментарии к строкам кода; список — только для ?code=<id>."""
+    queryset = CodeComment.objects.all()
+    serializer_class = CodeCommentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = CodeComment.objects.filter(_visible_code(self.request.user, 'code__')).order_by(
+            'start_line', 'end_line', 'id'
+        )
+        if self.action not in ('list', 'overlapping'):
+            return queryset
+        code_id = self.request.query_params.get('code', None)
+        if not code_id:
+            return CodeComment.objects.none()
+        return queryset.filter(code_id=code_id)
+
+    def perform_create(self, serializer):
+        code = serializer.validated_data['code']
+        if not Code.objects.filter(_visible_code(self.request.user), id=code.id).exists():
+            raise PermissionDenied()
+        serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        if serializer.instance.user != self.request.user:
+            raise PermissionDenied()
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if instance.user != self.request.user:
+            raise PermissionDenied()
+        instance.delete()
+
+    @action(detail=False)
+    def overlapping(self, request):
+        """Комментарии, задевающие строки ?start=..&end=.. фрагмента ?code=."""
+        try:
+            start = int(request.query_params['start'])
+            end = int(request.query_params['end'])
+        except (KeyError, ValueError):
+            return Response({'error': 'start and end must be line numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset()).filter(start_line__lte=end, end_line__gte=start)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
 @api_view(['POST'])
 def add_bookmark(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -223,45 +371,28 @@ def remove_bookmark(request, post_id):
 
 @api_view(['GET'])
 def bookmark_list(request):
-    bookmarks = Bookmark.objects.filter(user=request.user)
+    bookmarks = BookmarkSerializer.setup_eager_loading(Bookmark.objects.filter(user=request.user))
     serializer = BookmarkSerializer(bookmarks, many=True)
     return Response(serializer.data)
 
 @api_view(['POST'])
 def add_like(request, target_type, target_id):
-    valid_types = ['post', 'comment', 'course', 'chat']
-    if target_type not in valid_types:
+    if not likes.is_valid_target(target_type):
         return Response({'error': 'Invalid target type'}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        like, created = Like.objects.get_or_create(
-            user=request.user,
-            target_type=target_type,
-            target_id=target_id
-        )
+    created = likes.add_like(request.user, target_type, target_id)
+    return Response(status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+@api_view(['DELETE'])
+def remove_like(request, target_type, target_id):
+    if not likes.is_valid_target(target_type):
+        return Response({'error': 'Invalid target type'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not likes.remove_like(request.user, target_type, target_id):
+        return Response({'error': 'Like not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if created:
-            if target_type == 'post':
-                post = get_object_or_404(Post, id=target_id)
-                post.likes_count += 1
-                post.save()
-            elif target_type == 'comment':
-                comment = get_object_or_404(Comment, id=target_id)
-                comment.likes_count += 1
-                comment.save()
-            elif target_type == 'course':
-                course = get_object_or_404(Course, id=target_id)
-                course.likes_count += 1
-                course.save()
-            elif target_type == 'chat':
-                chat = get_object_or_404(Chat, id=target_id)
-                chat.chat_likes_cnt += 1
-                chat.save()
-        return Response(status=status.HTTP_201_CREATED)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
-class ReportViewSet(viewsets.ModelViewSet):
+class ReportViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Report.objects.all()
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -271,8 +402,45 @@ class ReportViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
-            return Report.objects.filter(status='pending')
-        return Report.objects.filter(reporting_user=self.request.user)
+            item = self.request.query_params.get('item', '')
+            if item.isdigit():
+                # Все жалобы одного элемента очереди модерации
+                return Report.objects.filter(item_id=item).order_by('-created_at', '-id')
+            return Report.objects.filter(status='pending').order_by('created_at', 'id')
+        return Report.objects.filter(reporting_user=self.request.user).order_by('-created_at', '-id')
+
+class ModerationQueueViewSet(viewsets.ReadOnlyModelViewSet):
+    """Очередь модерации: жалобы, слитые по цели, по убыванию приоритета (core/moderation.py)."""
+    serializer_class = ModerationItemSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.role != 'admin':
+            raise PermissionDenied('Access denied')
+
+    def get_queryset(self):
+        if self.action == 'list':
+            return moderation.queue()
+        return ModerationItem.objects.all()
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ModerationItemDetailSerializer
+        return ModerationItemSerializer
+
+    @action(detail=True, methods=['post'])
+    def process(self, request, pk=None):
+        """Принять или отклонить все жалобы элемента: ``{"action": "accept" | "reject"}``."""
+        item = self.get_object()
+        decision = request.data.get('action')
+        if decision not in ('accept', 'reject'):
+            return Response({'error': 'action must be accept or reject'}, status=status.HTTP_400_BAD_REQUEST)
+        if item.status != 'pending':
+            return Response({'error': 'Item already processed'}, status=status.HTTP_409_CONFLICT)
+        closed = moderation.process(item, request.user, decision == 'accept')
+        return Response({**ModerationItemSerializer(item).data, 'reports_closed': closed})
 
 @api_view(['POST'])
 def add_review(request, user_id):
@@ -289,22 +457,29 @@ def add_review(request, user_id):
 
 @api_view(['GET'])
 def profile_view(request, user_id):
-    user = get_object_or_404(User, id=user_id)
+    profile = profiles.get_profile(user_id)
+    if profile is None:
+        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    user = profile['user']
     
     if user.is_blocked and request.user != user:
         return Response({'error': 'Profile is blocked'}, status=status.HTTP_403_FORBIDDEN)
-    
-    posts = Post.objects.filter(user=user)
-    courses = Course.objects.filter(user=user)
-    reviews = Review.objects.filter(target_user=user)
-    profile_view = get_object_or_404(ProfileView, user=user)
+
+    try:
+        page = max(int(request.query_params.get('reviews_page', 1)), 1)
+    except ValueError:
+        return Response({'error': 'reviews_page must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    reviews = profile['reviews'] if page == 1 else profiles.reviews_page(user.id, page)
+    has_next = page * profiles.REVIEWS_PAGE_SIZE < user.reviews_count
 
     profile_data = {
         'user': UserSerializer(user).data,
-        'posts_count': posts.count(),
-        'courses_count': courses.count(),
-        'reviews': ReviewSerializer(reviews, many=True).data,
-        'rating': profile_view.rating
+        'posts_count': user.posts_count,
+        'courses_count': user.courses_count,
+        'reviews_count': user.reviews_count,
+        'reviews': ProfileReviewSerializer(reviews, many=True).data,
+        'reviews_next_page': page + 1 if has_next else None,
+        'rating': profiles.rating_of(user),
     }
 
     return Response(profile_data)
@@ -324,7 +499,7 @@ def admin_report_list(request):
     if request.user.role != 'admin':
         return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    reports = Report.objects.filter(status='pending')
+    reports = ReportSerializer.setup_eager_loading(Report.objects.filter(status='pending').order_by('created_at', 'id'))
     serializer = ReportSerializer(reports, many=True)
     return Response(serializer.data)
 
@@ -339,18 +514,66 @@ def process_report(request, report_id):
     report.status = 'resolved' if action == 'accept' else 'rejected'
     report.processed_by = request.user
     report.resolved_at = timezone.now()
-    report.save()
+    report.save(update_fields=['status', 'processed_by', 'resolved_at'])
+    moderation.report_processed(report)
     
-    admin = Admin.objects.filter(user=request.user).first()
-    if admin:
-        AdminAction.objects.create(
-            admin=admin,
-            action_type='report_processed',
-            target_id=report.id,
-            details=f"Report {report.id} {report.status} by {request.user.username}"
-        )
+    audit.log(request.user, 'report_processed', 'report', [report.id], {'status': report.status})
     return Response(ReportSerializer(report).data)
 
+def _bulk_ids(request):
+    """Список id из тела массового запроса или Response с ошибкой."""
+    ids = request.data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return None, Response({'error': 'ids must be a non-empty list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > moderation.MAX_BULK_SIZE:
+        return None, Response({'error': f'At most {moderation.MAX_BULK_SIZE} ids per request'},
+                              status=status.HTTP_400_BAD_REQUEST)
+    return list(dict.fromkeys(ids)), None
+
+@api_view(['POST'])
+def bulk_process_reports(request):
+    if request.user.role != 'admin':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    ids, error = _bulk_ids(request)
+    if error:
+        return error
+    decision = request.data.get('action')
+    if decision not in ('accept', 'reject'):
+        return Response({'error': 'action must be accept or reject'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': moderation.bulk_process_reports(ids, request.user, decision == 'accept')})
+
+@api_view(['POST'])
+def bulk_create_warnings(request):
+    if request.user.role != 'admin':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    ids, error = _bulk_ids(request)
+    if error:
+        return error
+    admin = get_object_or_404(Admin, user=request.user)
+    return Response({'results': moderation.bulk_warn(ids, admin, request.data.get('reason', ''))})
+
+@api_view(['POST'])
+def bulk_block_users(request):
+    if request.user.role != 'admin':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    ids, error = _bulk_ids(request)
+    if error:
+        return error
+    return Response({'results': moderation.bulk_block(ids, request.user)})
+
+@api_view(['POST'])
+def bulk_ban_users(request):
+    if request.user.role != 'admin':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    ids, error = _bulk_ids(request)
+    if error:
+        return error
+    return Response({'results': moderation.bulk_ban(ids, request.user)})
+
 @api_view(['POST'])
 def create_warning(request, user_id):
     if request.user.role != 'admin':
@@ -366,12 +589,7 @@ def create_warning(request, user_id):
         is_accepted=True
     )
     
-    AdminAction.objects.create(
-        admin=admin,
-        action_type='warning_created',
-        target_id=user.id,
-        details=f"Warning issued to {user.username} by {request.user.username}"
-    )
+    audit.log(admin, 'warning_created', 'user', [user.id], {'warning_id': warning.id})
     return Response(UserWarningSerializer(warning).data, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
@@ -380,19 +598,10 @@ def block_user(request, user_id):
         return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
     user = get_object_or_404(User, id=user_id)
-    warnings_count = UserWarning.objects.filter(user=user, is_accepted=True).count()
-    
-    if warnings_count >= 3:
+    if user.active_warnings_cnt >= moderation.WARNINGS_TO_BLOCK:
         user.is_blocked = True
-        user.save()
-        admin = Admin.objects.filter(user=request.user).first()
-        if admin:
-            AdminAction.objects.create(
-                admin=admin,
-                action_type='user_blocked',
-                target_id=user.id,
-                details=f"User {user.username} blocked by {request.user.username}"
-            )
+        user.save(update_fields=['is_blocked'])
+        audit.log(request.user, 'user_blocked', 'user', [user.id])
         return Response({'message': 'User blocked'})
     
     return Response({'error': 'Not enough warnings to block'}, status=status.HTTP_400_BAD_REQUEST)
@@ -404,26 +613,111 @@ def ban_user(request, user_id):
     
     user = get_object_or_404(User, id=user_id)
     user.is_active = False
-    user.save()
+    user.save(update_fields=['is_active'])
     
-    admin = Admin.objects.filter(user=request.user).first()
-    if admin:
-        AdminAction.objects.create(
-            admin=admin,
-            action_type='user_banned',
-            target_id=user.id,
-            details=f"User {user.username} banned by {request.user.username}"
-        )
+    audit.log(request.user, 'user_banned', 'user', [user.id])
     return Response({'message': 'User banned'})
 
+def _moment_param(params, name):
+    """Дата или дата-время из query-параметра; дата означает начало дня."""
+    value = params.get(name)
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: 'Expected ISO date or datetime'})
+        moment = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+def _audit_filters(request):
+    """Фильтры журнала из query-параметров: admin, action_type, since, until (дата или дата-время)."""
+    params = request.query_params
+    filters = {'action_type': params.get('action_type') or None}
+    admin = params.get('admin')
+    if admin:
+        if not admin.isdigit():
+            raise ValidationError({'admin': 'Must be an admin id'})
+        filters['admin_id'] = int(admin)
+    for name in ('since', 'until'):
+        filters[name] = _moment_param(params, name)
+    return filters
+
+@api_view(['GET'])
+def audit_log(request):
+    if request.user.role != 'admin':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    actions = AdminActionSerializer.setup_eager_loading(audit.history(**_audit_filters(request)))
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(actions, request)
+    return paginator.get_paginated_response(AdminActionSerializer(page, many=True).data)
+
+@api_view(['GET'])
+def audit_log_export(request):
+    """Вся история журнала (с теми же фильтрами) потоком JSON Lines."""
+    if request.user.role != 'admin':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    response = StreamingHttpResponse(
+        audit.export_lines(audit.history(**_audit_filters(request))), content_type='application/x-ndjson'
+    )
+    response['Content-Disposition'] = 'attachment; filename="audit-log.jsonl"'
+    return response
+
+def _bool_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ValidationError({name: 'Expected true or false'})
+
+def _user_filters(request):
+    """Фильтры каталога пользователей: role, blocked, banned, min_warnings, max_warnings,
+    joined_after, joined_before (дата или дата-время) и q — префикс username или email."""
+    params = request.query_params
+    filters = {
+        'role': params.get('role') or None,
+        'search': params.get('q') or None,
+        'blocked': _bool_param(params, 'blocked'),
+        'banned': _bool_param(params, 'banned'),
+        'joined_after': _moment_param(params, 'joined_after'),
+        'joined_before': _moment_param(params, 'joined_before'),
+    }
+    for name in ('min_warnings', 'max_warnings'):
+        value = params.get(name)
+        if value:
+            if not value.isdigit():
+                raise ValidationError({name: 'Must be a non-negative integer'})
+            filters[name] = int(value)
+    return filters
+
 @api_view(['GET'])
 def admin_user_list(request):
     if request.user.role != 'admin':
         return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    users = User.objects.all()
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(directory.users(**_user_filters(request)), request)
+    return paginator.get_paginated_response(AdminUserSerializer(page, many=True).data)
+
+@api_view(['GET'])
+def admin_user_export(request):
+    """Все пользователи по тем же фильтрам потоком CSV (file_format=csv) или JSON Lines (jsonl)."""
+    if request.user.role != 'admin':
+        return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    file_format = request.query_params.get('file_format', 'csv')
+    if file_format not in directory.EXPORT_FORMATS:
+        raise ValidationError({'file_format': f'Expected one of: {", ".join(directory.EXPORT_FORMATS)}'})
+    export, content_type = directory.EXPORT_FORMATS[file_format]
+    response = StreamingHttpResponse(export(directory.users(**_user_filters(request))), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="users.{file_format}"'
+    return response
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -433,20 +727,58 @@ def rate_for_help(request, user_id):
         return Response({'error': 'Cannot rate yourself'}, status=status.HTTP_400_BAD_REQUEST)
 
     # Проверяем, есть ли чат между пользователями
-    chat = Chat.objects.filter(
-        (Q(user1=request.user, user2=target_user) | 
-         Q(user1=target_user, user2=request.user))
-    ).first()
+    chat = chats.find_chat(request.user, target_user)
     if not chat:
         return Response({'error': 'You must have a chat with this user to rate them'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Увеличиваем счётчик лайков за помощь в ЛС
-    target_user.chat_help_likes_cnt += 1
-    target_user.save()
+    # Увеличиваем счётчик лайков за помощь в ЛС; F() — чтобы не затереть параллельные обновления строки
+    User.objects.filter(id=target_user.id).update(chat_help_likes_cnt=F('chat_help_likes_cnt') + 1)
 
     # Добавляем баллы за помощь в ЛС (+2)
-    profile_view = target_user.profileview
-    profile_view.total_points += 2
-    profile_view.update_rating()
+    total_points = ratings.add_points(target_user.id, 2)
+    # Журнал начислений — источник месячных досок при пересборке
+    Rating.objects.create(user=target_user, score=2)
+    leaderboard.helped(target_user.id, 2, total_points)
 
-    return Response({'message': 'User rated for help', 'new_points': profile_view.total_points}, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response({'message': 'User rated for help', 'new_points': total_points}, status=status.HTTP_200_OK)
+
+def _leaderboard_params(request):
+    board = request.query_params.get('board', 'points')
+    period = request.query_params.get('period') or None
+    if period == 'current':
+        period = leaderboard.current_period()
+    return board, period
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def leaderboard_top(request):
+    """Топ k доски: ?board=points|chat_help|post_likes|...&period=YYYY-MM|current&k=10"""
+    board, period = _leaderboard_params(request)
+    if not leaderboard.is_valid_board(board, period):
+        return Response({'error': 'Unknown leaderboard'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        k = min(max(int(request.query_params.get('k', 10)), 1), 100)
+    except ValueError:
+        return Response({'error': 'k must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = leaderboard.top(board, k, period)
+    users = User.objects.in_bulk([user_id for user_id, _ in rows])
+    results = [
+        {'rank': position, 'user': AuthorSerializer(users[user_id]).data, 'score': score}
+        for position, (user_id, score) in enumerate(rows, start=1) if user_id in users
+    ]
+    return Response({'board': leaderboard.board_key(board, period), 'results': results})
+
+@api_view(['GET'])
+def leaderboard_me(request):
+    """Место текущего пользователя на доске (те же параметры, что у топа)."""
+    board, period = _leaderboard_params(request)
+    if not leaderboard.is_valid_board(board, period):
+        return Response({'error': 'Unknown leaderboard'}, status=status.HTTP_400_BAD_REQUEST)
+    rank, score = leaderboard.rank_of(board, request.user.id, period)
+    return Response({
+        'board': leaderboard.board_key(board, period),
+        'rank': rank,
+        'score': score,
+        'total': leaderboard.size(board, period),
+    })
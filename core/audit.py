@@ -0,0 +1,186 @@
+# core/audit.py
+#
+# Журнал действий администраторов (AdminAction), только дописывается.
+# Модерация вызывает log(); записи попадают в буфер после коммита транзакции
+# действия (откатившееся действие не журналируется), а фоновый поток раз в
+# AUDIT_FLUSH_MS миллисекунд пишет их одним bulk_create. Поля структурированы:
+# action_type, target_type, target_id и data (JSON) вместо свободного текста.
+# Старые записи сворачиваются в дневные агрегаты командой compact_audit_log.
+
+import atexit
+import json
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Admin, AdminAction, AdminActionDaily
+
+logger = logging.getLogger(__name__)
+
+
+def is_enabled():
+    return getattr(settings, 'AUDIT_BUFFER_ENABLED', True)
+
+
+class AuditBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'AUDIT_FLUSH_MS', 500) / 1000
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'AUDIT_MAX_BATCH', 500)
+
+    def add(self, entries):
+        with self._lock:
+            self._pending.extend(entries)
+            full = len(self._pending) >= self.batch_size
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Записывает накопленные записи. Возвращает их число."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                AdminAction.objects.bulk_create(batch, batch_size=self.batch_size)
+            except Exception:
+                # Возвращаем пачку в начало очереди, чтобы не потерять записи
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            return len(batch)
+
+    def _ensure_flusher(self):
+        # С AUDIT_AUTOFLUSH = False (тесты) запись идёт только через flush()
+        if not getattr(settings, 'AUDIT_AUTOFLUSH', True):
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush audit log')
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.flush)
+
+
+def log(user, action_type, target_type, target_ids, data=None):
+    """Журналирует действие над каждой целью из target_ids.
+
+    data — общий для всех целей словарь или функция target_id -> словарь.
+    Без записи Admin у пользователя действие не журналируется, как и раньше.
+    """
+    admin = user if isinstance(user, Admin) else Admin.objects.filter(user=user).first()
+    if admin is None:
+        return
+    now = timezone.now()
+    entries = [
+        AdminAction(
+            admin=admin, action_type=action_type, target_type=target_type, target_id=target_id,
+            data=(data(target_id) if callable(data) else data) or {}, created_at=now,
+        )
+        for target_id in target_ids
+    ]
+    if is_enabled():
+        transaction.on_commit(lambda: buffer.add(entries))
+    else:
+        AdminAction.objects.bulk_create(entries)
+
+
+def history(admin_id=None, action_type=None, since=None, until=None):
+    """Записи журнала по фильтрам, от новых к старым, — ключ для KeysetPagination."""
+    actions = AdminAction.objects.all()
+    if admin_id is not None:
+        actions = actions.filter(admin_id=admin_id)
+    if action_type:
+        actions = actions.filter(action_type=action_type)
+    if since is not None:
+        actions = actions.filter(created_at__gte=since)
+    if until is not None:
+        actions = actions.filter(created_at__lt=until)
+    return actions.order_by('-created_at', '-id')
+
+
+EXPORT_FIELDS = ('id', 'admin_id', 'admin__user__username', 'action_type', 'target_type', 'target_id', 'data', 'created_at')
+
+
+def export_lines(actions, chunk_size=2000):
+    """JSON Lines по записям журнала, от старых к новым; в памяти одна пачка строк."""
+    rows = actions.order_by('created_at', 'id').values(*EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        row['admin_username'] = row.pop('admin__user__username')
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def compact(older_than_days, dry_run=False):
+    """Сворачивает записи старше older_than_days дней в AdminActionDaily и удаляет их.
+
+    Идёт по одному дню в транзакции; повторный запуск добавляет к уже свёрнутым счётчикам.
+    Возвращает Counter {день: свёрнуто записей}.
+    """
+    cutoff = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=older_than_days)
+    old = AdminAction.objects.filter(created_at__lt=cutoff)
+    days = sorted(old.annotate(day=TruncDate('created_at')).order_by().values_list('day', flat=True).distinct())
+    compacted = Counter()
+    for day in days:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        rows = old.filter(created_at__gte=start, created_at__lt=min(start + timedelta(days=1), cutoff))
+        with transaction.atomic():
+            totals = rows.order_by().values('admin_id', 'action_type').annotate(total=Count('id'))
+            existing = {
+                (daily.admin_id, daily.action_type): daily
+                for daily in AdminActionDaily.objects.select_for_update().filter(day=day)
+            }
+            created, updated = [], []
+            for row in totals:
+                compacted[day] += row['total']
+                daily = existing.get((row['admin_id'], row['action_type']))
+                if daily is None:
+                    created.append(AdminActionDaily(day=day, admin_id=row['admin_id'],
+                                                    action_type=row['action_type'], count=row['total']))
+                else:
+                    daily.count += row['total']
+                    updated.append(daily)
+            if dry_run:
+                continue
+            AdminActionDaily.objects.bulk_create(created)
+            AdminActionDaily.objects.bulk_update(updated, ['count'])
+            rows.delete()
+    return compacted
@@ -0,0 +1,131 @@
+# core/chats.py
+#
+# Денормализованное состояние чатов: счётчики непрочитанных и последнее сообщение.
+# У чата есть user1_unread_cnt и user2_unread_cnt; новое сообщение увеличивает
+# счётчик получателя, прочтение уменьшает его на число реально отмеченных строк.
+# Бейдж непрочитанных — сумма по чатам пользователя, без сканирования сообщений.
+# Там же поддерживаются last_message/last_activity_at для списка диалогов.
+# Пара участников хранится упорядоченной (user1_id < user2_id) под уникальным
+# индексом, поэтому чат двух пользователей ищется одним точным запросом.
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce, Greatest
+
+from . import events
+from .models import Chat, Message
+
+
+def is_participant(chat, user):
+    return user.id in (chat.user1_id, chat.user2_id)
+
+
+def canonical_pair(user_a, user_b):
+    return (user_a.id, user_b.id) if user_a.id < user_b.id else (user_b.id, user_a.id)
+
+
+def find_chat(user_a, user_b):
+    user1_id, user2_id = canonical_pair(user_a, user_b)
+    return Chat.objects.filter(user1_id=user1_id, user2_id=user2_id).first()
+
+
+def get_or_create_chat(user_a, user_b):
+    """Возвращает (чат, создан ли) для пары пользователей в любом порядке.
+
+    Одновременные вызовы для одной пары не создают дублей: проигравший
+    вставку упирается в unique_chat_pair и читает чат победителя.
+    Чат с самим собой невозможен — бросает ValueError.
+    """
+    if user_a.id == user_b.id:
+        raise ValueError('Cannot start a chat with yourself')
+    user1_id, user2_id = canonical_pair(user_a, user_b)
+    chat = Chat.objects.filter(user1_id=user1_id, user2_id=user2_id).first()
+    if chat is not None:
+        return chat, False
+    try:
+        with transaction.atomic():
+            return Chat.objects.create(user1_id=user1_id, user2_id=user2_id), True
+    except IntegrityError:
+        return Chat.objects.get(user1_id=user1_id, user2_id=user2_id), False
+
+
+def send_message(chat, sender, **fields):
+    """Создаёт сообщение от участника чата и рассылает его подписчикам после коммита.
+
+    Единый путь записи для REST API, HTML-формы и WebSocket.
+    """
+    receiver_id = chat.user1_id if chat.user2_id == sender.id else chat.user2_id
+    with transaction.atomic():
+        message = Message.objects.create(chat=chat, sender=sender, receiver_id=receiver_id, **fields)
+        transaction.on_commit(lambda: events.message_sent(message))
+    return message
+
+
+def unread_field(chat, user_id):
+    return 'user1_unread_cnt' if chat.user1_id == user_id else 'user2_unread_cnt'
+
+
+def get_unread_count(chat, user):
+    return getattr(chat, unread_field(chat, user.id))
+
+
+def _unread_updates(user_id, delta):
+    # Меняется счётчик того участника, кто получатель, без чтения строки чата
+    def counter(side):
+        field = f'{side}_unread_cnt'
+        return Case(
+            When(**{f'{side}_id': user_id}, then=Greatest(F(field) + delta, 0)),
+            default=F(field),
+        )
+    return {'user1_unread_cnt': counter('user1'), 'user2_unread_cnt': counter('user2')}
+
+
+def message_created(message):
+    updates = {'last_message': message, 'last_activity_at': message.created_at}
+    if not message.is_read:
+        updates.update(_unread_updates(message.receiver_id, 1))
+    Chat.objects.filter(id=message.chat_id).update(**updates)
+
+
+def message_deleted(message):
+    # Если удалили последнее сообщение, SET_NULL уже обнулил указатель — берём предыдущее
+    latest = Message.objects.filter(chat=OuterRef('pk')).order_by('-created_at', '-id').values('id')[:1]
+    updates = {'last_message': Coalesce(F('last_message'), Subquery(latest))}
+    if not message.is_read:
+        updates.update(_unread_updates(message.receiver_id, -1))
+    Chat.objects.filter(id=message.chat_id).update(**updates)
+
+
+def mark_read(chat, user, up_to_id=None):
+    """Отмечает входящие сообщения чата прочитанными одним UPDATE.
+
+    Если передан ``up_to_id``, отмечаются только сообщения с id не больше него.
+    Возвращает число отмеченных сообщений.
+    """
+    messages = Message.objects.filter(chat=chat, receiver=user, is_read=False)
+    if up_to_id is not None:
+        messages = messages.filter(id__lte=up_to_id)
+    with transaction.atomic():
+        updated = messages.update(is_read=True)
+        if updated:
+            Chat.objects.filter(id=chat.id).update(**_unread_updates(user.id, -updated))
+            transaction.on_commit(lambda: events.messages_read(chat.id, user.id, up_to_id, updated))
+    return updated
+
+
+def total_unread(user):
+    """Сумма непрочитанных по всем чатам пользователя — O(число чатов)."""
+    result = Chat.objects.filter(Q(user1=user) | Q(user2=user)).aggregate(
+        total=Sum(Case(
+            When(user1=user, then=F('user1_unread_cnt')),
+            default=F('user2_unread_cnt'),
+        ))
+    )
+    return result['total'] or 0
+
+
+def inbox(user):
+    """Чаты пользователя по последней активности вместе с последним сообщением."""
+    return Chat.objects.filter(
+        Q(user1=user) | Q(user2=user)
+    ).select_related('user1', 'user2', 'last_message').order_by('-last_activity_at', '-id')
@@ -0,0 +1,96 @@
+# core/code_blobs.py
+#
+# Контентно-адресуемое хранилище кода.
+# Текст приводится к переводам строк \n (остальное не трогаем: номера строк
+# Code и CodeComment и пробелы в строковых литералах должны сохраниться)
+# и хранится один раз в CodeBlob под sha256 от этого текста; Code, Post, Comment и Course
+# ссылаются на общий blob вместо собственной копии. Подсветка кэшируется по хэшу
+# blob'а, поэтому одинаковый код рендерится один раз на весь сайт.
+
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+
+from .models import CodeBlob, Code, Post, Comment, Course
+
+# Модель -> поле со ссылкой на blob
+BLOB_REFERENCES = {
+    Code: 'code_blob',
+    Post: 'code_blob',
+    Comment: 'code_blob',
+    Course: 'code_blob',
+}
+
+
+def normalize(text):
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def count_lines(text):
+    # Завершающий перевод строки не открывает новую строку
+    return text.count('\n') + (0 if text.endswith('\n') else 1)
+
+
+def content_hash(normalized):
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def intern(text):
+    """Возвращает общий CodeBlob для текста, создавая его при первом появлении.
+
+    Пустой код — None. Гонка двух вставок одного текста разрешается
+    уникальным индексом по hash, как в chats.get_or_create_chat.
+    """
+    normalized = normalize(text or '')
+    if not normalized.strip():
+        return None
+    digest = content_hash(normalized)
+    blob = CodeBlob.objects.filter(hash=digest).first()
+    if blob is not None:
+        return blob
+    try:
+        with transaction.atomic():
+            return CodeBlob.objects.create(
+                hash=digest,
+                content=normalized,
+                size=len(normalized.encode()),
+                line_count=count_lines(normalized),
+            )
+    except IntegrityError:
+        return CodeBlob.objects.get(hash=digest)
+
+
+def save_pending(instance):
+    """Переводит текст, присвоенный через свойство модели, в ссылку на blob (pre_save)."""
+    field = BLOB_REFERENCES[type(instance)]
+    pending = instance.__dict__.pop(f'_{field}_text', None)
+    if pending is not None:
+        setattr(instance, field, intern(pending))
+
+
+def unreferenced():
+    condition = Q()
+    for model, field in BLOB_REFERENCES.items():
+        condition &= ~Q(id__in=model.objects.filter(**{f'{field}__isnull': False}).values(field))
+    return CodeBlob.objects.filter(condition)
+
+
+def report():
+    """Сколько байт кода хранилось бы копиями и сколько хранится на самом деле."""
+    logical = 0
+    references = 0
+    for model, field in BLOB_REFERENCES.items():
+        totals = model.objects.filter(**{f'{field}__isnull': False}).aggregate(
+            rows=Count('id'), size=Sum(f'{field}__size'),
+        )
+        references += totals['rows']
+        logical += totals['size'] or 0
+    stored = CodeBlob.objects.aggregate(blobs=Count('id'), size=Sum('size'))
+    return {
+        'references': references,
+        'blobs': stored['blobs'],
+        'logical_bytes': logical,
+        'stored_bytes': stored['size'] or 0,
+        'saved_bytes': logical - (stored['size'] or 0),
+    }
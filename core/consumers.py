@@ -0,0 +1,83 @@
+# core/consumers.py
+#
+# WebSocket чата: ws/chats/<chat_id>/
+#
+# Клиент -> сервер:
+#   {"type": "message", "content": "...", "is_code": false, "image_url": ""}
+#   {"type": "read", "up_to": <message id или null>}
+# Сервер -> клиент:
+#   {"type": "message", "message": {...}}
+#   {"type": "read", "user_id": ..., "up_to": ..., "marked": ...}
+#   {"type": "like", "user_id": ..., "liked": true}
+#   {"type": "error", "errors": {...}}
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from . import chats, events, sanctions
+from .api.serializers import MessageSerializer
+from .models import Chat
+
+# Код закрытия для неаутентифицированных и посторонних пользователей
+CLOSE_FORBIDDEN = 4403
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        self.user = self.scope.get('user')
+        self.chat = None
+        if self.user is not None and self.user.is_authenticated:
+            self.chat = await self.get_chat(self.scope['url_route']['kwargs']['chat_id'])
+        if self.chat is None:
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+        self.group_name = events.chat_group(self.chat.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.chat is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        kind = content.get('type')
+        if kind == 'message':
+            errors = await self.send_message(content)
+            if errors:
+                await self.send_json({'type': 'error', 'errors': errors})
+        elif kind == 'read':
+            await self.mark_read(content.get('up_to'))
+        else:
+            await self.send_json({'type': 'error', 'errors': {'type': ['Unknown event type']}})
+
+    async def chat_event(self, event):
+        await self.send_json(dict(event['payload'], type=event['event']))
+
+    @database_sync_to_async
+    def get_chat(self, chat_id):
+        chat = Chat.objects.filter(id=chat_id).first()
+        if chat is None or not chats.is_participant(chat, self.user):
+            return None
+        return chat
+
+    @database_sync_to_async
+    def send_message(self, content):
+        # Та же валидация и тот же путь записи, что у MessageViewSet.perform_create
+        serializer = MessageSerializer(data=dict(content, chat=self.chat.id))
+        if not serializer.is_valid():
+            return serializer.errors
+        # Пользователь загружен при подключении, а мут мог появиться позже
+        self.user.refresh_from_db(fields=['is_blocked', 'muted_until'])
+        if not sanctions.can_write(self.user):
+            return {'detail': 'You cannot send messages'}
+        fields = {key: value for key, value in serializer.validated_data.items() if key != 'chat'}
+        chats.send_message(self.chat, self.user, **fields)
+        return None
+
+    @database_sync_to_async
+    def mark_read(self, up_to):
+        try:
+            up_to = int(up_to) if up_to is not None else None
+        except (TypeError, ValueError):
+            up_to = None
+        chats.mark_read(self.chat, self.user, up_to)
@@ -0,0 +1,45 @@
+# core/events.py
+#
+# Рассылка событий чата подписчикам WebSocket (core/consumers.py).
+# Каждый чат — отдельная группа channel layer; оба участника подписаны на неё
+# на время соединения. Без настроенного CHANNEL_LAYERS события молча пропускаются.
+
+import json
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from rest_framework.renderers import JSONRenderer
+
+
+def chat_group(chat_id):
+    return f'chat_{chat_id}'
+
+
+def _to_plain(data):
+    # Layer (msgpack для Redis) принимает только простые типы
+    return json.loads(JSONRenderer().render(data))
+
+
+def broadcast(chat_id, event_type, payload):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    async_to_sync(layer.group_send)(chat_group(chat_id), {
+        'type': 'chat.event',
+        'event': event_type,
+        'payload': _to_plain(payload),
+    })
+
+
+def message_sent(message):
+    from .api.serializers import MessageSerializer
+
+    broadcast(message.chat_id, 'message', {'message': MessageSerializer(message).data})
+
+
+def messages_read(chat_id, user_id, up_to_id, marked):
+    broadcast(chat_id, 'read', {'user_id': user_id, 'up_to': up_to_id, 'marked': marked})
+
+
+def chat_liked(chat_id, user_id, liked):
+    broadcast(chat_id, 'like', {'user_id': user_id, 'liked': liked})
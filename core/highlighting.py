@@ -0,0 +1,69 @@
+# core/highlighting.py
+#
+# Подсветка синтаксиса фрагментов кода (Pygments).
+# HTML строится один раз — при сохранении кода (см. core/signals.py) — и кладётся
+# в кэш «highlight» по (язык, sha256 текста). Для CodeBlob хэш уже посчитан,
+# так что общий фрагмент подсвечивается один раз на все ссылающиеся строки.
+# LocMemCache вытесняет давно не читавшиеся записи при достижении MAX_ENTRIES;
+# в продакшене тот же алиас можно направить в Redis с политикой allkeys-lru.
+
+import hashlib
+
+from django.core.cache import caches
+from django.utils.safestring import mark_safe
+from pygments import highlight as pygments_highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import TextLexer, get_lexer_by_name
+from pygments.util import ClassNotFound
+
+CACHE_ALIAS = 'highlight'
+CSS_CLASS = 'code'
+
+_formatter = HtmlFormatter(cssclass=CSS_CLASS)
+
+
+def cache_key(digest, language=None):
+    return f'hl:{language or ""}:{digest}'
+
+
+def get_lexer(language):
+    # Язык из VALID_LANGUAGES; у Post/Comment/Course языка нет — выводим как текст
+    if language:
+        try:
+            return get_lexer_by_name(language.lower())
+        except ClassNotFound:
+            pass
+    return TextLexer()
+
+
+def render(source, language=None):
+    """Подсвечивает без кэша."""
+    return pygments_highlight(source, get_lexer(language), _formatter)
+
+
+def _cached(digest, source, language):
+    cache = caches[CACHE_ALIAS]
+    key = cache_key(digest, language)
+    html = cache.get(key)
+    if html is None:
+        html = render(source, language)
+        cache.set(key, html, None)
+    return mark_safe(html)
+
+
+def highlight(source, language=None):
+    """HTML подсвеченного кода, из кэша или свежеотрендеренный."""
+    if not source:
+        return ''
+    return _cached(hashlib.sha256(source.encode()).hexdigest(), source, language)
+
+
+def highlight_blob(blob, language=None):
+    """То же для CodeBlob — без повторного хэширования текста."""
+    if blob is None:
+        return ''
+    return _cached(blob.hash, blob.content, language)
+
+
+def css():
+    return _formatter.get_style_defs(f'.{CSS_CLASS}')
@@ -0,0 +1,252 @@
+# core/leaderboard.py
+#
+# Рейтинги помощников: отсортированные множества «пользователь -> очки».
+# Доски обновляются инкрементально — из rate_for_help и при изменении лайков
+# (core/likes.py) — и целиком пересобираются командой rebuild_leaderboard
+# из исходных таблиц. «Мой ранг» — O(log n), «топ k» — O(k).
+#
+# При REDIS_URL доски живут в Redis (ZSET: ZINCRBY/ZREVRANK/ZREVRANGE) и общие
+# для всех воркеров; иначе — в памяти процесса, как InMemoryChannelLayer,
+# и собираются из базы при первом чтении в процессе.
+
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import activity
+from .models import User, Post, Comment, Course, ProfileView, Rating
+
+# Доска -> описание; доски баллов по месяцам — 'points:YYYY-MM'
+BOARDS = {
+    'points': 'Баллы за помощь (ProfileView.total_points)',
+    'chat_help': 'Оценки за помощь в ЛС',
+    'post_likes': 'Лайки постов',
+    'comment_likes': 'Лайки комментариев',
+    'course_likes': 'Лайки курсов',
+}
+PERIODIC_BOARDS = {'points'}
+
+# Тип цели лайка -> (модель, доска автора)
+LIKE_BOARDS = {
+    'post': (Post, 'post_likes'),
+    'comment': (Comment, 'comment_likes'),
+    'course': (Course, 'course_likes'),
+}
+
+
+class MemoryBackend:
+    """Доски в памяти процесса: отсортированный список (-очки, user_id) + словарь очков.
+
+    Ранг ищется бинарным поиском, топ — срезом; вставка сдвигает список (memmove).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {}
+        self.needs_warmup = True
+
+    def _board(self, name):
+        return self._boards.setdefault(name, ({}, []))
+
+    def _set(self, name, user_id, score):
+        scores, ordered = self._board(name)
+        if user_id in scores:
+            ordered.pop(bisect_left(ordered, (-scores[user_id], user_id)))
+        scores[user_id] = score
+        insort(ordered, (-score, user_id))
+
+    def set_score(self, name, user_id, score):
+        with self._lock:
+            self._set(name, user_id, score)
+
+    def increment(self, name, user_id, delta):
+        with self._lock:
+            scores, _ = self._board(name)
+            self._set(name, user_id, scores.get(user_id, 0) + delta)
+
+    def rank(self, name, user_id):
+        with self._lock:
+            scores, ordered = self._boards.get(name, ({}, []))
+            if user_id not in scores:
+                return None, None
+            return bisect_left(ordered, (-scores[user_id], user_id)), scores[user_id]
+
+    def top(self, name, k):
+        with self._lock:
+            _, ordered = self._boards.get(name, ({}, []))
+            return [(user_id, -score) for score, user_id in ordered[:k]]
+
+    def size(self, name):
+        with self._lock:
+            return len(self._boards.get(name, ({}, []))[0])
+
+    def replace(self, name, scores):
+        ordered = sorted((-score, user_id) for user_id, score in scores.items())
+        with self._lock:
+            if scores:
+                self._boards[name] = (dict(scores), ordered)
+            else:
+                self._boards.pop(name, None)
+
+    def names(self):
+        with self._lock:
+            return set(self._boards)
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+            self.needs_warmup = True
+
+
+class RedisBackend:
+    """Доски в Redis: одна ZSET на доску, участники — id пользователей."""
+    needs_warmup = False
+
+    def __init__(self, url):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _key(name):
+        return f'leaderboard:{name}'
+
+    def set_score(self, name, user_id, score):
+        self._redis.zadd(self._key(name), {user_id: score})
+
+    def increment(self, name, user_id, delta):
+        self._redis.zincrby(self._key(name), delta, user_id)
+
+    def rank(self, name, user_id):
+        pipe = self._redis.pipeline()
+        pipe.zrevrank(self._key(name), user_id)
+        pipe.zscore(self._key(name), user_id)
+        rank, score = pipe.execute()
+        return rank, int(score) if score is not None else None
+
+    def top(self, name, k):
+        rows = self._redis.zrevrange(self._key(name), 0, k - 1, withscores=True)
+        return [(int(user_id), int(score)) for user_id, score in rows]
+
+    def size(self, name):
+        return self._redis.zcard(self._key(name))
+
+    def replace(self, name, scores):
+        # Собираем во временный ключ и подменяем атомарным RENAME
+        key, tmp = self._key(name), self._key(f'{name}:rebuild')
+        pipe = self._redis.pipeline()
+        pipe.delete(tmp)
+        if scores:
+            pipe.zadd(tmp, scores)
+            pipe.rename(tmp, key)
+        else:
+            pipe.delete(key)
+        pipe.execute()
+
+    def names(self):
+        prefix = self._key('')
+        names = {key.decode()[len(prefix):] for key in self._redis.scan_iter(self._key('*'))}
+        return {name for name in names if not name.endswith(':rebuild')}
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(self._key('*')))
+        if keys:
+            self._redis.delete(*keys)
+
+
+def _make_backend():
+    if settings.REDIS_URL:
+        return RedisBackend(settings.REDIS_URL)
+    return MemoryBackend()
+
+
+backend = _make_backend()
+
+
+def board_key(board, period=None):
+    return f'{board}:{period}' if period else board
+
+
+def current_period():
+    return timezone.now().strftime('%Y-%m')
+
+
+def is_valid_board(board, period=None):
+    if board not in BOARDS:
+        return False
+    return period is None or board in PERIODIC_BOARDS
+
+
+def _warm_up():
+    if backend.needs_warmup:
+        rebuild()
+
+
+def top(board, k, period=None):
+    _warm_up()
+    return backend.top(board_key(board, period), k)
+
+
+def rank_of(board, user_id, period=None):
+    """(место с 1, очки) или (None, None), если пользователя на доске нет."""
+    _warm_up()
+    rank, score = backend.rank(board_key(board, period), user_id)
+    return (rank + 1 if rank is not None else None), score
+
+
+def size(board, period=None):
+    _warm_up()
+    return backend.size(board_key(board, period))
+
+
+def helped(user_id, points, total_points):
+    """Оценка за помощь в ЛС (rate_for_help): обновляет доски после коммита."""
+    def apply():
+        backend.set_score('points', user_id, total_points)
+        backend.increment(board_key('points', current_period()), user_id, points)
+        backend.increment('chat_help', user_id, 1)
+    transaction.on_commit(apply)
+
+
+def like_changed(target_type, target_id, delta):
+    """Лайк поставлен или снят: очки автора цели на доске лайков этого типа."""
+    if target_type not in LIKE_BOARDS:
+        return
+    model, board = LIKE_BOARDS[target_type]
+
+    def apply():
+        author_id = model.objects.filter(id=target_id).values_list('user_id', flat=True).first()
+        if author_id is not None:
+            backend.increment(board, author_id, delta)
+    transaction.on_commit(apply)
+
+
+def rebuild():
+    """Пересобирает все доски из исходных таблиц. Возвращает {доска: участников}."""
+    boards = {
+        'points': dict(ProfileView.objects.filter(total_points__gt=0).values_list('user_id', 'total_points')),
+        'chat_help': dict(User.objects.filter(chat_help_likes_cnt__gt=0).values_list('id', 'chat_help_likes_cnt')),
+    }
+    # Лайки авторов — из счётчиков User (core/activity.py), без агрегации по постам
+    for target_type, (_, board) in LIKE_BOARDS.items():
+        _, column = activity.LIKE_COUNTERS[target_type]
+        boards[board] = dict(User.objects.filter(**{f'{column}__gt': 0}).values_list('id', column))
+    monthly = (
+        Rating.objects.annotate(month=TruncMonth('created_at')).order_by()
+        .values('month', 'user_id').annotate(total=Sum('score')).values_list('month', 'user_id', 'total')
+    )
+    for month, user_id, total in monthly:
+        boards.setdefault(board_key('points', month.strftime('%Y-%m')), {})[user_id] = total
+
+    for name, scores in boards.items():
+        backend.replace(name, scores)
+    # Доски, которых больше нет в источниках (например, месяц без оценок), удаляем
+    for name in backend.names() - set(boards):
+        backend.replace(name, {})
+    backend.needs_warmup = False
+    return {name: len(scores) for name, scores in boards.items()}
@@ -0,0 +1,145 @@
+# core/like_buffer.py
+#
+# Отложенная запись лайков (write-behind).
+# Вместо транзакции на каждый лайк события копятся в памяти процесса, а фоновый
+# поток раз в LIKES_BUFFER_FLUSH_MS миллисекунд записывает их одной пачкой:
+# один bulk_create строк Like и по UPDATE счётчика цели и её автора на каждую цель.
+# Пока лайк не записан, чтения добавляют к счётчику отложенную дельту.
+
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .models import Like
+
+logger = logging.getLogger(__name__)
+
+
+def is_enabled():
+    return getattr(settings, 'LIKES_BUFFER_ENABLED', False)
+
+
+class LikeBuffer:
+    def __init__(self, flush_interval_ms=None, max_batch_size=None):
+        self.flush_interval_ms = flush_interval_ms
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # (user_id, target_type, target_id) -> created_at
+        self._deltas = Counter()  # (target_type, target_id) -> число отложенных лайков
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def interval(self):
+        ms = self.flush_interval_ms or getattr(settings, 'LIKES_BUFFER_FLUSH_MS', 200)
+        return ms / 1000
+
+    @property
+    def batch_size(self):
+        return self.max_batch_size or getattr(settings, 'LIKES_BUFFER_MAX_BATCH', 1000)
+
+    def add(self, user_id, target_type, target_id, created_at):
+        """Ставит лайк в очередь. Возвращает False, если он уже ждёт записи."""
+        key = (user_id, target_type, target_id)
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending[key] = created_at
+            self._deltas[(target_type, target_id)] += 1
+            full = len(self._pending) >= self.batch_size
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def discard(self, user_id, target_type, target_id):
+        """Убирает ещё не записанный лайк. Возвращает True, если он был в очереди."""
+        # Ждём текущую запись, чтобы не снять лайк, который уже уходит в базу
+        with self._flush_lock, self._lock:
+            if self._pending.pop((user_id, target_type, target_id), None) is None:
+                return False
+            self._decrement((target_type, target_id), 1)
+            return True
+
+    def is_pending(self, user_id, target_type, target_id):
+        with self._lock:
+            return (user_id, target_type, target_id) in self._pending
+
+    def pending_delta(self, target_type, target_id):
+        with self._lock:
+            return self._deltas.get((target_type, target_id), 0)
+
+    def _decrement(self, target, amount):
+        self._deltas[target] -= amount
+        if self._deltas[target] <= 0:
+            del self._deltas[target]
+
+    def flush(self):
+        """Записывает накопленные лайки. Возвращает число вставленных строк."""
+        from . import activity, leaderboard
+        from .likes import LIKE_TARGETS
+
+        with self._flush_lock:
+            with self._lock:
+                batch = dict(self._pending)
+            if not batch:
+                return 0
+
+            with transaction.atomic():
+                # Лайки, которые уже есть в базе (например, из другого процесса), не считаем
+                users, types, ids = (set(column) for column in zip(*batch))
+                existing = set(Like.objects.filter(
+                    user_id__in=users, target_type__in=types, target_id__in=ids
+                ).values_list('user_id', 'target_type', 'target_id'))
+                new = [key for key in batch if key not in existing]
+
+                Like.objects.bulk_create(
+                    [Like(user_id=u, target_type=t, target_id=i, created_at=batch[(u, t, i)]) for u, t, i in new],
+                    ignore_conflicts=True,
+                )
+                per_target = Counter((t, i) for _, t, i in new)
+                for (target_type, target_id), amount in per_target.items():
+                    model, field = LIKE_TARGETS[target_type]
+                    model.objects.filter(id=target_id).update(**{field: F(field) + amount})
+                    activity.likes_changed(target_type, target_id, amount)
+                    # Доски — только по реально вставленным лайкам, после коммита
+                    leaderboard.like_changed(target_type, target_id, amount)
+
+            with self._lock:
+                for user_id, target_type, target_id in batch:
+                    del self._pending[(user_id, target_type, target_id)]
+                    self._decrement((target_type, target_id), 1)
+            return len(new)
+
+    def _ensure_flusher(self):
+        # С LIKES_BUFFER_AUTOFLUSH = False (тесты, бенчмарк) запись идёт только через flush()
+        if not getattr(settings, 'LIKES_BUFFER_AUTOFLUSH', True):
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='like-buffer-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                # Ошибка записи не должна убивать поток: лайки останутся в очереди до следующей попытки
+                logger.exception('Failed to flush buffered likes')
+
+
+buffer = LikeBuffer()
+atexit.register(buffer.flush)
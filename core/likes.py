@@ -0,0 +1,97 @@
+# core/likes.py
+#
+# Лайки постов, комментариев, курсов и чатов.
+# Вставка/удаление Like и изменение счётчика цели выполняются в одной транзакции,
+# а счётчик меняется одним UPDATE ... SET cnt = cnt ± 1, без чтения строки в Python.
+# При LIKES_BUFFER_ENABLED лайки пишутся пачками через core.like_buffer.
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404
+from django.utils import timezone
+
+from . import activity, events, leaderboard, like_buffer
+from .models import Post, Comment, Course, Chat, Like
+
+# Тип цели -> (модель, поле счётчика)
+LIKE_TARGETS = {
+    'post': (Post, 'likes_count'),
+    'comment': (Comment, 'likes_count'),
+    'course': (Course, 'likes_count'),
+    'chat': (Chat, 'chat_likes_cnt'),
+}
+
+
+def is_valid_target(target_type):
+    return target_type in LIKE_TARGETS
+
+
+def _change_counter(target_type, target_id, delta):
+    model, field = LIKE_TARGETS[target_type]
+    changed = model.objects.filter(id=target_id).update(**{field: F(field) + delta})
+    if changed:
+        activity.likes_changed(target_type, target_id, delta)
+        leaderboard.like_changed(target_type, target_id, delta)
+    return changed
+
+
+def add_like(user, target_type, target_id):
+    """Ставит лайк. Возвращает True, если лайк новый, и False, если он уже был.
+
+    Если цели не существует, бросает Http404 и ничего не записывает.
+    """
+    if like_buffer.is_enabled():
+        return _add_buffered_like(user, target_type, target_id)
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Like.objects.create(user=user, target_type=target_type, target_id=target_id)
+        except IntegrityError:
+            # Уникальный индекс (user, target_type, target_id) — лайк уже стоит
+            return False
+        if not _change_counter(target_type, target_id, 1):
+            raise Http404(f'No {target_type} matches the given query.')
+        _notify(user, target_type, target_id, liked=True)
+    return True
+
+
+def remove_like(user, target_type, target_id):
+    """Снимает лайк. Возвращает True, если лайк был снят."""
+    if like_buffer.buffer.discard(user.id, target_type, target_id):
+        _notify(user, target_type, target_id, liked=False)
+        return True
+
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(
+            user=user, target_type=target_type, target_id=target_id
+        ).delete()
+        if not deleted:
+            return False
+        _change_counter(target_type, target_id, -1)
+        _notify(user, target_type, target_id, liked=False)
+    return True
+
+
+def _add_buffered_like(user, target_type, target_id):
+    model, _ = LIKE_TARGETS[target_type]
+    if not model.objects.filter(id=target_id).exists():
+        raise Http404(f'No {target_type} matches the given query.')
+    if Like.objects.filter(user=user, target_type=target_type, target_id=target_id).exists():
+        return False
+    queued = like_buffer.buffer.add(user.id, target_type, target_id, timezone.now())
+    if queued:
+        _notify(user, target_type, target_id, liked=True)
+    return queued
+
+
+def _notify(user, target_type, target_id, liked):
+    # Лайк чата видят оба участника в реальном времени
+    if target_type == 'chat':
+        transaction.on_commit(lambda: events.chat_liked(target_id, user.id, liked))
+
+
+def get_likes_count(obj, target_type):
+    """Счётчик лайков объекта с учётом ещё не записанных лайков из буфера."""
+    _, field = LIKE_TARGETS[target_type]
+    return getattr(obj, field) + like_buffer.buffer.pending_delta(target_type, obj.id)
@@ -0,0 +1,60 @@
+# core/longpoll.py
+#
+# Long-poll «сообщения после after_id» — запасной канал для клиентов без WebSocket.
+# Запрос подписывается на ту же группу channel layer, что и ChatConsumer, и ждёт
+# события о новом сообщении; поток воркера при этом не занят.
+# Между подпиской и ожиданием дельта перечитывается, чтобы не потерять сообщение,
+# пришедшее в этот промежуток.
+
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+
+from . import events
+from .models import Message
+
+# Сколько сообщений отдаём за один ответ; остальное клиент заберёт следующим запросом
+MAX_BATCH = 100
+
+
+def messages_after(chat, after_id):
+    return (
+        Message.objects.filter(chat=chat, id__gt=after_id)
+        .select_related('sender')
+        .order_by('id')[:MAX_BATCH]
+    )
+
+
+@database_sync_to_async
+def _fetch(chat, after_id):
+    return list(messages_after(chat, after_id))
+
+
+async def wait_for_messages(chat, after_id, timeout):
+    """Возвращает сообщения чата с id > after_id, дожидаясь их не дольше timeout секунд."""
+    messages = await _fetch(chat, after_id)
+    layer = get_channel_layer()
+    if messages or layer is None or timeout <= 0:
+        return messages
+
+    group = events.chat_group(chat.id)
+    channel = await layer.new_channel()
+    await layer.group_add(group, channel)
+    try:
+        messages = await _fetch(chat, after_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not messages:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(layer.receive(channel), remaining)
+            except asyncio.TimeoutError:
+                break
+            if event.get('event') == 'message':
+                messages = await _fetch(chat, after_id)
+    finally:
+        await layer.group_discard(group, channel)
+    return messages
@@ -0,0 +1,63 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import User, Chat
+from core.routing import websocket_application
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест WebSocket-чатов: задержка доставки при N одновременных соединениях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=1000, help='Число одновременных соединений (по два на чат)')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Сколько ждать доставки, секунд')
+
+    def handle(self, *args, **options):
+        pairs = max(options['sockets'] // 2, 1)
+        User.objects.bulk_create([
+            User(username=f'wsbench-{i}', email=f'wsbench-{i}@example.com') for i in range(pairs * 2)
+        ])
+        users = list(User.objects.filter(username__startswith='wsbench-').order_by('id'))
+        Chat.objects.bulk_create([Chat(user1=users[2 * i], user2=users[2 * i + 1]) for i in range(pairs)])
+        chats = list(Chat.objects.filter(user1__username__startswith='wsbench-').order_by('id'))
+        tokens = {user.id: str(AccessToken.for_user(user)) for user in users}
+        try:
+            latencies = async_to_sync(self.run)(chats, tokens, options['timeout'])
+        finally:
+            User.objects.filter(username__startswith='wsbench-').delete()
+
+        latencies.sort()
+        ms = [value * 1000 for value in latencies]
+        self.stdout.write(f'sockets:  {pairs * 2}')
+        self.stdout.write(f'delivered: {len(ms)}/{pairs}')
+        if ms:
+            self.stdout.write(f'p50:  {statistics.median(ms):8.1f} ms')
+            self.stdout.write(f'p95:  {ms[int(len(ms) * 0.95) - 1]:8.1f} ms')
+            self.stdout.write(f'max:  {ms[-1]:8.1f} ms')
+
+    async def run(self, chats, tokens, timeout):
+        def socket(chat, user_id):
+            return WebsocketCommunicator(websocket_application, f'/ws/chats/{chat.id}/?token={tokens[user_id]}')
+
+        pairs = [(socket(chat, chat.user1_id), socket(chat, chat.user2_id)) for chat in chats]
+        sockets = [s for pair in pairs for s in pair]
+        await asyncio.gather(*(s.connect() for s in sockets))
+
+        async def round_trip(sender, receiver, index):
+            started = time.perf_counter()
+            await sender.send_json_to({'type': 'message', 'content': f'ping {index}'})
+            await receiver.receive_json_from(timeout=timeout)
+            return time.perf_counter() - started
+
+        results = await asyncio.gather(
+            *(round_trip(sender, receiver, i) for i, (sender, receiver) in enumerate(pairs)),
+            return_exceptions=True,
+        )
+        await asyncio.gather(*(s.disconnect() for s in sockets), return_exceptions=True)
+        return [value for value in results if isinstance(value, float)]
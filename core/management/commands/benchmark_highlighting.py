@@ -0,0 +1,43 @@
+import random
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from core import highlighting
+
+SAMPLE = '''def fib(n):
+    """Числа Фибоначчи."""
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+'''
+
+
+class Command(BaseCommand):
+    help = 'Стоимость подсветки кода в зависимости от доли попаданий в кэш'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=200, help='Длина фрагмента в строках')
+        parser.add_argument('--requests', type=int, default=500, help='Число рендеров на каждый замер')
+
+    def handle(self, *args, **options):
+        source = SAMPLE * max(options['lines'] // 7, 1)
+        total = options['requests']
+        cache = caches[highlighting.CACHE_ALIAS]
+
+        self.stdout.write(f'{"hit ratio":>10} {"total, ms":>12} {"per render, ms":>16}')
+        for ratio in (0.0, 0.5, 0.9, 0.99, 1.0):
+            cache.clear()
+            highlighting.highlight(source, 'python')
+            rng = random.Random(0)
+            # Промах — уникальный фрагмент, попадание — уже отрендеренный
+            snippets = [source if rng.random() < ratio else f'{source}# {i}\n' for i in range(total)]
+            started = time.perf_counter()
+            for snippet in snippets:
+                highlighting.highlight(snippet, 'python')
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'{ratio:>10.2f} {elapsed:>12.1f} {elapsed / total:>16.3f}')
+        cache.clear()
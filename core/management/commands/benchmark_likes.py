@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core import like_buffer, likes
+from core.models import User, Post, Like
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность синхронной и отложенной записи лайков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--likes', type=int, default=2000, help='Сколько лайков поставить в каждом режиме')
+        parser.add_argument('--batch', type=int, default=500, help='Размер пачки в отложенном режиме')
+
+    def handle(self, *args, **options):
+        total = options['likes']
+        batch = options['batch']
+
+        author = User.objects.create(username='likebench-author', email='likebench-author@example.com')
+        User.objects.bulk_create([
+            User(username=f'likebench-{i}', email=f'likebench-{i}@example.com') for i in range(total)
+        ])
+        fans = list(User.objects.filter(username__startswith='likebench-').exclude(id=author.id))
+        try:
+            sync_rate = self.run(author, fans, buffered=False, batch=batch)
+            buffered_rate = self.run(author, fans, buffered=True, batch=batch)
+        finally:
+            User.objects.filter(username__startswith='likebench-').delete()
+
+        self.stdout.write(f'sync:     {sync_rate:10.0f} likes/s')
+        self.stdout.write(f'buffered: {buffered_rate:10.0f} likes/s')
+        self.stdout.write(self.style.SUCCESS(f'speedup:  {buffered_rate / sync_rate:10.1f}x'))
+
+    def run(self, author, fans, buffered, batch):
+        post = Post.objects.create(user=author, title='likebench', content='likebench')
+        with override_settings(LIKES_BUFFER_ENABLED=buffered, LIKES_BUFFER_AUTOFLUSH=False):
+            started = time.perf_counter()
+            for index, fan in enumerate(fans, start=1):
+                likes.add_like(fan, 'post', post.id)
+                if buffered and index % batch == 0:
+                    like_buffer.buffer.flush()
+            if buffered:
+                like_buffer.buffer.flush()
+            elapsed = time.perf_counter() - started
+
+        post.refresh_from_db()
+        stored = Like.objects.filter(target_type='post', target_id=post.id).count()
+        if post.likes_count != stored or stored != len(fans):
+            self.stderr.write(f'counter mismatch: likes_count={post.likes_count}, rows={stored}')
+        Like.objects.filter(target_type='post', target_id=post.id).delete()
+        post.delete()
+        return len(fans) / elapsed
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core import code_blobs
+
+
+class Command(BaseCommand):
+    help = 'Отчёт об экономии места хранилищем кода; --prune удаляет blob\'ы без ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help='Удалить неиспользуемые blob\'ы')
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            deleted, _ = code_blobs.unreferenced().delete()
+            self.stdout.write(f'удалено неиспользуемых blob\'ов: {deleted}')
+
+        stats = code_blobs.report()
+        self.stdout.write(f'ссылок на код:    {stats["references"]}')
+        self.stdout.write(f'уникальных blob:  {stats["blobs"]}')
+        self.stdout.write(f'байт без дедупликации: {stats["logical_bytes"]}')
+        self.stdout.write(f'байт хранится:         {stats["stored_bytes"]}')
+        self.stdout.write(self.style.SUCCESS(f'сэкономлено байт:      {stats["saved_bytes"]}'))
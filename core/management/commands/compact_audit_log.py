@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import audit
+
+
+class Command(BaseCommand):
+    help = 'Сворачивает старые записи журнала администраторов в дневные агрегаты и удаляет их'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.AUDIT_RETENTION_DAYS,
+                            help='Сворачивать записи старше стольких дней')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не меняя')
+
+    def handle(self, *args, **options):
+        audit.buffer.flush()
+        compacted = audit.compact(options['days'], dry_run=options['dry_run'])
+        for day, count in sorted(compacted.items()):
+            self.stdout.write(f'  {day}: {count}')
+        total = sum(compacted.values())
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'будет свёрнуто записей: {total} (dry run)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'свёрнуто записей: {total} за {len(compacted)} дн.'))
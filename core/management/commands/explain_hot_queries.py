@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import query_plans
+
+
+class Command(BaseCommand):
+    help = 'Показывает планы горячих запросов и отмечает полные сканы таблиц'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Печатать план каждого запроса')
+        parser.add_argument('--strict', action='store_true', help='Завершиться с ошибкой, если есть полные сканы')
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for name, plan, scans in query_plans.check_all():
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.ERROR(f'SCAN  {name}'))
+                for line in scans:
+                    self.stdout.write(f'      {line}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK    {name}'))
+            if options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'      | {line}')
+
+        if flagged and options['strict']:
+            raise CommandError(f'{flagged} hot queries scan a whole table')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает доски рейтинга из ProfileView, счётчиков пользователей, лайков и журнала Rating'
+
+    def handle(self, *args, **options):
+        for board, members in sorted(leaderboard.rebuild().items()):
+            self.stdout.write(self.style.SUCCESS(f'{board}: {members}'))
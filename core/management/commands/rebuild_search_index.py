@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core import search
+from core.models import Post, Course
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт полнотекстовый индекс постов и курсов с нуля'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write('Полнотекстовый индекс поддерживается только на SQLite, пропускаем')
+            return
+        for model in (Post, Course):
+            count = search.rebuild_index(model)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: проиндексировано {count}'
+            ))
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import ratings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает баллы и рейтинг всех пользователей из исходных событий пакетными UPDATE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Показать изменения, ничего не записывая')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Пользователей на один UPDATE')
+        parser.add_argument('--weight', action='append', default=[], metavar='SOURCE=POINTS',
+                            help='Переопределить вес события, например --weight post_likes=1')
+        parser.add_argument('--show', type=int, default=20, help='Сколько изменений вывести при --dry-run')
+
+    def handle(self, *args, **options):
+        weights = dict(settings.RATING_WEIGHTS)
+        for item in options['weight']:
+            name, _, value = item.partition('=')
+            try:
+                weights[name] = int(value)
+            except ValueError:
+                raise CommandError(f'Bad weight: {item}')
+        try:
+            ratings.points_expression(weights)
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write('веса: ' + ', '.join(f'{name}={weight}' for name, weight in weights.items()))
+
+        if options['dry_run']:
+            changes = ratings.diff(weights)
+            for user_id, username, (old_points, old_rating), (new_points, new_rating) in changes[:options['show']]:
+                self.stdout.write(f'{user_id:>8} {username:<24} баллы {old_points:>3} -> {new_points:<3} '
+                                  f'рейтинг {old_rating:>2} -> {new_rating}')
+            self.stdout.write(self.style.WARNING(f'изменится профилей: {len(changes)} (dry run, ничего не записано)'))
+            return
+
+        started = time.perf_counter()
+        updated = ratings.recompute(
+            weights, options['chunk_size'],
+            progress=lambda done, total: self.stdout.write(f'  {done}/{total}'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'пересчитано профилей: {updated} за {time.perf_counter() - started:.2f} с'
+        ))
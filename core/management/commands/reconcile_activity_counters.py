@@ -0,0 +1,28 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from core import activity
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики активности пользователей из исходных таблиц и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения')
+        parser.add_argument('--show', type=int, default=20, help='Сколько пользователей с расхождениями вывести')
+
+    def handle(self, *args, **options):
+        found = activity.drift() if options['dry_run'] else activity.reconcile()
+
+        for user_id, wrong in list(found.items())[:options['show']]:
+            fields = ', '.join(f'{field} {current} -> {expected}' for field, (current, expected) in wrong.items())
+            self.stdout.write(f'{user_id:>8}: {fields}')
+        per_field = Counter(field for wrong in found.values() for field in wrong)
+        for field in activity.FIELDS:
+            self.stdout.write(f'{field:<18} расхождений: {per_field[field]}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'пользователей с расхождениями: {len(found)} (dry run, ничего не записано)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'исправлено пользователей: {len(found)}'))
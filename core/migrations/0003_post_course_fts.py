@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# Полнотекстовые FTS5-индексы для постов и курсов (только SQLite).
+# Индексы внешние (content=...), синхронизируются триггерами.
+FTS_SOURCES = [
+    ('core_post_fts', 'core_post'),
+    ('core_course_fts', 'core_course'),
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, source in FTS_SOURCES:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            f"title, content, content='{source}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {table}(rowid, title, content) VALUES (new.id, new.title, new.content); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {table}({table}, rowid, title, content) "
+            f"VALUES ('delete', old.id, old.title, old.content); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF title, content ON {source} BEGIN "
+            f"INSERT INTO {table}({table}, rowid, title, content) "
+            f"VALUES ('delete', old.id, old.title, old.content); "
+            f"INSERT INTO {table}(rowid, title, content) VALUES (new.id, new.title, new.content); END"
+        )
+        schema_editor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, _ in FTS_SOURCES:
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_profileview_total_points"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
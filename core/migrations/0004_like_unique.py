@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-17 20:43
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    # До уникального индекса get_or_create мог вставить дубли при гонке
+    Like = apps.get_model("core", "Like")
+    duplicates = (
+        Like.objects.values("user_id", "target_type", "target_id")
+        .annotate(first_id=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        Like.objects.filter(
+            user_id=row["user_id"],
+            target_type=row["target_type"],
+            target_id=row["target_id"],
+        ).exclude(id=row["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_post_course_fts"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="like",
+            constraint=models.UniqueConstraint(
+                fields=("user", "target_type", "target_id"), name="unique_like"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.4 on 2026-10-17 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_like_unique"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(fields=["created_at", "id"], name="course_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="like",
+            index=models.Index(fields=["target_type", "target_id"], name="like_target_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["chat", "created_at", "id"], name="message_chat_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                condition=models.Q(("is_read", False)),
+                fields=["receiver", "chat"],
+                name="message_unread_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["created_at", "id"], name="post_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["likes_count", "id"], name="post_likes_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["is_resolved", "created_at", "id"], name="post_resolved_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(fields=["status", "created_at", "id"], name="report_status_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="userwarning",
+            index=models.Index(fields=["user", "is_accepted"], name="warning_user_accepted_idx"),
+        ),
+    ]
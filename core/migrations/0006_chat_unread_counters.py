@@ -0,0 +1,45 @@
+# Generated by Django 5.0.4 on 2026-10-17 20:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread(apps, schema_editor):
+    Chat = apps.get_model("core", "Chat")
+    Message = apps.get_model("core", "Message")
+
+    def unread_for(side):
+        counts = (
+            Message.objects.filter(chat=OuterRef("pk"), receiver=OuterRef(side), is_read=False)
+            .values("chat")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    Chat.objects.update(
+        user1_unread_cnt=unread_for("user1"),
+        user2_unread_cnt=unread_for("user2"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chat",
+            name="user1_unread_cnt",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="chat",
+            name="user2_unread_cnt",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread, migrations.RunPython.noop),
+    ]
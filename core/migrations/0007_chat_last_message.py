@@ -0,0 +1,52 @@
+# Generated by Django 5.0.4 on 2026-10-17 20:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_message(apps, schema_editor):
+    Chat = apps.get_model("core", "Chat")
+    Message = apps.get_model("core", "Message")
+    latest = Message.objects.filter(chat=OuterRef("pk")).order_by("-created_at", "-id")
+    Chat.objects.update(
+        last_message=Subquery(latest.values("id")[:1]),
+        last_activity_at=Coalesce(Subquery(latest.values("created_at")[:1]), F("created_at")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_chat_unread_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chat",
+            name="last_activity_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="chat",
+            name="last_message",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="core.message",
+            ),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(fields=["user1", "last_activity_at", "id"], name="chat_user1_activity_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(fields=["user2", "last_activity_at", "id"], name="chat_user2_activity_idx"),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.0.4 on 2026-10-17 21:10
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least
+
+
+def merge_duplicate_chats(apps, schema_editor):
+    # Без уникального индекса параллельные «начать чат» создавали по два чата на пару
+    Chat = apps.get_model("core", "Chat")
+    Message = apps.get_model("core", "Message")
+    Like = apps.get_model("core", "Like")
+    Report = apps.get_model("core", "Report")
+    Call = apps.get_model("core", "Call")
+
+    # Чаты с самим собой нарушили бы chat_pair_ordered; сообщения и звонки уходят каскадом
+    self_chats = list(Chat.objects.filter(user1_id=F("user2_id")).values_list("id", flat=True))
+    Like.objects.filter(target_type="chat", target_id__in=self_chats).delete()
+    Chat.objects.filter(id__in=self_chats).delete()
+
+    pairs = (
+        Chat.objects.annotate(low=Least("user1_id", "user2_id"), high=Greatest("user1_id", "user2_id"))
+        .values("low", "high")
+        .annotate(total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for pair in pairs:
+        ids = list(
+            Chat.objects.filter(
+                Q(user1_id=pair["low"], user2_id=pair["high"]) | Q(user1_id=pair["high"], user2_id=pair["low"])
+            )
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+        )
+        keeper, duplicates = ids[0], ids[1:]
+        Message.objects.filter(chat_id__in=duplicates).update(chat_id=keeper)
+        Call.objects.filter(chat_id__in=duplicates).update(chat_id=keeper)
+        Report.objects.filter(reporting_target_type="chat", reporting_target_id__in=duplicates).update(
+            reporting_target_id=keeper
+        )
+        # Лайк одного пользователя на оба дубля схлопывается в один
+        liked = set(Like.objects.filter(target_type="chat", target_id=keeper).values_list("user_id", flat=True))
+        for like in Like.objects.filter(target_type="chat", target_id__in=duplicates).order_by("id"):
+            if like.user_id in liked:
+                like.delete()
+            else:
+                liked.add(like.user_id)
+                like.target_id = keeper
+                like.save(update_fields=["target_id"])
+        Chat.objects.filter(id__in=duplicates).delete()
+        Chat.objects.filter(id=keeper).update(chat_likes_cnt=len(liked))
+
+    # Пересчитываем денормализованные поля слитых чатов и упорядочиваем пары
+    def unread_for(side):
+        counts = (
+            Message.objects.filter(chat=OuterRef("pk"), receiver=OuterRef(side), is_read=False)
+            .values("chat")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(counts), 0)
+
+    latest = Message.objects.filter(chat=OuterRef("pk")).order_by("-created_at", "-id")
+    Chat.objects.filter(user1_id__gt=F("user2_id")).update(
+        user1_id=F("user2_id"),
+        user2_id=F("user1_id"),
+    )
+    Chat.objects.update(
+        user1_unread_cnt=unread_for("user1"),
+        user2_unread_cnt=unread_for("user2"),
+        last_message=Subquery(latest.values("id")[:1]),
+        last_activity_at=Coalesce(Subquery(latest.values("created_at")[:1]), F("created_at")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_chat_last_message"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_chats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="chat",
+            constraint=models.UniqueConstraint(fields=("user1", "user2"), name="unique_chat_pair"),
+        ),
+        migrations.AddConstraint(
+            model_name="chat",
+            constraint=models.CheckConstraint(check=models.Q(("user1__lt", models.F("user2"))), name="chat_pair_ordered"),
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 5.0.4 on 2026-10-17 21:25
+
+import hashlib
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# Модель -> старое текстовое поле с кодом
+CODE_FIELDS = {
+    "code": "code_content",
+    "post": "code",
+    "comment": "code",
+    "course": "code",
+}
+
+
+def normalize(text):
+    # Та же нормализация, что в core.code_blobs.normalize: только переводы строк,
+    # иначе сдвинутся номера строк Code и CodeComment
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def count_lines(text):
+    return text.count("\n") + (0 if text.endswith("\n") else 1)
+
+
+def move_code_to_blobs(apps, schema_editor):
+    CodeBlob = apps.get_model("core", "CodeBlob")
+    blob_ids = {}
+    for model_name, field in CODE_FIELDS.items():
+        model = apps.get_model("core", model_name)
+        rows_by_blob = {}
+        for row_id, text in model.objects.exclude(**{field: ""}).values_list("id", field).iterator():
+            normalized = normalize(text)
+            if not normalized.strip():
+                continue
+            digest = hashlib.sha256(normalized.encode()).hexdigest()
+            if digest not in blob_ids:
+                blob_ids[digest] = CodeBlob.objects.create(
+                    hash=digest,
+                    content=normalized,
+                    size=len(normalized.encode()),
+                    line_count=count_lines(normalized),
+                ).id
+            rows_by_blob.setdefault(blob_ids[digest], []).append(row_id)
+        for blob_id, row_ids in rows_by_blob.items():
+            model.objects.filter(id__in=row_ids).update(code_blob_id=blob_id)
+    # Code с пустым текстом не может остаться без blob'а
+    Code = apps.get_model("core", "Code")
+    if Code.objects.filter(code_blob__isnull=True).exists():
+        empty, _ = CodeBlob.objects.get_or_create(
+            hash=hashlib.sha256(b"").hexdigest(), defaults={"content": "", "size": 0, "line_count": 1}
+        )
+        Code.objects.filter(code_blob__isnull=True).update(code_blob=empty)
+
+
+def move_blobs_to_code(apps, schema_editor):
+    for model_name, field in CODE_FIELDS.items():
+        model = apps.get_model("core", model_name)
+        for row in model.objects.filter(code_blob__isnull=False).select_related("code_blob").iterator():
+            setattr(row, field, row.code_blob.content)
+            row.save(update_fields=[field])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_chat_canonical_pair"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CodeBlob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("hash", models.CharField(max_length=64, unique=True)),
+                ("content", models.TextField()),
+                ("size", models.IntegerField()),
+                ("line_count", models.IntegerField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="code",
+            name="code_blob",
+            field=models.ForeignKey(
+                null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="core.codeblob"
+            ),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="code_blob",
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="core.codeblob"
+            ),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="code_blob",
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="core.codeblob"
+            ),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="code_blob",
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name="+", to="core.codeblob"
+            ),
+        ),
+        migrations.RunPython(move_code_to_blobs, move_blobs_to_code),
+        migrations.AlterField(
+            model_name="code",
+            name="code_blob",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name="+", to="core.codeblob"),
+        ),
+        # Значение по умолчанию нужно только для отката: колонка возвращается пустой и заполняется из blob'ов
+        migrations.AlterField(
+            model_name="code",
+            name="code_content",
+            field=models.TextField(default=""),
+        ),
+        migrations.RemoveField(
+            model_name="code",
+            name="code_content",
+        ),
+        migrations.RemoveField(
+            model_name="comment",
+            name="code",
+        ),
+        migrations.RemoveField(
+            model_name="course",
+            name="code",
+        ),
+        migrations.RemoveField(
+            model_name="post",
+            name="code",
+        ),
+    ]
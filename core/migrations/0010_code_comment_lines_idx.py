@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-17 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_code_blobs"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="codecomment",
+            index=models.Index(fields=["code", "start_line", "end_line"], name="codecomment_lines_idx"),
+        ),
+    ]
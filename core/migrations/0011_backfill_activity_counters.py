@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+# Поле User -> (модель, агрегат) на момент миграции; дальше счётчики ведёт core/activity.py
+COUNTERS = {
+    "total_questions": ("post", Count("id")),
+    "total_answers": ("comment", Count("id")),
+    "post_likes_cnt": ("post", Sum("likes_count")),
+    "comment_likes_cnt": ("comment", Sum("likes_count")),
+    "course_likes_cnt": ("course", Sum("likes_count")),
+}
+
+
+def backfill_counters(apps, schema_editor):
+    User = apps.get_model("core", "User")
+    updates = {}
+    for field, (model_name, aggregate) in COUNTERS.items():
+        model = apps.get_model("core", model_name)
+        totals = (
+            model.objects.filter(user=OuterRef("pk")).order_by().values("user").annotate(total=aggregate).values("total")
+        )
+        updates[field] = Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+    User.objects.update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_code_comment_lines_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,128 @@
+# Generated by Django 5.0.4 on 2026-10-17 21:26
+
+import math
+from datetime import datetime, timedelta, timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Формула приоритета core.moderation.priority на момент миграции
+REPORTS_WEIGHT = 10.0
+POPULARITY_WEIGHT = 3.0
+AGE_STEP = timedelta(hours=1)
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+TARGET_POPULARITY = {
+    "post": ("post", "likes_count"),
+    "comment": ("comment", "likes_count"),
+    "course": ("course", "likes_count"),
+    "chat": ("chat", "chat_likes_cnt"),
+    "user": ("user", "post_likes_cnt"),
+}
+
+
+def priority(reports_count, popularity, first_reported_at):
+    waited = (first_reported_at - EPOCH) / AGE_STEP
+    return REPORTS_WEIGHT * math.log2(1 + reports_count) + POPULARITY_WEIGHT * math.log2(1 + max(popularity, 0)) - waited
+
+
+def coalesce_pending_reports(apps, schema_editor):
+    Report = apps.get_model("core", "Report")
+    ModerationItem = apps.get_model("core", "ModerationItem")
+    targets = (
+        Report.objects.filter(status="pending")
+        .order_by()
+        .values("reporting_target_type", "reporting_target_id")
+        .annotate(
+            count=models.Count("id"),
+            first=models.Min("created_at"),
+            last=models.Max("created_at"),
+        )
+    )
+    for target in targets.iterator():
+        target_type, target_id = target["reporting_target_type"], target["reporting_target_id"]
+        popularity = 0
+        if target_type in TARGET_POPULARITY:
+            model_name, field = TARGET_POPULARITY[target_type]
+            model = apps.get_model("core", model_name)
+            popularity = model.objects.filter(id=target_id).values_list(field, flat=True).first() or 0
+        item = ModerationItem.objects.create(
+            target_type=target_type,
+            target_id=target_id,
+            reports_count=target["count"],
+            popularity=popularity,
+            priority=priority(target["count"], popularity, target["first"]),
+            first_reported_at=target["first"],
+            last_reported_at=target["last"],
+        )
+        Report.objects.filter(
+            status="pending", reporting_target_type=target_type, reporting_target_id=target_id
+        ).update(item=item)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_backfill_activity_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ModerationItem",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("target_type", models.TextField()),
+                ("target_id", models.IntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("pending", "Pending"), ("resolved", "Resolved"), ("rejected", "Rejected")],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("reports_count", models.IntegerField(default=0)),
+                ("popularity", models.IntegerField(default=0)),
+                ("priority", models.FloatField(default=0)),
+                ("first_reported_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("last_reported_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("resolved_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "processed_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="report",
+            name="item",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="reports",
+                to="core.moderationitem",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="moderationitem",
+            index=models.Index(fields=["status", "-priority", "-id"], name="moderation_queue_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="moderationitem",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "pending")),
+                fields=("target_type", "target_id"),
+                name="moderation_item_pending_target",
+            ),
+        ),
+        migrations.RunPython(coalesce_pending_reports, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.4 on 2026-10-17 21:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Тип действия -> тип цели target_id у записей, сделанных до миграции
+TARGET_TYPES = {
+    "report_processed": "report",
+    "warning_created": "user",
+    "user_blocked": "user",
+    "user_banned": "user",
+    "moderation_item_processed": "moderation_item",
+}
+
+
+def details_to_data(apps, schema_editor):
+    AdminAction = apps.get_model("core", "AdminAction")
+    for action_type, target_type in TARGET_TYPES.items():
+        AdminAction.objects.filter(action_type=action_type).update(target_type=target_type)
+    # Старый текст сохраняем как есть: разобрать его надёжно нельзя
+    actions = AdminAction.objects.exclude(details="").only("id", "details")
+    for action in actions.iterator(chunk_size=2000):
+        AdminAction.objects.filter(id=action.id).update(data={"details": action.details})
+
+
+def data_to_details(apps, schema_editor):
+    AdminAction = apps.get_model("core", "AdminAction")
+    for action in AdminAction.objects.only("id", "data").iterator(chunk_size=2000):
+        AdminAction.objects.filter(id=action.id).update(details=action.data.get("details", ""))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_moderation_queue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="adminaction",
+            name="data",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="adminaction",
+            name="target_type",
+            field=models.TextField(default=""),
+        ),
+        # Значение по умолчанию нужно только для отката: колонка возвращается пустой и заполняется из data
+        migrations.AlterField(
+            model_name="adminaction",
+            name="details",
+            field=models.TextField(default=""),
+        ),
+        migrations.RunPython(details_to_data, data_to_details),
+        migrations.RemoveField(
+            model_name="adminaction",
+            name="details",
+        ),
+        migrations.AddIndex(
+            model_name="adminaction",
+            index=models.Index(fields=["created_at", "id"], name="adminaction_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="adminaction",
+            index=models.Index(fields=["admin", "created_at", "id"], name="adminaction_admin_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="adminaction",
+            index=models.Index(fields=["action_type", "created_at", "id"], name="adminaction_type_created_idx"),
+        ),
+        migrations.CreateModel(
+            name="AdminActionDaily",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("action_type", models.TextField()),
+                ("count", models.IntegerField(default=0)),
+                ("admin", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="core.admin")),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="adminactiondaily",
+            constraint=models.UniqueConstraint(fields=("day", "admin", "action_type"), name="adminactiondaily_unique_key"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.4 on 2026-10-17 22:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_warning_counter(apps, schema_editor):
+    User = apps.get_model("core", "User")
+    UserWarning = apps.get_model("core", "UserWarning")
+    totals = (
+        UserWarning.objects.filter(user=OuterRef("pk"), is_accepted=True)
+        .order_by()
+        .values("user")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    User.objects.update(active_warnings_cnt=Coalesce(Subquery(totals, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_structured_audit_log"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="active_warnings_cnt",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="muted_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_warning_counter, migrations.RunPython.noop),
+    ]
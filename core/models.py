@@ -14,6 +14,22 @@ class User(AbstractUser):
     comment_likes_cnt = models.IntegerField(default=0)
     course_likes_cnt = models.IntegerField(default=0)
     chat_help_likes_cnt = models.IntegerField(default=0)
+    # Принятые предупреждения и автоматический мут (core/sanctions.py)
+    active_warnings_cnt = models.IntegerField(default=0)
+    muted_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        # Каталог пользователей в админке (core/directory.py); username уже уникален и индексирован
+        indexes = [
+            models.Index(fields=['date_joined', 'id'], name='user_joined_idx'),
+            models.Index(fields=['role', 'date_joined', 'id'], name='user_role_joined_idx'),
+            models.Index(fields=['active_warnings_cnt', 'id'], name='user_warnings_idx'),
+            models.Index(fields=['email'], name='user_email_idx'),
+            models.Index(fields=['date_joined', 'id'], condition=models.Q(is_blocked=True),
+                         name='user_blocked_joined_idx'),
+            models.Index(fields=['date_joined', 'id'], condition=models.Q(is_active=False),
+                         name='user_banned_joined_idx'),
+        ]
 
     def __str__(self):
         return self.username
@@ -28,15 +44,78 @@ class Admin(models.Model):
         return f"Admin: {self.user.username}"
 
 class AdminAction(models.Model):
+    """Запись журнала действий администраторов; журнал только дописывается (см. core/audit.py)."""
     admin = models.ForeignKey(Admin, on_delete=models.CASCADE)
     action_type = models.TextField()
+    target_type = models.TextField(default='')
     target_id = models.IntegerField()
-    details = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Выборки по диапазону времени: вся история, по администратору и по типу действия
+            models.Index(fields=['created_at', 'id'], name='adminaction_created_idx'),
+            models.Index(fields=['admin', 'created_at', 'id'], name='adminaction_admin_created_idx'),
+            models.Index(fields=['action_type', 'created_at', 'id'], name='adminaction_type_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.action_type} by {self.admin.user.username}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('AdminAction entries are append-only')
+        super().save(*args, **kwargs)
+
+class AdminActionDaily(models.Model):
+    """Свёртка старых записей журнала: число действий администратора за день по типам."""
+    day = models.DateField()
+    admin = models.ForeignKey(Admin, on_delete=models.CASCADE)
+    action_type = models.TextField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'admin', 'action_type'], name='adminactiondaily_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.action_type}: {self.count}"
+
+class ModerationItem(models.Model):
+    """Элемент очереди модерации: все ожидающие жалобы на одну цель (см. core/moderation.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('resolved', 'Resolved'),
+        ('rejected', 'Rejected'),
+    ]
+
+    target_type = models.TextField()
+    target_id = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    reports_count = models.IntegerField(default=0)
+    popularity = models.IntegerField(default=0)  # Лайки цели на момент последней жалобы
+    priority = models.FloatField(default=0)
+    first_reported_at = models.DateTimeField(default=timezone.now)
+    last_reported_at = models.DateTimeField(default=timezone.now)
+    processed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Жалобы на цель копятся в одном открытом элементе; после решения новые жалобы открывают новый
+            models.UniqueConstraint(fields=['target_type', 'target_id'], condition=models.Q(status='pending'),
+                                    name='moderation_item_pending_target'),
+        ]
+        indexes = [
+            # Очередь: WHERE status = 'pending' ORDER BY priority DESC, id DESC с курсором по тому же ключу
+            models.Index(fields=['status', '-priority', '-id'], name='moderation_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.target_type} #{self.target_id}: {self.reports_count} reports"
+
 class Report(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -53,20 +132,66 @@ class Report(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     processed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reports_processed')
     resolved_at = models.DateTimeField(null=True, blank=True)
+    item = models.ForeignKey(ModerationItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='reports')
+
+    class Meta:
+        indexes = [
+            # Очередь модерации: фильтр по статусу и сортировка по возрасту из одного индекса
+            models.Index(fields=['status', 'created_at', 'id'], name='report_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Report by {self.reporting_user.username} on {self.reporting_target_type}"
 
+class CodeBlob(models.Model):
+    """Уникальный текст кода; одинаковые фрагменты ссылаются на один blob (см. core/code_blobs.py)."""
+    hash = models.CharField(max_length=64, unique=True)
+    content = models.TextField()
+    size = models.IntegerField()
+    line_count = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.hash[:12]
+
+def blob_text(field):
+    """Свойство с текстом кода поверх ссылки на CodeBlob.
+
+    Присвоенный текст запоминается и превращается в ссылку при сохранении,
+    поэтому ``Post(code='...')`` и ``post.code = '...'`` работают как с обычным полем.
+    """
+    pending = f'_{field}_text'
+
+    def getter(self):
+        if pending in self.__dict__:
+            return self.__dict__[pending]
+        if getattr(self, f'{field}_id') is None:
+            return ''
+        return getattr(self, field).content
+
+    def setter(self, value):
+        self.__dict__[pending] = value or ''
+
+    return property(getter, setter)
+
 class Post(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.TextField()
     content = models.TextField()
     image_url = models.TextField(blank=True)
-    code = models.TextField(blank=True)
+    code_blob = models.ForeignKey(CodeBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    code = blob_text('code_blob')
     likes_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
     is_resolved = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='post_created_idx'),
+            models.Index(fields=['likes_count', 'id'], name='post_likes_idx'),
+            models.Index(fields=['is_resolved', 'created_at', 'id'], name='post_resolved_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -74,7 +199,8 @@ class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
-    code = models.TextField(blank=True)
+    code_blob = models.ForeignKey(CodeBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    code = blob_text('code_blob')
     image_url = models.TextField(blank=True)
     likes_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
@@ -97,10 +223,16 @@ class Course(models.Model):
     title = models.TextField()
     image_url = models.TextField(blank=True)
     content = models.TextField()
-    code = models.TextField(blank=True)
+    code_blob = models.ForeignKey(CodeBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    code = blob_text('code_blob')
     likes_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='course_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -108,8 +240,25 @@ class Chat(models.Model):
     user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats_as_user1')
     user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats_as_user2')
     chat_likes_cnt = models.IntegerField(default=0)
+    # Непрочитанные сообщения для каждого участника (см. core/chats.py)
+    user1_unread_cnt = models.IntegerField(default=0)
+    user2_unread_cnt = models.IntegerField(default=0)
+    # Последнее сообщение и время последней активности для списка диалогов
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity_at = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        # Пара хранится упорядоченной: user1_id < user2_id (см. chats.get_or_create_chat)
+        constraints = [
+            models.UniqueConstraint(fields=['user1', 'user2'], name='unique_chat_pair'),
+            models.CheckConstraint(check=models.Q(user1__lt=models.F('user2')), name='chat_pair_ordered'),
+        ]
+        indexes = [
+            models.Index(fields=['user1', 'last_activity_at', 'id'], name='chat_user1_activity_idx'),
+            models.Index(fields=['user2', 'last_activity_at', 'id'], name='chat_user2_activity_idx'),
+        ]
+
     def __str__(self):
         return f"Chat between {self.user1.username} and {self.user2.username}"
 
@@ -123,6 +272,14 @@ class Message(models.Model):
     is_code = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['chat', 'created_at', 'id'], name='message_chat_created_idx'),
+            # Непрочитанные входящие — небольшая часть таблицы
+            models.Index(fields=['receiver', 'chat'], name='message_unread_idx',
+                         condition=models.Q(is_read=False)),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender.username} to {self.receiver.username}"
 
@@ -130,7 +287,8 @@ class Code(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='code_snippets')
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name='code_snippets')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    code_content = models.TextField()
+    code_blob = models.ForeignKey(CodeBlob, on_delete=models.PROTECT, related_name='+')
+    code_content = blob_text('code_blob')
     message = models.ForeignKey(Message, on_delete=models.CASCADE, null=True, blank=True)
     language = models.TextField()
     start_line = models.IntegerField()
@@ -149,6 +307,12 @@ class CodeComment(models.Model):
     end_line = models.IntegerField()
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Пересечение с диапазоном строк: start_line <= до AND end_line >= от
+            models.Index(fields=['code', 'start_line', 'end_line'], name='codecomment_lines_idx'),
+        ]
+
     def __str__(self):
         return f"Code Comment by {self.user.username}"
 
@@ -160,6 +324,10 @@ class Rating(models.Model):
     def __str__(self):
         return f"Rating for {self.user.username}: {self.score}"
 
+# Шкала рейтинга: сырые баллы ограничены POINTS_CAP, рейтинг = round(баллы / POINTS_PER_RATING)
+POINTS_CAP = 60
+POINTS_PER_RATING = 4
+
 class ProfileView(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     rating = models.IntegerField(default=0)  # Рейтинг в брс (0–15)
@@ -170,10 +338,10 @@ class ProfileView(models.Model):
 
     def update_rating(self):
         # Ограничиваем сырые баллы до 60
-        self.total_points = min(self.total_points, 60)
+        self.total_points = min(self.total_points, POINTS_CAP)
         # Пересчитываем рейтинг в брс: баллы * 0.25, округление
-        self.rating = round(self.total_points * 0.25)
-        self.save()
+        self.rating = round(self.total_points / POINTS_PER_RATING)
+        self.save(update_fields=['total_points', 'rating'])
 
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -181,6 +349,14 @@ class Like(models.Model):
     target_id = models.IntegerField()
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'target_type', 'target_id'], name='unique_like'),
+        ]
+        indexes = [
+            models.Index(fields=['target_type', 'target_id'], name='like_target_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} liked {self.target_type} {self.target_id}"
 
@@ -208,5 +384,10 @@ class UserWarning(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     is_accepted = models.BooleanField(null=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_accepted'], name='warning_user_accepted_idx'),
+        ]
+
     def __str__(self):
         return f"Warning to {self.user.username} by {self.admin.user.username}"
\ No newline at end of file
@@ -0,0 +1,194 @@
+# core/moderation.py
+#
+# Очередь модерации. Жалобы на одну цель (reporting_target_type, reporting_target_id)
+# сливаются в один ModerationItem со счётчиком жалоб; элементы упорядочены по
+# приоритету — число жалоб, популярность цели и время ожидания — и листаются
+# курсором по (priority, id). Решение по элементу закрывает все его жалобы одним UPDATE.
+#
+# Приоритет в момент now:
+#   REPORTS_WEIGHT * log2(1 + жалоб) + POPULARITY_WEIGHT * log2(1 + лайков) + (now - первая жалоба) / AGE_STEP.
+# Слагаемое now / AGE_STEP одинаково у всех элементов и на порядок не влияет, поэтому
+# хранится priority без него — значение меняется только при новой жалобе, и его можно индексировать.
+#
+# Массовые действия (bulk_*) применяют решение к списку жалоб или пользователей
+# в одной транзакции: UPDATE по id__in и одна пачка записей журнала (core/audit.py).
+
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import audit, profiles, sanctions
+from .models import Post, Comment, Course, Chat, User, Report, ModerationItem, UserWarning
+
+REPORTS_WEIGHT = 10.0
+POPULARITY_WEIGHT = 3.0
+# Час ожидания добавляет один пункт приоритета
+AGE_STEP = timedelta(hours=1)
+_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+# Больше целей за один запрос не принимаем
+MAX_BULK_SIZE = 1000
+# Столько принятых предупреждений нужно для блокировки (как в block_user)
+WARNINGS_TO_BLOCK = 3
+OPEN_STATUSES = ('pending', 'processing')
+
+# Тип цели -> (модель, поле популярности)
+TARGET_POPULARITY = {
+    'post': (Post, 'likes_count'),
+    'comment': (Comment, 'likes_count'),
+    'course': (Course, 'likes_count'),
+    'chat': (Chat, 'chat_likes_cnt'),
+    'user': (User, 'post_likes_cnt'),
+}
+
+
+def priority(reports_count, popularity, first_reported_at):
+    waited = (first_reported_at - _EPOCH) / AGE_STEP
+    return (
+        REPORTS_WEIGHT * math.log2(1 + reports_count)
+        + POPULARITY_WEIGHT * math.log2(1 + max(popularity, 0))
+        - waited
+    )
+
+
+def popularity_of(target_type, target_id):
+    if target_type not in TARGET_POPULARITY:
+        return 0
+    model, field = TARGET_POPULARITY[target_type]
+    return model.objects.filter(id=target_id).values_list(field, flat=True).first() or 0
+
+
+def queue():
+    """Открытые элементы в порядке приоритета — ключ для KeysetPagination."""
+    return ModerationItem.objects.filter(status='pending').order_by('-priority', '-id')
+
+
+def _pending_item(target_type, target_id):
+    return ModerationItem.objects.select_for_update().filter(
+        status='pending', target_type=target_type, target_id=target_id
+    ).first()
+
+
+def report_created(report):
+    """Новая жалоба (post_save): добавляет её в открытый элемент своей цели или открывает новый."""
+    popularity = popularity_of(report.reporting_target_type, report.reporting_target_id)
+    with transaction.atomic():
+        item = _pending_item(report.reporting_target_type, report.reporting_target_id)
+        if item is None:
+            try:
+                with transaction.atomic():
+                    item = ModerationItem.objects.create(
+                        target_type=report.reporting_target_type,
+                        target_id=report.reporting_target_id,
+                        first_reported_at=report.created_at,
+                        last_reported_at=report.created_at,
+                    )
+            except IntegrityError:
+                # Параллельная жалоба на ту же цель уже открыла элемент
+                item = _pending_item(report.reporting_target_type, report.reporting_target_id)
+        item.reports_count += 1
+        item.popularity = popularity
+        item.last_reported_at = max(item.last_reported_at, report.created_at)
+        item.priority = priority(item.reports_count, popularity, item.first_reported_at)
+        item.save(update_fields=['reports_count', 'popularity', 'last_reported_at', 'priority'])
+        Report.objects.filter(id=report.id).update(item=item)
+    report.item = item
+    return item
+
+
+def process(item, user, accept):
+    """Решение по элементу: все его ожидающие жалобы получают статус одним UPDATE.
+
+    Возвращает число закрытых жалоб.
+    """
+    status = 'resolved' if accept else 'rejected'
+    now = timezone.now()
+    with transaction.atomic():
+        closed = Report.objects.filter(item=item, status__in=OPEN_STATUSES).update(
+            status=status, processed_by=user, resolved_at=now
+        )
+        ModerationItem.objects.filter(id=item.id).update(status=status, processed_by=user, resolved_at=now)
+        audit.log(user, 'moderation_item_processed', 'moderation_item', [item.id], {
+            'status': status, 'target_type': item.target_type, 'target_id': item.target_id, 'reports_closed': closed,
+        })
+    item.status, item.processed_by, item.resolved_at = status, user, now
+    return closed
+
+
+def report_processed(report):
+    """Жалобу решили по одной (process_report): последняя решённая закрывает и элемент."""
+    if report.item_id is None:
+        return
+    if not Report.objects.filter(item_id=report.item_id, status__in=OPEN_STATUSES).exists():
+        ModerationItem.objects.filter(id=report.item_id, status='pending').update(
+            status=report.status, processed_by=report.processed_by, resolved_at=report.resolved_at
+        )
+
+
+def _results(ids, outcomes, default='not_found'):
+    return [{'id': target_id, 'result': outcomes.get(target_id, default)} for target_id in ids]
+
+
+def bulk_process_reports(report_ids, user, accept):
+    """Принимает или отклоняет жалобы по списку id. Уже решённые жалобы не трогает.
+
+    Элементы очереди, в которых не осталось открытых жалоб, закрываются тем же решением.
+    Возвращает [{'id', 'result'}] в порядке report_ids.
+    """
+    status = 'resolved' if accept else 'rejected'
+    now = timezone.now()
+    with transaction.atomic():
+        rows = Report.objects.select_for_update().filter(id__in=report_ids).values_list('id', 'status', 'item_id')
+        current = {report_id: (report_status, item_id) for report_id, report_status, item_id in rows}
+        open_ids = [report_id for report_id, (report_status, _) in current.items() if report_status in OPEN_STATUSES]
+        item_ids = {current[report_id][1] for report_id in open_ids} - {None}
+        Report.objects.filter(id__in=open_ids).update(status=status, processed_by=user, resolved_at=now)
+        ModerationItem.objects.filter(id__in=item_ids, status='pending').exclude(
+            Exists(Report.objects.filter(item=OuterRef('pk'), status__in=OPEN_STATUSES))
+        ).update(status=status, processed_by=user, resolved_at=now)
+        audit.log(user, 'report_processed', 'report', open_ids, {'status': status})
+
+    outcomes = {report_id: 'already_processed' for report_id in current}
+    outcomes.update({report_id: status for report_id in open_ids})
+    return _results(report_ids, outcomes)
+
+
+def bulk_warn(user_ids, admin, reason):
+    """Выдаёт принятое предупреждение каждому существующему пользователю из списка."""
+    with transaction.atomic():
+        users = list(User.objects.filter(id__in=user_ids).order_by('id').values_list('id', flat=True))
+        UserWarning.objects.bulk_create([
+            UserWarning(user_id=user_id, admin=admin, reason=reason, is_accepted=True) for user_id in users
+        ])
+        audit.log(admin, 'warning_created', 'user', users, {'reason': reason})
+        # bulk_create не вызывает сигналы, поэтому счётчик и пороги применяем сами
+        sanctions.warnings_changed(users, 1, admin)
+    return _results(user_ids, {user_id: 'warned' for user_id in users})
+
+
+def bulk_block(user_ids, user):
+    """Блокирует пользователей, у которых не меньше WARNINGS_TO_BLOCK принятых предупреждений."""
+    with transaction.atomic():
+        warned = dict(User.objects.filter(id__in=user_ids).order_by('id').values_list('id', 'active_warnings_cnt'))
+        users = list(warned)
+        blocked = [user_id for user_id in users if warned[user_id] >= WARNINGS_TO_BLOCK]
+        User.objects.filter(id__in=blocked).update(is_blocked=True)
+        audit.log(user, 'user_blocked', 'user', blocked)
+    # UPDATE не вызывает post_save, поэтому кэш профилей сбрасываем сами
+    profiles.invalidate_many(blocked)
+    outcomes = {user_id: 'not_enough_warnings' for user_id in users}
+    outcomes.update({user_id: 'blocked' for user_id in blocked})
+    return _results(user_ids, outcomes)
+
+
+def bulk_ban(user_ids, user):
+    """Деактивирует пользователей по списку id."""
+    with transaction.atomic():
+        users = list(User.objects.filter(id__in=user_ids).order_by('id').values_list('id', flat=True))
+        User.objects.filter(id__in=users).update(is_active=False)
+        audit.log(user, 'user_banned', 'user', users)
+    profiles.invalidate_many(users)
+    return _results(user_ids, {user_id: 'banned' for user_id in users})
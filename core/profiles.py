@@ -0,0 +1,98 @@
+# core/profiles.py
+#
+# Чтение профиля пользователя.
+# Пользователь, число постов/курсов/отзывов и рейтинг из ProfileView берутся
+# одним запросом (посты — User.total_questions из core/activity.py, курсы и
+# отзывы — коррелированные подзапросы, рейтинг — JOIN).
+# Собранный профиль с первой страницей отзывов и последними постами/курсами
+# кэшируется на PROFILE_CACHE_TIMEOUT; сигналы (core/signals.py) сбрасывают
+# его при изменении пользователя, его постов, курсов, отзывов о нём и рейтинга.
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import User, Post, Course, Review
+
+REVIEWS_PAGE_SIZE = 10
+# Сколько последних постов и курсов показывать на странице профиля
+RECENT_ITEMS = 5
+
+
+def cache_key(user_id):
+    return f'profile:{user_id}'
+
+
+def _count(model, field):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def profile_queryset():
+    return User.objects.select_related('profileview').annotate(
+        posts_count=F('total_questions'),
+        courses_count=_count(Course, 'user'),
+        reviews_count=_count(Review, 'target_user'),
+    )
+
+
+def rating_of(user):
+    profile_view = getattr(user, 'profileview', None)
+    return profile_view.rating if profile_view is not None else 0
+
+
+def reviews_page(user_id, page=1):
+    offset = (page - 1) * REVIEWS_PAGE_SIZE
+    reviews = Review.objects.filter(target_user_id=user_id).select_related('user').order_by('-created_at', '-id')
+    return list(reviews[offset:offset + REVIEWS_PAGE_SIZE])
+
+
+def _build(user_id):
+    user = profile_queryset().filter(id=user_id).first()
+    if user is None:
+        return None
+    return {
+        'user': user,
+        'reviews': reviews_page(user_id),
+        'recent_posts': list(Post.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:RECENT_ITEMS]),
+        'recent_courses': list(Course.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:RECENT_ITEMS]),
+    }
+
+
+def get_profile(user_id):
+    """Собранный профиль из кэша: user (с posts_count, courses_count,
+    reviews_count и profileview), первая страница reviews, recent_posts и
+    recent_courses. None, если пользователя нет.
+    """
+    key = cache_key(user_id)
+    profile = cache.get(key)
+    if profile is None:
+        profile = _build(user_id)
+        if profile is not None:
+            cache.set(key, profile, settings.PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+def invalidate_many(user_ids):
+    keys = [cache_key(user_id) for user_id in user_ids]
+    # Redis не принимает DEL без ключей
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate(user_id):
+    # Сбрасываем сразу и ещё раз после коммита, чтобы параллельное чтение
+    # между записью и коммитом не оставило в кэше старый профиль
+    key = cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
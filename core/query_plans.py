@@ -0,0 +1,143 @@
+# core/query_plans.py
+#
+# Реестр «горячих» запросов платформы и проверка их планов выполнения.
+# Каждый запрос описан фабрикой queryset'а той же формы, что строят представления;
+# команда explain_hot_queries прогоняет их через EXPLAIN и ищет полные сканы таблиц.
+
+import re
+
+from django.db import connection
+
+from . import directory
+from .models import Post, Course, Chat, Message, CodeComment, Report, ModerationItem, Like, Bookmark, UserWarning
+
+HOT_QUERIES = {}
+
+# Строки плана, означающие чтение всей таблицы
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)(?!.*\bVIRTUAL TABLE\b)'),
+    'postgresql': re.compile(r'\bSeq Scan\b'),
+    'mysql': re.compile(r'\btype: ALL\b'),
+}
+
+
+def register(name):
+    def decorator(factory):
+        HOT_QUERIES[name] = factory
+        return factory
+    return decorator
+
+
+def explain(queryset):
+    return queryset.explain()
+
+
+def full_scans(plan):
+    pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return []
+    return [line.strip() for line in plan.splitlines() if pattern.search(line)]
+
+
+def check_all():
+    """Возвращает список (имя, план, строки с полными сканами) для всех запросов реестра."""
+    results = []
+    for name, factory in HOT_QUERIES.items():
+        plan = explain(factory())
+        results.append((name, plan, full_scans(plan)))
+    return results
+
+
+@register('like: exists for user and target')
+def like_exists():
+    return Like.objects.filter(user_id=1, target_type='post', target_id=1)
+
+
+@register('like: all likes of a target')
+def likes_of_target():
+    return Like.objects.filter(target_type='post', target_id=1)
+
+
+@register('like: viewer flags for a page')
+def viewer_likes():
+    return Like.objects.filter(user_id=1, target_type='post', target_id__in=[1, 2, 3])
+
+
+@register('post: feed by date')
+def post_feed():
+    return Post.objects.order_by('-created_at', '-id')[:10]
+
+
+@register('post: feed by likes')
+def post_feed_by_likes():
+    return Post.objects.order_by('-likes_count', '-id')[:10]
+
+
+@register('post: resolved feed')
+def post_resolved_feed():
+    return Post.objects.filter(is_resolved=True).order_by('-created_at', '-id')[:10]
+
+
+@register('course: feed by date')
+def course_feed():
+    return Course.objects.order_by('-created_at', '-id')[:10]
+
+
+@register('chat: pair lookup')
+def chat_pair():
+    return Chat.objects.filter(user1_id=1, user2_id=2)
+
+
+@register('message: chat history')
+def chat_history():
+    return Message.objects.filter(chat_id=1).order_by('created_at', 'id')[:10]
+
+
+@register('message: unread for receiver')
+def unread_messages():
+    return Message.objects.filter(receiver_id=1, is_read=False)
+
+
+@register('code comment: overlapping lines')
+def overlapping_code_comments():
+    return CodeComment.objects.filter(code_id=1, start_line__lte=140, end_line__gte=120).order_by('start_line', 'end_line', 'id')
+
+
+@register('report: pending queue')
+def pending_reports():
+    return Report.objects.filter(status='pending').order_by('created_at', 'id')[:10]
+
+
+@register('moderation: queue page')
+def moderation_queue():
+    return ModerationItem.objects.filter(status='pending').order_by('-priority', '-id')[:10]
+
+
+@register('bookmark: user bookmarks')
+def user_bookmarks():
+    return Bookmark.objects.filter(user_id=1)
+
+
+@register('warning: accepted warnings of user')
+def accepted_warnings():
+    return UserWarning.objects.filter(user_id=1, is_accepted=True)
+
+
+@register('user directory: first page')
+def user_directory_page():
+    return directory.users()[:11]
+
+
+@register('user directory: by role')
+def user_directory_by_role():
+    return directory.users(role='admin')[:11]
+
+
+@register('user directory: blocked users')
+def user_directory_blocked():
+    return directory.users(blocked=True)[:11]
+
+
+@register('user directory: prefix search')
+def user_directory_search():
+    return directory.users(search='ivan')[:11]
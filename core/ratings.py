@@ -0,0 +1,136 @@
+# core/ratings.py
+#
+# Массовый пересчёт ProfileView.total_points и rating из исходных событий:
+# оценок за помощь в ЛС, полученных лайков и решённых постов. Веса событий
+# задаются RATING_WEIGHTS в настройках и меняются раз в семестр; пересчёт идёт
+# UPDATE'ами по диапазонам user_id, без загрузки строк в Python.
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Least, Mod
+from django.db.models.lookups import Exact, GreaterThan
+
+from . import leaderboard, profiles
+from .models import User, Post, ProfileView, POINTS_CAP, POINTS_PER_RATING
+
+
+def _per_user(queryset, aggregate, user_ref):
+    totals = queryset.filter(user=OuterRef(user_ref)).order_by().values('user').annotate(total=aggregate).values('total')
+    return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+
+def _user_column(column, user_ref):
+    # Счётчики User поддерживаются core/activity.py — читаем колонку, а не агрегируем
+    return Subquery(User.objects.filter(id=OuterRef(user_ref)).values(column)[:1])
+
+
+def source_terms(user_ref='user_id'):
+    """Событие -> выражение «сколько таких событий у пользователя»; user_ref — колонка с его id во внешнем запросе."""
+    return {
+        'chat_help': _user_column('chat_help_likes_cnt', user_ref),
+        'post_likes': _user_column('post_likes_cnt', user_ref),
+        'comment_likes': _user_column('comment_likes_cnt', user_ref),
+        'course_likes': _user_column('course_likes_cnt', user_ref),
+        'resolved_posts': _per_user(Post.objects.filter(is_resolved=True), Count('id'), user_ref),
+    }
+
+
+def points_expression(weights, user_ref='user_id'):
+    terms = source_terms(user_ref)
+    unknown = set(weights) - set(terms)
+    if unknown:
+        raise ValueError(f'Unknown rating sources: {", ".join(sorted(unknown))}')
+    total = Value(0)
+    for name, weight in weights.items():
+        if weight:
+            total = total + terms[name] * Value(weight)
+    return Least(Value(POINTS_CAP), total)
+
+
+def rating_expression(points):
+    # round(points / N) как в Python: половины округляются к чётному
+    quotient = points / Value(POINTS_PER_RATING)
+    remainder = Mod(points, Value(POINTS_PER_RATING))
+    half = POINTS_PER_RATING / 2
+    return quotient + Case(
+        When(GreaterThan(remainder * 2, Value(POINTS_PER_RATING)), then=Value(1)),
+        When(Exact(remainder, Value(half)) & Exact(Mod(quotient, Value(2)), Value(1)), then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def rating_for(points):
+    return round(points / POINTS_PER_RATING)
+
+
+def add_points(user_id, delta):
+    """Начисляет баллы одним UPDATE с F() (с потолком POINTS_CAP) и пересчитывает рейтинг.
+
+    Параллельные начисления не теряются. Возвращает новые баллы.
+    """
+    points = Least(F('total_points') + Value(delta), Value(POINTS_CAP))
+    with transaction.atomic():
+        ProfileView.objects.get_or_create(user_id=user_id)
+        ProfileView.objects.filter(user_id=user_id).update(total_points=points, rating=rating_expression(points))
+        total = ProfileView.objects.filter(user_id=user_id).values_list('total_points', flat=True).get()
+    # UPDATE не вызывает post_save, поэтому кэш профиля сбрасываем сами
+    profiles.invalidate(user_id)
+    return total
+
+
+def _chunks(chunk_size):
+    bounds = ProfileView.objects.order_by('user_id').values_list('user_id', flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return
+    for low in range(first, last + 1, chunk_size):
+        yield low, low + chunk_size
+
+
+def recompute(weights=None, chunk_size=5000, progress=None):
+    """Пересчитывает баллы и рейтинг всех пользователей и пересобирает доски лидеров.
+
+    Возвращает число обновлённых строк; progress(сделано, всего) вызывается после каждого диапазона.
+    """
+    weights = settings.RATING_WEIGHTS if weights is None else weights
+    points = points_expression(weights)
+    ProfileView.objects.bulk_create(
+        [ProfileView(user_id=user_id) for user_id in User.objects.filter(profileview__isnull=True).values_list('id', flat=True)],
+        ignore_conflicts=True,
+    )
+    total = ProfileView.objects.count()
+    done = 0
+    for low, high in _chunks(chunk_size):
+        rows = ProfileView.objects.filter(user_id__gte=low, user_id__lt=high)
+        with transaction.atomic():
+            updated = rows.update(total_points=points)
+            rows.update(rating=rating_expression(F('total_points')))
+        cache.delete_many([profiles.cache_key(user_id) for user_id in range(low, high)])
+        done += updated
+        if progress is not None:
+            progress(done, total)
+    leaderboard.rebuild()
+    return done
+
+
+def diff(weights=None):
+    """Что изменит recompute, без записи: список (user_id, username, было, станет) с баллами и рейтингом.
+
+    Пользователи без ProfileView считаются имеющими (0, 0) — recompute их создаст.
+    """
+    weights = settings.RATING_WEIGHTS if weights is None else weights
+    rows = (
+        User.objects.annotate(new_points=points_expression(weights, 'id'))
+        .order_by('id')
+        .values_list('id', 'username', 'profileview__total_points', 'profileview__rating', 'new_points')
+    )
+    changes = []
+    for user_id, username, old_points, old_rating, new_points in rows.iterator(chunk_size=5000):
+        old_points, old_rating = old_points or 0, old_rating or 0
+        new_rating = rating_for(new_points)
+        if (old_points, old_rating) != (new_points, new_rating):
+            changes.append((user_id, username, (old_points, old_rating), (new_points, new_rating)))
+    return changes
@@ -0,0 +1,11 @@
+from channels.routing import URLRouter
+from django.urls import path
+
+from . import consumers
+from .ws_auth import JWTAuthMiddlewareStack
+
+websocket_urlpatterns = [
+    path('ws/chats/<int:chat_id>/', consumers.ChatConsumer.as_asgi()),
+]
+
+websocket_application = JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
@@ -0,0 +1,79 @@
+# core/sanctions.py
+#
+# Санкции по предупреждениям. Число принятых предупреждений хранится в
+# User.active_warnings_cnt и меняется при записи UserWarning (сигналы и bulk_warn),
+# поэтому проверки перед блокировкой читают колонку, а не считают строки.
+# Когда счётчик растёт, escalate() сразу применяет пороги из настроек:
+# WARNING_MUTE_THRESHOLD — мут на WARNING_MUTE_HOURS часов (запрет писать в чаты),
+# WARNING_BLOCK_THRESHOLD — блокировка. Снятие предупреждения санкции не отменяет:
+# мут истекает сам, блокировку снимает администратор.
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import audit, profiles
+from .models import User
+
+
+def mute_threshold():
+    return getattr(settings, 'WARNING_MUTE_THRESHOLD', 3)
+
+
+def block_threshold():
+    return getattr(settings, 'WARNING_BLOCK_THRESHOLD', 5)
+
+
+def warnings_changed(user_ids, delta, admin=None):
+    """Меняет счётчик принятых предупреждений на delta; при росте применяет пороги.
+
+    Возвращает {user_id: 'muted' | 'blocked'} для пользователей, получивших санкцию.
+    """
+    if not user_ids or not delta:
+        return {}
+    with transaction.atomic():
+        User.objects.filter(id__in=user_ids).update(
+            active_warnings_cnt=Greatest(F('active_warnings_cnt') + delta, 0)
+        )
+        escalated = escalate(user_ids, admin) if delta > 0 else {}
+    profiles.invalidate_many(user_ids)
+    return escalated
+
+
+def escalate(user_ids, admin=None):
+    """Мутит и блокирует пользователей из списка, чей счётчик дошёл до порогов.
+
+    Один SELECT по колонке счётчика и не больше двух UPDATE на весь список.
+    Мут продлевается с каждым новым предупреждением; заблокированных не трогает.
+    """
+    rows = User.objects.filter(
+        id__in=user_ids, is_blocked=False, active_warnings_cnt__gte=mute_threshold()
+    ).order_by('id').values_list('id', 'active_warnings_cnt')
+    blocked, muted = [], []
+    for user_id, count in rows:
+        (blocked if count >= block_threshold() else muted).append(user_id)
+    if not blocked and not muted:
+        return {}
+    muted_until = timezone.now() + timedelta(hours=getattr(settings, 'WARNING_MUTE_HOURS', 24))
+    User.objects.filter(id__in=blocked).update(is_blocked=True)
+    User.objects.filter(id__in=muted).update(muted_until=muted_until)
+    if admin is not None:
+        audit.log(admin, 'user_blocked', 'user', blocked, {'automatic': True, 'threshold': block_threshold()})
+        audit.log(admin, 'user_muted', 'user', muted, {'automatic': True, 'until': muted_until.isoformat()})
+    profiles.invalidate_many(blocked + muted)
+    outcomes = {user_id: 'muted' for user_id in muted}
+    outcomes.update({user_id: 'blocked' for user_id in blocked})
+    return outcomes
+
+
+def is_muted(user):
+    return user.muted_until is not None and user.muted_until > timezone.now()
+
+
+def can_write(user):
+    """Может ли пользователь создавать чаты и отправлять сообщения."""
+    return not user.is_blocked and not is_muted(user)
@@ -0,0 +1,116 @@
+# core/search.py
+#
+# Полнотекстовый поиск по постам и курсам.
+# На SQLite используется внешний FTS5-индекс (core_post_fts / core_course_fts),
+# который синхронизируется триггерами прямо в базе, поэтому любые пути записи
+# (save, bulk_create, update) попадают в индекс. На других СУБД остаётся
+# старый поиск через icontains.
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post, Course
+
+# Модель -> (FTS-таблица, индексируемые колонки)
+FTS_TABLES = {
+    Post: ('core_post_fts', ('title', 'content')),
+    Course: ('core_course_fts', ('title', 'content')),
+}
+
+# Совпадение в заголовке весит больше, чем в тексте
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """Превращает пользовательский ввод в безопасное FTS5-выражение.
+
+    Каждое слово экранируется и ищется по префиксу, слова объединяются через AND,
+    так что синтаксис FTS5 (кавычки, NEAR, OR, *) из запроса не интерпретируется.
+    """
+    tokens = _TOKEN_RE.findall(query or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def create_index_sql(model):
+    table, columns = FTS_TABLES[model]
+    source = model._meta.db_table
+    cols = ', '.join(columns)
+    new_cols = ', '.join(f'new.{c}' for c in columns)
+    old_cols = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+        f"{cols}, content='{source}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {cols} ON {source} BEGIN "
+        f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+        f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+    ]
+
+
+def drop_index_sql(model):
+    table, _ = FTS_TABLES[model]
+    return [
+        f"DROP TRIGGER IF EXISTS {table}_ai",
+        f"DROP TRIGGER IF EXISTS {table}_ad",
+        f"DROP TRIGGER IF EXISTS {table}_au",
+        f"DROP TABLE IF EXISTS {table}",
+    ]
+
+
+def rebuild_index(model):
+    """Пересоздаёт FTS-таблицу и триггеры модели и заново наполняет индекс."""
+    table, _ = FTS_TABLES[model]
+    with connection.cursor() as cursor:
+        for sql in drop_index_sql(model) + create_index_sql(model):
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        return cursor.fetchone()[0]
+
+
+def search(queryset, query):
+    """Фильтрует queryset по поисковому запросу.
+
+    Возвращает queryset, аннотированный полем ``search_rank`` (bm25, меньше — лучше)
+    и отсортированный по релевантности. Без FTS5 откатывается на icontains.
+    """
+    model = queryset.model
+    if not is_available():
+        return queryset.filter(Q(title__icontains=query) | Q(content__icontains=query))
+
+    match = build_match_expression(query)
+    if not match:
+        return queryset.none()
+
+    table, _ = FTS_TABLES[model]
+    source = model._meta.db_table
+    # Сначала выбираем rowid по индексу, ранжирование считается только для совпадений
+    matched_ids = RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", (match,))
+    rank = RawSQL(
+        f"SELECT bm25({table}, %s, %s) FROM {table} "
+        f"WHERE {table} MATCH %s AND {table}.rowid = {source}.id",
+        (TITLE_WEIGHT, CONTENT_WEIGHT, match),
+    )
+    return queryset.filter(id__in=matched_ids).annotate(search_rank=rank).order_by('search_rank', '-id')
+
+
+def search_posts(query, queryset=None):
+    return search(Post.objects.all() if queryset is None else queryset, query)
+
+
+def search_courses(query, queryset=None):
+    return search(Course.objects.all() if queryset is None else queryset, query)
@@ -0,0 +1,105 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import activity, chats, code_blobs, highlighting, moderation, profiles, sanctions
+from .models import User, Message, Code, Post, Comment, Course, Review, ProfileView, Report, UserWarning
+
+
+@receiver(post_save, sender=Message)
+def update_unread_on_create(sender, instance, created, **kwargs):
+    if created:
+        chats.message_created(instance)
+
+
+@receiver(post_delete, sender=Message)
+def update_unread_on_delete(sender, instance, **kwargs):
+    chats.message_deleted(instance)
+
+
+# Жалоба попадает в очередь модерации вместе с остальными жалобами на ту же цель
+@receiver(post_save, sender=Report)
+def enqueue_report(sender, instance, created, **kwargs):
+    if created:
+        moderation.report_created(instance)
+
+
+@receiver(pre_save, sender=Code)
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+@receiver(pre_save, sender=Course)
+def store_code_blob(sender, instance, **kwargs):
+    code_blobs.save_pending(instance)
+
+
+# Подсветка строится при записи, чтобы страницы читали её уже из кэша
+@receiver(post_save, sender=Code)
+def highlight_code_snippet(sender, instance, **kwargs):
+    highlighting.highlight_blob(instance.code_blob, instance.language)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Course)
+def highlight_attached_code(sender, instance, **kwargs):
+    highlighting.highlight_blob(instance.code_blob)
+
+
+# Счётчики активности автора (core/activity.py)
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Course)
+def count_created_content(sender, instance, created, **kwargs):
+    if created:
+        activity.content_created(instance)
+
+
+# До удаления: лайки берутся подзапросом из ещё существующей строки
+@receiver(pre_delete, sender=Post)
+@receiver(pre_delete, sender=Comment)
+@receiver(pre_delete, sender=Course)
+def count_deleted_content(sender, instance, **kwargs):
+    activity.content_deleted(instance)
+
+
+# Счётчик принятых предупреждений (core/sanctions.py): учитываем переход is_accepted
+@receiver(pre_save, sender=UserWarning)
+def remember_warning_acceptance(sender, instance, **kwargs):
+    instance._was_accepted = bool(
+        instance.pk and UserWarning.objects.filter(pk=instance.pk, is_accepted=True).exists()
+    )
+
+
+@receiver(post_save, sender=UserWarning)
+def count_accepted_warning(sender, instance, **kwargs):
+    delta = int(instance.is_accepted is True) - int(getattr(instance, '_was_accepted', False))
+    if delta:
+        sanctions.warnings_changed([instance.user_id], delta, instance.admin)
+
+
+@receiver(post_delete, sender=UserWarning)
+def uncount_deleted_warning(sender, instance, **kwargs):
+    if instance.is_accepted:
+        sanctions.warnings_changed([instance.user_id], -1)
+
+
+# Кэш профиля: пользователь, его посты и курсы, отзывы о нём и рейтинг
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_own_profile(sender, instance, **kwargs):
+    profiles.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=ProfileView)
+@receiver(post_delete, sender=ProfileView)
+def invalidate_author_profile(sender, instance, **kwargs):
+    profiles.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_reviewed_profile(sender, instance, **kwargs):
+    profiles.invalidate(instance.target_user_id)
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import highlighting
+from core.models import CodeBlob
+
+register = template.Library()
+
+
+@register.filter
+def highlight(source, language=None):
+    """{{ post.code_blob|highlight }} или {{ code.code_blob|highlight:code.language }}; принимает и просто текст."""
+    if isinstance(source, CodeBlob):
+        return highlighting.highlight_blob(source, language)
+    return highlighting.highlight(source, language)
+
+
+@register.simple_tag
+def highlight_css():
+    return mark_safe(highlighting.css())
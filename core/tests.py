@@ -1,9 +1,32 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth import get_user_model
-from core.models import Post, Chat, Message, Code, Report, Admin, UserWarning, Bookmark, Like, ProfileView
+from core import activity, audit, chats, code_blobs, directory, highlighting, leaderboard, like_buffer, likes, moderation, profiles, query_plans, ratings, sanctions, search
+from core import views as core_views
+from core.routing import websocket_application
+from core.models import (
+    Post, Comment, Course, Chat, Message, Code, CodeBlob, CodeComment, Report, ModerationItem, Admin, AdminAction, AdminActionDaily, UserWarning, Bookmark, Like, ProfileView, Rating, Review
+)
 
 User = get_user_model()
 
@@ -198,7 +221,7 @@ class APITests(TestCase):
         self.client.force_authenticate(user=self.admin_user)
         response = self.client.get(reverse('api:api-admin_user_list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data['results']), 3)
 
 
     def test_rate_for_help_success(self):
@@ -247,4 +270,1451 @@ class APITests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.user2.profileview.refresh_from_db()
         self.assertEqual(self.user2.profileview.total_points, 60)  # Лимит не превышен
-        self.assertEqual(self.user2.profileview.rating, 15)  # Рейтинг не превышает 15
\ No newline at end of file
+        self.assertEqual(self.user2.profileview.rating, 15)  # Рейтинг не превышает 15
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='author', email='author@example.com', password='test123'
+        )
+        self.title_hit = Post.objects.create(user=self.user, title='Рекурсия в Python', content='Как работает стек')
+        self.body_hit = Post.objects.create(user=self.user, title='Вопрос про функции', content='Рекурсивный обход дерева')
+        self.miss = Post.objects.create(user=self.user, title='Указатели в C++', content='Разыменование')
+
+    def test_search_ranks_title_matches_first(self):
+        response = self.client.get(reverse('api:posts-list'), {'search': 'рекурс'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in response.data['results']]
+        self.assertEqual(ids, [self.title_hit.id, self.body_hit.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.miss.title = 'Рекурсия и указатели'
+        self.miss.save()
+        self.title_hit.delete()
+        ids = set(search.search_posts('рекурсия').values_list('id', flat=True))
+        self.assertEqual(ids, {self.miss.id})
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(list(search.search_posts('"NEAR( OR *')), [])
+
+    def test_course_search_and_rebuild_command(self):
+        course = Course.objects.create(user=self.user, title='Алгоритмы', content='Сортировка слиянием')
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('api:courses-list'), {'search': 'слиянием'})
+        self.assertEqual([item['id'] for item in response.data['results']], [course.id])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='author', email='author@example.com', password='test123'
+        )
+        created_at = timezone.now()
+        # Одинаковые created_at и likes_count проверяют, что id разрешает ничьи
+        self.posts = [
+            Post.objects.create(user=self.user, title=f'Post {i}', content='x',
+                                likes_count=i % 3, created_at=created_at)
+            for i in range(7)
+        ]
+
+    def collect(self, params):
+        ids = []
+        url = reverse('api:posts-list')
+        response = self.client.get(url, dict(params, cursor='', page_size=3))
+        while True:
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return ids
+            # Новый пост между страницами не должен попасть в уже пройденную ленту
+            Post.objects.create(user=self.user, title='Fresh post', content='x', likes_count=100)
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_walks_feed_without_repeats(self):
+        ids = self.collect({})
+        self.assertEqual(ids, sorted((p.id for p in self.posts), reverse=True))
+
+    def test_cursor_by_likes(self):
+        ids = self.collect({'sort': 'likes'})
+        expected = sorted(self.posts, key=lambda p: (p.likes_count, p.id), reverse=True)
+        self.assertEqual(ids, [p.id for p in expected])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('api:posts-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        for position in (['garbage', 1], ['2024-13-45T00:00:00', 1], [None, 1], [[], 1], ['2024-01-01T00:00:00Z', 'x']):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get(reverse('api:posts-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get(reverse('api:posts-list'))
+        self.assertEqual(response.data['count'], 7)
+
+
+class QueryCountTests(TestCase):
+    """Каждый список должен стоить постоянного числа запросов независимо от размера страницы."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='test123')
+        self.admin_user = User.objects.create_user(
+            username='moderator', email='moderator@example.com', password='test123', role='admin'
+        )
+        self.admin = Admin.objects.create(user=self.admin_user)
+        ProfileView.objects.create(user=self.user)
+        self.other_users = []
+
+    def new_user(self):
+        index = len(self.other_users)
+        user = User(username=f'peer{index}', email=f'peer{index}@example.com')
+        user.save()
+        self.other_users.append(user)
+        return user
+
+    def seed(self):
+        for _ in range(3):
+            peer = self.new_user()
+            # Код у постов и курсов: сериализаторы читают его через code_blob
+            post = Post.objects.create(user=peer, title='Some post', content='x', code=f'print("{peer.id}")')
+            Course.objects.create(user=peer, title='Some course', content='x', code=f'run("{peer.id}")')
+            chat = Chat.objects.create(user1=self.user, user2=peer)
+            Message.objects.create(chat=self.chat, sender=peer, receiver=self.user, content='hi')
+            Message.objects.create(chat=chat, sender=self.user, receiver=peer, content='hi')
+            Bookmark.objects.create(user=self.user, post=post)
+            Code.objects.create(user=self.user, post=post, code_content='x', language='python',
+                                start_line=1, end_line=1)
+            Report.objects.create(reporting_user=peer, reporting_target_type='post',
+                                  reporting_target_id=post.id, report_description='spam')
+            Review.objects.create(user=peer, target_user=self.user, content='thanks')
+            UserWarning.objects.create(user=peer, admin=self.admin, reason='spam', is_accepted=True)
+
+    def assertConstantQueries(self, url, user=None, html=False, **params):
+        if html:
+            self.client.force_login(user or self.user)
+        else:
+            self.client.force_authenticate(user=user or self.user)
+        counts = []
+        for _ in range(2):
+            self.seed()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1], f'{url}: query count grows with page size')
+
+    def test_api_list_routes(self):
+        self.chat = Chat.objects.create(user1=self.user, user2=self.new_user())
+        self.assertConstantQueries(reverse('api:posts-list'), page_size=100)
+        self.assertConstantQueries(reverse('api:courses-list'), page_size=100)
+        self.assertConstantQueries(reverse('api:chats-list'))
+        self.assertConstantQueries(reverse('api:chats-inbox'), page_size=100)
+        self.assertConstantQueries(reverse('api:messages-list'), chat=self.chat.id, page_size=100)
+        self.assertConstantQueries(reverse('api:codes-list'))
+        self.assertConstantQueries(reverse('api:reports-list'), user=self.admin_user)
+        self.assertConstantQueries(reverse('api:api-bookmark_list'))
+        self.assertConstantQueries(reverse('api:api-admin_report_list'), user=self.admin_user)
+        self.assertConstantQueries(reverse('api:api-admin_user_list'), user=self.admin_user)
+        self.assertConstantQueries(reverse('api:api-profile', args=[self.user.id]))
+
+    def test_html_list_routes(self):
+        self.chat = Chat.objects.create(user1=self.user, user2=self.new_user())
+        self.assertConstantQueries(reverse('core:index'), html=True)
+        self.assertConstantQueries(reverse('core:post_list'), html=True)
+        self.assertConstantQueries(reverse('core:course_list'), html=True)
+        self.assertConstantQueries(reverse('core:bookmark_list'), html=True)
+        self.assertConstantQueries(reverse('core:profile', args=[self.user.id]), html=True)
+
+
+class LikeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='liker', email='liker@example.com', password='test123')
+        self.post = Post.objects.create(user=self.user, title='Liked post', content='x')
+        self.client.force_authenticate(user=self.user)
+
+    def test_like_twice_counts_once(self):
+        url = reverse('api:api-add_like', args=['post', self.post.id])
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_like_missing_target_is_rolled_back(self):
+        response = self.client.post(reverse('api:api-add_like', args=['post', 999999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Like.objects.exists())
+
+    def test_unlike(self):
+        self.client.post(reverse('api:api-add_like', args=['chat', Chat.objects.create(
+            user1=self.user, user2=User.objects.create(username='peer', email='peer@example.com')
+        ).id]))
+        chat = Chat.objects.get()
+        url = reverse('api:api-remove_like', args=['chat', chat.id])
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+        chat.refresh_from_db()
+        self.assertEqual(chat.chat_likes_cnt, 0)
+        self.assertFalse(Like.objects.exists())
+
+
+class LikeConcurrencyTests(TransactionTestCase):
+    threads = 50
+
+    def test_parallel_likes_do_not_lose_updates(self):
+        author = User.objects.create(username='author', email='author@example.com')
+        post = Post.objects.create(user=author, title='Hot post', content='x')
+        users = [User.objects.create(username=f'fan{i}', email=f'fan{i}@example.com') for i in range(self.threads)]
+        barrier = threading.Barrier(self.threads)
+
+        def hammer(user):
+            barrier.wait()
+            try:
+                for action in (likes.add_like, likes.add_like, likes.remove_like, likes.add_like):
+                    while True:
+                        try:
+                            action(user, 'post', post.id)
+                            break
+                        except OperationalError:
+                            # SQLite сериализует писателей: повторяем при блокировке
+                            time.sleep(0.001)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=hammer, args=(user,)) for user in users]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        post.refresh_from_db()
+        liked = Like.objects.filter(target_type='post', target_id=post.id).count()
+        self.assertEqual(liked, self.threads)
+        self.assertEqual(post.likes_count, liked)
+
+
+@override_settings(LIKES_BUFFER_ENABLED=True, LIKES_BUFFER_AUTOFLUSH=False)
+class LikeBufferTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='liker', email='liker@example.com', password='test123')
+        self.post = Post.objects.create(user=self.user, title='Buffered post', content='x')
+        self.client.force_authenticate(user=self.user)
+        self.addCleanup(like_buffer.buffer.flush)
+
+    def test_pending_like_is_visible_before_flush(self):
+        self.client.post(reverse('api:api-add_like', args=['post', self.post.id]))
+        self.assertFalse(Like.objects.exists())
+        response = self.client.get(reverse('api:posts-detail', args=[self.post.id]))
+        self.assertEqual(response.data['likes_count'], 1)
+
+    def test_flush_writes_batch(self):
+        fans = [User.objects.create(username=f'fan{i}', email=f'fan{i}@example.com') for i in range(5)]
+        for fan in fans:
+            likes.add_like(fan, 'post', self.post.id)
+        likes.add_like(fans[0], 'post', self.post.id)
+        with self.assertNumQueries(7):
+            # savepoint, выборка существующих, bulk_create, UPDATE счётчика цели,
+            # автор цели (для сброса кэша профиля) и UPDATE его счётчика, release
+            self.assertEqual(like_buffer.buffer.flush(), 5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 5)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.post_likes_cnt, 5)
+        self.assertEqual(like_buffer.buffer.pending_delta('post', self.post.id), 0)
+
+    def test_leaderboard_counts_only_flushed_likes(self):
+        leaderboard.backend.clear()
+        leaderboard.rebuild()
+        fan, other = (User.objects.create(username=f'lb{i}', email=f'lb{i}@example.com') for i in range(2))
+        with self.captureOnCommitCallbacks(execute=True):
+            likes.add_like(fan, 'post', self.post.id)
+            likes.add_like(other, 'post', self.post.id)
+        self.assertEqual(leaderboard.rank_of('post_likes', self.user.id), (None, None))
+        # Лайк fan уже записан другим процессом — flush его отбросит
+        Like.objects.create(user=fan, target_type='post', target_id=self.post.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(like_buffer.buffer.flush(), 1)
+        self.assertEqual(leaderboard.rank_of('post_likes', self.user.id), (1, 1))
+
+    def test_unlike_pending_like(self):
+        likes.add_like(self.user, 'post', self.post.id)
+        self.assertTrue(likes.remove_like(self.user, 'post', self.post.id))
+        self.assertEqual(like_buffer.buffer.flush(), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+
+class ViewerFlagsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='test123')
+        self.liked = Post.objects.create(user=self.user, title='Liked post', content='x')
+        self.bookmarked = Post.objects.create(user=self.user, title='Saved post', content='x')
+        self.course = Course.objects.create(user=self.user, title='Liked course', content='x')
+        likes.add_like(self.user, 'post', self.liked.id)
+        likes.add_like(self.user, 'course', self.course.id)
+        Bookmark.objects.create(user=self.user, post=self.bookmarked)
+
+    def test_post_feed_flags(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('api:posts-list'))
+        flags = {item['id']: (item['is_liked'], item['is_bookmarked']) for item in response.data['results']}
+        self.assertEqual(flags, {self.liked.id: (True, False), self.bookmarked.id: (False, True)})
+
+    def test_course_detail_flag(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('api:courses-detail', args=[self.course.id]))
+        self.assertTrue(response.data['is_liked'])
+
+    def test_anonymous_flags(self):
+        response = self.client.get(reverse('api:posts-list'))
+        self.assertFalse(any(item['is_liked'] for item in response.data['results']))
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        for name, plan, scans in query_plans.check_all():
+            self.assertEqual(scans, [], f'{name}:\n{plan}')
+
+    def test_full_scan_is_detected(self):
+        plan = query_plans.explain(Post.objects.filter(title='x'))
+        self.assertTrue(query_plans.full_scans(plan))
+        with self.assertRaises(CommandError):
+            query_plans.register('post: by title')(lambda: Post.objects.filter(title='x'))
+            self.addCleanup(query_plans.HOT_QUERIES.pop, 'post: by title')
+            call_command('explain_hot_queries', '--strict', stdout=StringIO())
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='writer', email='writer@example.com', password='test123')
+        self.post = Post.objects.create(user=self.user, title='Long post', content='a' * 1000, code='print(1)')
+
+    def get_posts(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('api:posts-list'), params)
+        sql = '\n'.join(query['sql'] for query in context.captured_queries)
+        return response.data['results'][0], sql
+
+    def test_compact_list_by_default(self):
+        item, sql = self.get_posts()
+        self.assertNotIn('content', item)
+        self.assertNotIn('code', item)
+        self.assertEqual(set(item['user']), {'id', 'username', 'profile_img_url'})
+        self.assertEqual(item['preview'], 'a' * 200 + '…')
+        # Текст поста читается только через SUBSTR для превью
+        self.assertIn('SUBSTR("core_post"."content", 1, 201)', sql)
+        self.assertNotIn('"core_post"."content"', sql.replace('SUBSTR("core_post"."content"', ''))
+        self.assertNotIn('"core_post"."code_blob_id"', sql)
+        self.assertNotIn('core_codeblob', sql)
+
+    def test_fields_and_expand(self):
+        item, sql = self.get_posts(fields='id,title')
+        self.assertEqual(set(item), {'id', 'title'})
+        self.assertNotIn('SUBSTR', sql.upper())
+        item, sql = self.get_posts(expand='code')
+        self.assertEqual(item['code'], 'print(1)')
+        # Код приходит тем же запросом через JOIN на blob
+        self.assertIn('JOIN "core_codeblob"', sql)
+
+    def test_detail_keeps_full_representation(self):
+        response = self.client.get(reverse('api:posts-detail', args=[self.post.id]))
+        self.assertEqual(response.data['content'], 'a' * 1000)
+        self.assertIn('email', response.data['user'])
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='test123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='test123')
+        self.chat = Chat.objects.create(user1=self.alice, user2=self.bob)
+        self.client.force_authenticate(user=self.bob)
+        self.messages = [
+            Message.objects.create(chat=self.chat, sender=self.alice, receiver=self.bob, content=f'm{i}')
+            for i in range(3)
+        ]
+
+    def test_counter_follows_sends_and_deletes(self):
+        self.chat.refresh_from_db()
+        self.assertEqual((self.chat.user1_unread_cnt, self.chat.user2_unread_cnt), (0, 3))
+        self.messages[0].delete()
+        self.chat.refresh_from_db()
+        self.assertEqual(self.chat.user2_unread_cnt, 2)
+
+    def test_chat_list_exposes_unread(self):
+        response = self.client.get(reverse('api:chats-list'))
+        self.assertEqual(response.data['results'][0]['unread_count'], 3)
+
+    def test_mark_read_up_to(self):
+        url = reverse('api:chats-read', args=[self.chat.id])
+        response = self.client.post(url, {'up_to': self.messages[1].id}, format='json')
+        self.assertEqual(response.data, {'marked': 2, 'unread_count': 1})
+        self.assertEqual(Message.objects.filter(is_read=False).count(), 1)
+        response = self.client.get(reverse('api:api-unread_messages_count'))
+        self.assertEqual(response.data['unread_count'], 1)
+
+    def test_is_read_not_writable_through_messages_api(self):
+        url = reverse('api:messages-detail', args=[self.messages[0].id]) + f'?chat={self.chat.id}'
+        self.client.patch(url, {'is_read': True}, format='json')
+        self.client.force_authenticate(user=self.alice)
+        self.client.post(reverse('api:messages-list'), {'chat': self.chat.id, 'content': 'm3', 'is_read': True}, format='json')
+        self.chat.refresh_from_db()
+        self.assertEqual(Message.objects.filter(receiver=self.bob, is_read=False).count(), 4)
+        self.assertEqual(self.chat.user2_unread_cnt, 4)
+
+    def test_unread_badge_is_constant_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(chats.total_unread(self.bob), 3)
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.me = User.objects.create_user(username='me', email='me@example.com', password='test123')
+        self.peers = [User.objects.create(username=f'peer{i}', email=f'peer{i}@example.com') for i in range(3)]
+        self.chats = [Chat.objects.create(user1=self.me, user2=peer) for peer in self.peers]
+        self.client.force_authenticate(user=self.me)
+
+    def test_inbox_orders_by_last_activity(self):
+        Message.objects.create(chat=self.chats[0], sender=self.peers[0], receiver=self.me, content='old')
+        last = Message.objects.create(chat=self.chats[1], sender=self.me, receiver=self.peers[1], content='new')
+        response = self.client.get(reverse('api:chats-inbox'))
+        rows = response.data['results']
+        self.assertEqual([row['id'] for row in rows[:2]], [self.chats[1].id, self.chats[0].id])
+        self.assertEqual(rows[0]['last_message']['id'], last.id)
+        self.assertEqual(rows[0]['other_user']['username'], 'peer1')
+        self.assertEqual(rows[0]['unread_count'], 0)
+        self.assertEqual(rows[1]['unread_count'], 1)
+
+    def test_deleting_last_message_falls_back_to_previous(self):
+        first = Message.objects.create(chat=self.chats[0], sender=self.me, receiver=self.peers[0], content='1')
+        second = Message.objects.create(chat=self.chats[0], sender=self.me, receiver=self.peers[0], content='2')
+        second.delete()
+        self.chats[0].refresh_from_db()
+        self.assertEqual(self.chats[0].last_message_id, first.id)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@example.com')
+        self.bob = User.objects.create(username='bob', email='bob@example.com')
+        self.chat = Chat.objects.create(user1=self.alice, user2=self.bob)
+
+    def connect(self, user):
+        token = AccessToken.for_user(user)
+        return WebsocketCommunicator(websocket_application, f'/ws/chats/{self.chat.id}/?token={token}')
+
+    async def test_message_is_persisted_and_pushed_to_both_participants(self):
+        alice, bob = self.connect(self.alice), self.connect(self.bob)
+        self.assertTrue((await alice.connect())[0])
+        self.assertTrue((await bob.connect())[0])
+
+        await alice.send_json_to({'type': 'message', 'content': 'Привет'})
+        for socket in (alice, bob):
+            event = await socket.receive_json_from(timeout=2)
+            self.assertEqual(event['type'], 'message')
+            self.assertEqual(event['message']['content'], 'Привет')
+
+        message_id = event['message']['id']
+        await bob.send_json_to({'type': 'read', 'up_to': message_id})
+        receipt = await alice.receive_json_from(timeout=2)
+        self.assertEqual(receipt, {'type': 'read', 'user_id': self.bob.id, 'up_to': message_id, 'marked': 1})
+
+        await database_sync_to_async(likes.add_like)(self.bob, 'chat', self.chat.id)
+        self.assertEqual((await alice.receive_json_from(timeout=2))['type'], 'like')
+
+        await alice.disconnect()
+        await bob.disconnect()
+        self.assertTrue(await database_sync_to_async(
+            Message.objects.filter(id=message_id, sender=self.alice, receiver=self.bob, is_read=True).exists
+        )())
+
+    async def test_outsider_is_rejected(self):
+        outsider = await database_sync_to_async(User.objects.create)(username='eve', email='eve@example.com')
+        connected, code = await self.connect(outsider).connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+
+
+class MessagesPollTests(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@example.com')
+        self.bob = User.objects.create(username='bob', email='bob@example.com')
+        self.chat = Chat.objects.create(user1=self.alice, user2=self.bob)
+        self.first = chats.send_message(self.chat, self.alice, content='Первое')
+        self.url = reverse('api:api-messages_poll')
+
+    def poll(self, user, after_id, timeout=2):
+        return AsyncClient().get(
+            self.url, {'chat': self.chat.id, 'after_id': after_id, 'timeout': timeout},
+            headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'},
+        )
+
+    async def test_returns_existing_delta_immediately(self):
+        response = await self.poll(self.bob, 0)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([m['id'] for m in body['results']], [self.first.id])
+        self.assertEqual(body['last_id'], self.first.id)
+
+    async def test_waits_for_new_message(self):
+        request = asyncio.ensure_future(self.poll(self.bob, self.first.id, timeout=5))
+        await asyncio.sleep(0.2)
+        self.assertFalse(request.done())
+
+        started = time.monotonic()
+        message = await database_sync_to_async(chats.send_message)(self.chat, self.alice, content='Второе')
+        response = await request
+        self.assertLess(time.monotonic() - started, 2)
+        body = response.json()
+        self.assertEqual([m['id'] for m in body['results']], [message.id])
+        self.assertEqual(body['results'][0]['content'], 'Второе')
+
+    async def test_timeout_returns_empty_delta(self):
+        response = await self.poll(self.bob, self.first.id, timeout=0.1)
+        self.assertEqual(response.json(), {'results': [], 'last_id': self.first.id})
+
+    async def test_requires_participant(self):
+        outsider = await database_sync_to_async(User.objects.create)(username='eve', email='eve@example.com')
+        self.assertEqual((await self.poll(outsider, 0)).status_code, 403)
+        anonymous = await AsyncClient().get(self.url, {'chat': self.chat.id})
+        self.assertEqual(anonymous.status_code, 401)
+
+
+class ChatPairTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='test123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='test123')
+
+    def test_pair_is_stored_ordered_and_reused(self):
+        self.client.force_authenticate(user=self.bob)
+        response = self.client.post(reverse('api:chats-list'), {'user2': self.alice.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        chat = Chat.objects.get()
+        self.assertEqual((chat.user1_id, chat.user2_id), (self.alice.id, self.bob.id))
+
+        self.client.force_authenticate(user=self.alice)
+        response = self.client.post(reverse('api:chats-list'), {'user2': self.bob.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], chat.id)
+        self.assertEqual(chats.find_chat(self.bob, self.alice), chat)
+
+    def test_lookup_is_single_indexed_query(self):
+        chats.get_or_create_chat(self.alice, self.bob)
+        with CaptureQueriesContext(connection) as queries:
+            chats.find_chat(self.bob, self.alice)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(' OR ', queries[0]['sql'])
+
+    def test_chat_with_yourself_is_rejected(self):
+        self.client.force_authenticate(user=self.alice)
+        response = self.client.post(reverse('api:chats-list'), {'user2': self.alice.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(ValueError):
+            chats.get_or_create_chat(self.alice, self.alice)
+
+
+class ChatPairConcurrencyTests(TransactionTestCase):
+    def test_concurrent_start_creates_one_chat(self):
+        alice = User.objects.create(username='alice', email='alice@example.com')
+        bob = User.objects.create(username='bob', email='bob@example.com')
+        results, barrier = [], threading.Barrier(10)
+
+        def start(first, second):
+            barrier.wait()
+            for _ in range(20):
+                try:
+                    results.append(chats.get_or_create_chat(first, second))
+                    break
+                except OperationalError:
+                    time.sleep(0.01)
+            connection.close()
+
+        threads = [threading.Thread(target=start, args=(alice, bob) if i % 2 else (bob, alice)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Chat.objects.count(), 1)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(sum(created for _, created in results), 1)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'highlight': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'highlight-tests',
+        'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3},
+    },
+})
+class HighlightingTests(TestCase):
+    def setUp(self):
+        caches['highlight'].clear()
+        self.user = User.objects.create_user(username='coder', email='coder@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_rendered_once_on_write(self):
+        code = Code.objects.create(user=self.user, code_content='print(1)', language='python',
+                                   start_line=1, end_line=1)
+        key = highlighting.cache_key(code.code_blob.hash, code.language)
+        self.assertIn('class="code"', caches['highlight'].get(key))
+
+        with mock.patch.object(highlighting, 'render', side_effect=AssertionError('cache miss')):
+            response = self.client.get(reverse('api:codes-detail', args=[code.id]))
+        self.assertIn('<span class="nb">print</span>', response.data['highlighted'])
+
+    def test_source_is_escaped(self):
+        html = highlighting.highlight('<script>alert(1)</script>')
+        self.assertNotIn('<script>', html)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        def key(source):
+            return highlighting.cache_key(hashlib.sha256(source.encode()).hexdigest(), 'python')
+
+        for source in ('a = 1', 'b = 2', 'c = 3'):
+            highlighting.highlight(source, 'python')
+        highlighting.highlight('a = 1', 'python')
+        highlighting.highlight('d = 4', 'python')
+        cache = caches['highlight']
+        self.assertIsNotNone(cache.get(key('a = 1')))
+        self.assertIsNone(cache.get(key('b = 2')))
+
+    def test_post_page_shows_highlighted_code(self):
+        post = Post.objects.create(user=self.user, title='Вопрос', content='x', code='x = 1 < 2')
+        response = self.client.get(reverse('core:post_detail', args=[post.id]))
+        self.assertContains(response, '<div class="code"><pre>')
+        self.assertContains(response, '&lt;')
+
+
+class CodeBlobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='student', email='student@example.com', password='test123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_identical_code_shares_one_blob(self):
+        boilerplate = 'import sys\r\n\r\ndef main():   \r\n    pass\r\n'
+        post = Post.objects.create(user=self.user, title='Лаба 1', content='x', code=boilerplate)
+        comment = Comment.objects.create(post=post, user=self.user, content='x', code=boilerplate.replace('\r\n', '\n'))
+        response = self.client.post(reverse('api:codes-list'), {
+            'post': post.id, 'code_content': boilerplate, 'language': 'python', 'start_line': 1, 'end_line': 4,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(CodeBlob.objects.count(), 1)
+        blob = CodeBlob.objects.get()
+        self.assertEqual(blob.content, 'import sys\n\ndef main():   \n    pass\n')
+        self.assertEqual(blob.line_count, 4)
+        self.assertEqual({post.code_blob_id, comment.code_blob_id, Code.objects.get().code_blob_id}, {blob.id})
+        self.assertEqual(Post.objects.get(id=post.id).code, blob.content)
+
+    def test_text_is_kept_except_line_endings(self):
+        code = '\n\nprint("a  ")   \n'
+        post = Post.objects.create(user=self.user, title='Пробелы', content='x', code=code)
+        self.assertEqual(Post.objects.get(id=post.id).code, code)
+        self.assertEqual(post.code_blob.line_count, 3)
+        self.assertNotEqual(code_blobs.intern(code.rstrip()).id, post.code_blob_id)
+
+    def test_blank_code_snippet_is_rejected(self):
+        post = Post.objects.create(user=self.user, title='Пусто', content='x')
+        response = self.client.post(reverse('api:codes-list'), {
+            'post': post.id, 'code_content': '  \n\t', 'language': 'python', 'start_line': 1, 'end_line': 1,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('code_content', response.data)
+
+    def test_edit_switches_blob_and_empty_code_has_none(self):
+        post = Post.objects.create(user=self.user, title='Вопрос', content='x')
+        self.assertIsNone(post.code_blob_id)
+        self.assertEqual(post.code, '')
+        response = self.client.patch(reverse('api:posts-detail', args=[post.id]), {'code': 'x = 2'}, format='json')
+        self.assertEqual(response.data['code'], 'x = 2')
+        post.refresh_from_db()
+        self.assertEqual(post.code_blob.content, 'x = 2')
+
+    def test_report_and_prune(self):
+        for i in range(3):
+            Post.objects.create(user=self.user, title=f'Пост {i}', content='x', code='print("hello")')
+        Post.objects.create(user=self.user, title='Другой', content='x', code='old').delete()
+        stats = code_blobs.report()
+        self.assertEqual(stats['references'], 3)
+        # Blob удалённого поста ещё лежит в хранилище до --prune
+        self.assertEqual(stats['logical_bytes'], 3 * len('print("hello")'))
+        self.assertEqual(stats['stored_bytes'], len('print("hello")') + len('old'))
+
+        out = StringIO()
+        call_command('code_blob_report', '--prune', stdout=out)
+        self.assertEqual(list(CodeBlob.objects.values_list('content', flat=True)), ['print("hello")'])
+        self.assertIn('сэкономлено байт:      28', out.getvalue())
+
+
+class CodeCommentTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='test123')
+        self.reviewer = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='test123')
+        source = '\n'.join(f'line_{i} = {i}' for i in range(1, 201))
+        self.code = Code.objects.create(user=self.author, code_content=source, language='python',
+                                        start_line=1, end_line=200)
+        spans = [(1, 5), (110, 125), (130, 130), (139, 150), (141, 160), (118, 119)]
+        self.comments = [
+            CodeComment.objects.create(code=self.code, user=self.reviewer, comm_content=f'c{i}',
+                                       start_line=start, end_line=end)
+            for i, (start, end) in enumerate(spans)
+        ]
+        self.client.force_authenticate(user=self.reviewer)
+
+    def test_list_and_overlapping_range(self):
+        response = self.client.get(reverse('api:code-comments-list'), {'code': self.code.id})
+        self.assertEqual(response.data['count'], 6)
+
+        response = self.client.get(reverse('api:code-comments-overlapping'),
+                                   {'code': self.code.id, 'start': 120, 'end': 140})
+        self.assertEqual([c['comm_content'] for c in response.data], ['c1', 'c2', 'c3'])
+
+    def test_line_range_is_validated(self):
+        url = reverse('api:code-comments-list')
+        for start, end in [(0, 3), (10, 5), (190, 201)]:
+            response = self.client.post(url, {'code': self.code.id, 'comm_content': 'x',
+                                              'start_line': start, 'end_line': end}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'code': self.code.id, 'comm_content': 'x',
+                                          'start_line': 200, 'end_line': 200}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['user']['id'], self.reviewer.id)
+
+    def test_only_author_edits_comment(self):
+        self.client.force_authenticate(user=self.author)
+        url = reverse('api:code-comments-detail', args=[self.comments[0].id])
+        self.assertEqual(self.client.patch(url, {'comm_content': 'y'}, format='json').status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_chat_code_visible_only_to_participants(self):
+        outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='test123')
+        chat = Chat.objects.create(user1=self.author, user2=self.reviewer)
+        message = Message.objects.create(chat=chat, sender=self.author, receiver=self.reviewer, content='see')
+        private = Code.objects.create(user=self.author, message=message, code_content='secret = 1',
+                                      language='python', start_line=1, end_line=1)
+        CodeComment.objects.create(code=private, user=self.reviewer, comm_content='c', start_line=1, end_line=1)
+
+        self.assertEqual(self.client.get(reverse('api:codes-review', args=[private.id])).status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=outsider)
+        self.assertEqual(self.client.get(reverse('api:codes-review', args=[private.id])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('api:code-comments-list'), {'code': private.id}).data['count'], 0)
+        self.assertEqual(len(self.client.get(reverse('api:codes-list'), {'message': message.id}).data['results']), 0)
+        response = self.client.post(reverse('api:code-comments-list'), {'code': private.id, 'comm_content': 'x',
+                                                                        'start_line': 1, 'end_line': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        # Публичный фрагмент виден всем
+        self.assertEqual(self.client.get(reverse('api:codes-review', args=[self.code.id])).status_code,
+                         status.HTTP_200_OK)
+
+    def test_review_groups_comments_by_line_in_constant_queries(self):
+        # Фрагмент с автором и blob'ом + все комментарии с авторами
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api:codes-review', args=[self.code.id]))
+        grouped = response.data['comments_by_line']
+        self.assertEqual(sorted(grouped, key=int), ['1', '110', '118', '130', '139', '141'])
+        self.assertEqual(grouped['110'][0]['end_line'], 125)
+        self.assertEqual(response.data['code_content'], self.code.code_content)
+
+
+class ProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='test123')
+        self.reviewer = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='test123')
+        ProfileView.objects.create(user=self.user, total_points=20, rating=5)
+        for i in range(3):
+            Post.objects.create(user=self.user, title=f'Пост {i}', content='x')
+        Course.objects.create(user=self.user, title='Курс', content='x')
+        for i in range(12):
+            Review.objects.create(user=self.reviewer, target_user=self.user, content=f'review {i}')
+        self.client.force_authenticate(user=self.reviewer)
+        self.url = reverse('api:api-profile', args=[self.user.id])
+
+    def test_profile_is_built_in_constant_queries_and_cached(self):
+        # Пользователь со счётчиками и рейтингом, отзывы, последние посты, последние курсы
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['posts_count'], 3)
+        self.assertEqual(response.data['courses_count'], 1)
+        self.assertEqual(response.data['reviews_count'], 12)
+        self.assertEqual(response.data['rating'], 5)
+        self.assertEqual(len(response.data['reviews']), 10)
+        self.assertEqual(response.data['reviews_next_page'], 2)
+
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_counts_use_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            profiles.profile_queryset().get(id=self.user.id)
+        self.assertEqual(len(queries), 1)
+
+    def test_reviews_are_paginated(self):
+        response = self.client.get(self.url, {'reviews_page': 2})
+        self.assertEqual([r['content'] for r in response.data['reviews']], ['review 1', 'review 0'])
+        self.assertIsNone(response.data['reviews_next_page'])
+
+    def test_cache_is_invalidated_on_changes(self):
+        self.client.get(self.url)
+        Post.objects.create(user=self.user, title='Новый пост', content='x')
+        self.assertEqual(self.client.get(self.url).data['posts_count'], 4)
+
+        Review.objects.create(user=self.reviewer, target_user=self.user, content='fresh')
+        self.assertEqual(self.client.get(self.url).data['reviews'][0]['content'], 'fresh')
+
+        self.user.profileview.total_points = 60
+        self.user.profileview.update_rating()
+        self.assertEqual(self.client.get(self.url).data['rating'], 15)
+
+        Course.objects.filter(user=self.user).first().delete()
+        self.assertEqual(self.client.get(self.url).data['courses_count'], 0)
+
+    def test_html_profile_shows_recent_items_only(self):
+        for i in range(10):
+            Post.objects.create(user=self.user, title=f'Ещё пост {i}', content='x')
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse('core:profile', args=[self.user.id]))
+        self.assertEqual(len(response.context['posts']), profiles.RECENT_ITEMS)
+        self.assertContains(response, 'Посты (13)')
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        leaderboard.backend.clear()
+        self.client = APIClient()
+        self.users = [
+            User.objects.create_user(username=f'helper{i}', email=f'helper{i}@example.com', password='test123')
+            for i in range(4)
+        ]
+        for user, points in zip(self.users, [10, 30, 20, 0]):
+            ProfileView.objects.create(user=user, total_points=points)
+        self.client.force_authenticate(user=self.users[0])
+
+    def test_top_and_my_rank_are_built_from_tables(self):
+        response = self.client.get(reverse('api:api-leaderboard'), {'k': 2})
+        self.assertEqual([(r['rank'], r['user']['username'], r['score']) for r in response.data['results']],
+                         [(1, 'helper1', 30), (2, 'helper2', 20)])
+        me = self.client.get(reverse('api:api-leaderboard_me')).data
+        self.assertEqual((me['rank'], me['score'], me['total']), (3, 10, 3))
+
+    def test_rate_for_help_updates_boards_incrementally(self):
+        leaderboard.rebuild()
+        peer = self.users[3]
+        chats.get_or_create_chat(self.users[0], peer)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                self.client.post(reverse('api:api-rate-for-help', args=[peer.id]))
+
+        self.assertEqual(leaderboard.rank_of('points', peer.id), (4, 4))
+        self.assertEqual(leaderboard.rank_of('chat_help', peer.id), (1, 2))
+        self.assertEqual(leaderboard.top('points', 1, period=leaderboard.current_period()), [(peer.id, 4)])
+        response = self.client.get(reverse('api:api-leaderboard'), {'board': 'points', 'period': 'current'})
+        self.assertEqual(response.data['results'][0]['user']['id'], peer.id)
+
+        # Пересборка из таблиц даёт то же, что инкрементальные обновления
+        incremental = {board: leaderboard.top(board, 10) for board in ('points', 'chat_help')}
+        leaderboard.rebuild()
+        self.assertEqual({board: leaderboard.top(board, 10) for board in incremental}, incremental)
+
+    def test_likes_move_author_on_like_boards(self):
+        leaderboard.rebuild()
+        post = Post.objects.create(user=self.users[2], title='Полезный пост', content='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            likes.add_like(self.users[0], 'post', post.id)
+            likes.add_like(self.users[1], 'post', post.id)
+        self.assertEqual(leaderboard.rank_of('post_likes', self.users[2].id), (1, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            likes.remove_like(self.users[0], 'post', post.id)
+        self.assertEqual(leaderboard.rank_of('post_likes', self.users[2].id), (1, 1))
+
+    def test_rebuild_drops_boards_without_sources(self):
+        rating = Rating.objects.create(user=self.users[0], score=2,
+                                       created_at=timezone.make_aware(timezone.datetime(2024, 3, 5)))
+        leaderboard.rebuild()
+        self.assertEqual(leaderboard.size('points', '2024-03'), 1)
+        rating.delete()
+        leaderboard.rebuild()
+        self.assertEqual(leaderboard.size('points', '2024-03'), 0)
+        self.assertNotIn('points:2024-03', leaderboard.backend.names())
+
+    def test_redis_board_names_skip_rebuild_keys(self):
+        board = leaderboard.RedisBackend.__new__(leaderboard.RedisBackend)
+        board._redis = mock.Mock()
+        board._redis.scan_iter.return_value = [b'leaderboard:points', b'leaderboard:points:2024-03',
+                                               b'leaderboard:points:rebuild']
+        self.assertEqual(board.names(), {'points', 'points:2024-03'})
+
+    def test_unknown_board_and_rebuild_command(self):
+        response = self.client.get(reverse('api:api-leaderboard'), {'board': 'karma'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        out = StringIO()
+        call_command('rebuild_leaderboard', stdout=out)
+        self.assertIn('points: 3', out.getvalue())
+
+
+class MemoryLeaderboardBackendTests(TestCase):
+    def test_rank_and_top_follow_updates(self):
+        board = leaderboard.MemoryBackend()
+        board.replace('b', {1: 5, 2: 7, 3: 5})
+        self.assertEqual(board.top('b', 3), [(2, 7), (1, 5), (3, 5)])
+        board.increment('b', 3, 10)
+        board.set_score('b', 2, 1)
+        self.assertEqual(board.top('b', 3), [(3, 15), (1, 5), (2, 1)])
+        self.assertEqual(board.rank('b', 2), (2, 1))
+        self.assertEqual(board.rank('b', 99), (None, None))
+
+
+class RatingRecomputeTests(TestCase):
+    def setUp(self):
+        leaderboard.backend.clear()
+        self.users = [
+            User.objects.create_user(username=f'rated{i}', email=f'rated{i}@example.com', password='test123')
+            for i in range(3)
+        ]
+        User.objects.filter(id=self.users[0].id).update(chat_help_likes_cnt=5)
+        User.objects.filter(id=self.users[1].id).update(chat_help_likes_cnt=40)
+        ProfileView.objects.create(user=self.users[0], total_points=3, rating=1)
+        Post.objects.create(user=self.users[2], title='Solved', content='...', likes_count=3, is_resolved=True)
+
+    def profile_rows(self):
+        return list(ProfileView.objects.order_by('user_id').values_list('total_points', 'rating'))
+
+    def test_rating_expression_matches_update_rating(self):
+        profile_view = ProfileView.objects.get(user=self.users[0])
+        for points in range(ratings.POINTS_CAP + 1):
+            profile_view.total_points = points
+            profile_view.update_rating()
+            ProfileView.objects.filter(id=profile_view.id).update(
+                rating=ratings.rating_expression(F('total_points'))
+            )
+            self.assertEqual(ProfileView.objects.get(id=profile_view.id).rating, profile_view.rating, points)
+
+    def test_recompute_from_sources(self):
+        ratings.recompute(chunk_size=2)
+        # Баллы ограничены POINTS_CAP; у rated2 нет оценок за помощь
+        self.assertEqual(self.profile_rows(), [(10, 2), (60, 15), (0, 0)])
+
+        ratings.recompute({'chat_help': 2, 'post_likes': 1, 'resolved_posts': 2}, chunk_size=2)
+        self.assertEqual(self.profile_rows(), [(10, 2), (60, 15), (5, 1)])
+        self.assertEqual(leaderboard.rank_of('points', self.users[2].id), (3, 5))
+
+    def test_dry_run_writes_nothing(self):
+        out = StringIO()
+        call_command('recompute_ratings', '--dry-run', stdout=out)
+        self.assertIn('изменится профилей: 2', out.getvalue())
+        self.assertEqual(self.profile_rows(), [(3, 1)])
+
+        call_command('recompute_ratings', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(ratings.diff(), [])
+        self.assertEqual(leaderboard.rank_of('points', self.users[1].id), (1, 60))
+
+    def test_unknown_weight_is_rejected(self):
+        with self.assertRaises(CommandError):
+            call_command('recompute_ratings', '--weight', 'followers=1', stdout=StringIO())
+
+
+class ActivityCounterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='active', email='active@example.com', password='test123')
+        self.fan = User.objects.create_user(username='fan', email='fan@example.com', password='test123')
+        self.client.force_authenticate(user=self.fan)
+
+    def counters(self, user):
+        user.refresh_from_db()
+        return {field: getattr(user, field) for field in activity.FIELDS}
+
+    def test_like_counters_not_writable_through_api(self):
+        self.client.force_authenticate(user=self.author)
+        post = Post.objects.create(user=self.author, title='Вопрос', content='?')
+        course = Course.objects.create(user=self.author, title='Курс', content='d')
+        chat = Chat.objects.create(user1=self.author, user2=self.fan)
+        self.client.patch(reverse('api:posts-detail', args=[post.id]), {'likes_count': 5000}, format='json')
+        self.client.patch(reverse('api:courses-detail', args=[course.id]), {'likes_count': 5000}, format='json')
+        self.client.patch(reverse('api:chats-detail', args=[chat.id]), {'chat_likes_cnt': 5000}, format='json')
+        self.assertEqual(Post.objects.get(id=post.id).likes_count, 0)
+        self.assertEqual(Course.objects.get(id=course.id).likes_count, 0)
+        self.assertEqual(Chat.objects.get(id=chat.id).chat_likes_cnt, 0)
+        self.assertEqual(activity.drift(), {})
+
+    def test_counters_follow_content_and_likes(self):
+        post = Post.objects.create(user=self.author, title='Q', content='?')
+        Comment.objects.create(user=self.fan, post=post, content='A')
+        answer = Comment.objects.create(user=self.author, post=post, content='A2')
+        course = Course.objects.create(user=self.author, title='C', content='d')
+        for target_type, target_id in [('post', post.id), ('comment', answer.id), ('course', course.id)]:
+            self.client.post(reverse('api:api-add_like', args=[target_type, target_id]))
+        self.client.delete(reverse('api:api-remove_like', args=['course', course.id]))
+
+        self.assertEqual(self.counters(self.author), {
+            'total_questions': 1, 'total_answers': 1,
+            'post_likes_cnt': 1, 'comment_likes_cnt': 1, 'course_likes_cnt': 0,
+        })
+        self.assertEqual(self.counters(self.fan)['total_answers'], 1)
+
+        # Удаление поста уносит его лайки и каскадно удалённые комментарии
+        post.delete()
+        self.assertEqual(set(self.counters(self.author).values()), {0})
+        self.assertEqual(self.counters(self.fan)['total_answers'], 0)
+        self.assertEqual(activity.drift(), {})
+
+    def test_admin_saves_keep_concurrent_counter_updates(self):
+        admin_user = User.objects.create_user(username='boss', email='boss@example.com', password='x', role='admin')
+        Admin.objects.create(user=admin_user)
+        self.client.force_authenticate(user=admin_user)
+        User.objects.filter(id=self.author.id).update(active_warnings_cnt=3)
+        # Между чтением строки в представлении и её записью счётчик меняется F()-обновлением
+        stale = User.objects.get(id=self.author.id)
+        User.objects.filter(id=self.author.id).update(post_likes_cnt=F('post_likes_cnt') + 7)
+        with mock.patch('core.api.views.get_object_or_404', return_value=stale):
+            self.client.post(reverse('api:api-block_user', args=[self.author.id]))
+            self.client.post(reverse('api:api-ban_user', args=[self.author.id]))
+        self.author.refresh_from_db()
+        self.assertEqual((self.author.is_blocked, self.author.is_active, self.author.post_likes_cnt), (True, False, 7))
+
+    def test_content_edit_keeps_concurrent_like_increment(self):
+        self.client.force_authenticate(user=self.author)
+        post = Post.objects.create(user=self.author, title='Вопрос', content='?')
+        stale = Post.objects.get(id=post.id)
+        Post.objects.filter(id=post.id).update(likes_count=F('likes_count') + 3)
+        with mock.patch('core.api.views.PostViewSet.get_object', return_value=stale):
+            response = self.client.patch(reverse('api:posts-detail', args=[post.id]),
+                                         {'content': 'уточнение', 'code': 'x = 1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        post.refresh_from_db()
+        self.assertEqual((post.content, post.code, post.likes_count), ('уточнение', 'x = 1', 3))
+
+    def test_add_points_is_atomic_and_capped(self):
+        ProfileView.objects.create(user=self.author, total_points=ratings.POINTS_CAP - 3)
+        stale = ProfileView.objects.get(user=self.author)
+        self.assertEqual(ratings.add_points(self.author.id, 2), ratings.POINTS_CAP - 1)
+        self.assertEqual(ratings.add_points(self.author.id, 2), ratings.POINTS_CAP)
+        stale.refresh_from_db()
+        self.assertEqual((stale.total_points, stale.rating), (ratings.POINTS_CAP, ratings.rating_for(ratings.POINTS_CAP)))
+
+    def test_cached_profile_sees_new_likes_and_comments(self):
+        cache.clear()
+        post = Post.objects.create(user=self.author, title='Вопрос', content='?')
+        self.assertEqual(profiles.get_profile(self.author.id)['user'].post_likes_cnt, 0)
+        self.client.post(reverse('api:api-add_like', args=['post', post.id]))
+        Comment.objects.create(user=self.author, post=post, content='A')
+        user = profiles.get_profile(self.author.id)['user']
+        self.assertEqual((user.post_likes_cnt, user.total_answers), (1, 1))
+
+    def test_profile_edit_cannot_write_counters(self):
+        data = {'post_likes_cnt': 999999, 'total_questions': 50, 'profile_img_url': 'https://example.com/a.png'}
+        response = self.client.put(reverse('api:api-edit_profile'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self.counters(self.fan).values()), {0})
+        self.assertEqual(self.fan.profile_img_url, 'https://example.com/a.png')
+
+    def test_reconcile_fixes_drift(self):
+        Post.objects.create(user=self.author, title='Q', content='?', likes_count=4)
+        User.objects.filter(id=self.author.id).update(total_questions=7, post_likes_cnt=0)
+        User.objects.filter(id=self.fan.id).update(comment_likes_cnt=2)
+
+        out = StringIO()
+        call_command('reconcile_activity_counters', '--dry-run', stdout=out)
+        self.assertIn('пользователей с расхождениями: 2', out.getvalue())
+        self.assertEqual(self.counters(self.author)['total_questions'], 7)
+
+        call_command('reconcile_activity_counters', stdout=StringIO())
+        self.assertEqual(self.counters(self.author)['total_questions'], 1)
+        self.assertEqual(self.counters(self.author)['post_likes_cnt'], 4)
+        self.assertEqual(self.counters(self.fan)['comment_likes_cnt'], 0)
+        self.assertEqual(activity.drift(), {})
+
+
+class ModerationQueueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='reported', email='reported@example.com', password='test123')
+        self.admin_user = User.objects.create_user(
+            username='moderator', email='moderator@example.com', password='test123', role='admin'
+        )
+        Admin.objects.create(user=self.admin_user)
+        self.viral = Post.objects.create(user=self.author, title='Viral', content='x', likes_count=50)
+        self.quiet = Post.objects.create(user=self.author, title='Quiet', content='x')
+        self.reporters = [
+            User.objects.create(username=f'reporter{i}', email=f'reporter{i}@example.com') for i in range(3)
+        ]
+        for reporter in self.reporters:
+            self.report(reporter, self.viral)
+        self.report(self.reporters[0], self.quiet)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def report(self, user, post):
+        return Report.objects.create(reporting_user=user, reporting_target_type='post',
+                                     reporting_target_id=post.id, report_description='spam')
+
+    def test_reports_are_coalesced_and_ordered_by_priority(self):
+        url = reverse('api:moderation-list')
+        first = self.client.get(url, {'page_size': 1}).data
+        self.assertEqual([(i['target_id'], i['reports_count'], i['popularity']) for i in first['results']],
+                         [(self.viral.id, 3, 50)])
+        second = self.client.get(first['next']).data
+        self.assertEqual([(i['target_id'], i['reports_count']) for i in second['results']], [(self.quiet.id, 1)])
+        self.assertIsNone(second['next'])
+
+        detail = self.client.get(reverse('api:moderation-detail', args=[first['results'][0]['id']])).data
+        self.assertEqual(len(detail['recent_reports']), 3)
+
+    def test_waiting_raises_priority(self):
+        now = timezone.now()
+        self.assertGreater(moderation.priority(1, 0, now - timezone.timedelta(hours=2)), moderation.priority(1, 0, now))
+        self.assertGreater(moderation.priority(4, 0, now), moderation.priority(1, 0, now))
+
+    def test_process_closes_all_reports_in_one_update(self):
+        item = ModerationItem.objects.get(target_id=self.viral.id)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('api:moderation-process', args=[item.id]), {'action': 'accept'})
+        self.assertEqual(response.data['reports_closed'], 3)
+        report_updates = [q for q in context.captured_queries if q['sql'].startswith('UPDATE "core_report"')]
+        self.assertEqual(len(report_updates), 1)
+        self.assertEqual(set(Report.objects.filter(item=item).values_list('status', flat=True)), {'resolved'})
+        self.assertEqual(self.client.post(reverse('api:moderation-process', args=[item.id]),
+                                          {'action': 'accept'}).status_code, status.HTTP_409_CONFLICT)
+
+        # Новая жалоба на ту же цель открывает новый элемент
+        self.report(self.reporters[1], self.viral)
+        self.assertEqual(ModerationItem.objects.filter(target_id=self.viral.id, status='pending').get().reports_count, 1)
+
+    def test_processing_last_single_report_closes_item(self):
+        report = Report.objects.get(reporting_target_id=self.quiet.id)
+        self.client.post(reverse('api:api-process_report', args=[report.id]), {'action': 'reject'}, format='json')
+        self.assertEqual(ModerationItem.objects.get(target_id=self.quiet.id).status, 'rejected')
+
+    def test_html_queue_and_access(self):
+        # /admin/ перехватывает django.contrib.admin, поэтому HTML-страницу вызываем напрямую
+        request = RequestFactory().get('/')
+        request.user = self.admin_user
+        response = core_views.admin_report_list(request)
+        self.assertContains(response, 'жалоб 3')
+        self.assertContains(response, 'Обработать', count=2)
+
+        self.client.force_authenticate(user=self.author)
+        self.assertEqual(self.client.get(reverse('api:moderation-list')).status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(AUDIT_AUTOFLUSH=False)
+class BulkModerationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = User.objects.create_user(
+            username='moderator', email='moderator@example.com', password='test123', role='admin'
+        )
+        Admin.objects.create(user=self.admin_user)
+        self.spammers = [
+            User.objects.create(username=f'spammer{i}', email=f'spammer{i}@example.com') for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.admin_user)
+
+    def spam_reports(self, count):
+        post = Post.objects.create(user=self.spammers[0], title='Spam', content='x')
+        return [
+            Report.objects.create(reporting_user=self.spammers[1], reporting_target_type='post',
+                                  reporting_target_id=post.id, report_description='spam').id
+            for _ in range(count)
+        ]
+
+    def process(self, ids, action='accept'):
+        return self.post(reverse('api:api-bulk_process_reports'), {'ids': ids, 'action': action})
+
+    def post(self, url, data):
+        # Журнал пишется после коммита и пачкой — выполняем оба шага сразу
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data, format='json')
+        audit.buffer.flush()
+        return response
+
+    def test_bulk_process_costs_constant_queries(self):
+        counts = []
+        for size in (3, 30):
+            ids = self.spam_reports(size)
+            with CaptureQueriesContext(connection) as context:
+                response = self.process(ids)
+            self.assertEqual({r['result'] for r in response.data['results']}, {'resolved'})
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(AdminAction.objects.filter(action_type='report_processed').count(), 33)
+        self.assertFalse(ModerationItem.objects.filter(status='pending').exists())
+
+    def test_per_id_results(self):
+        ids = self.spam_reports(2)
+        self.process(ids[:1], 'reject')
+        response = self.process([ids[1], ids[0], 999999])
+        self.assertEqual(response.data['results'], [
+            {'id': ids[1], 'result': 'resolved'},
+            {'id': ids[0], 'result': 'already_processed'},
+            {'id': 999999, 'result': 'not_found'},
+        ])
+        self.assertEqual(Report.objects.get(id=ids[0]).status, 'rejected')
+
+    def test_bulk_warn_block_and_ban(self):
+        ids = [user.id for user in self.spammers]
+        for _ in range(3):
+            self.post(reverse('api:api-bulk_create_warnings'), {'ids': ids[:2], 'reason': 'spam wave'})
+        self.assertEqual(UserWarning.objects.filter(user_id=ids[0], is_accepted=True).count(), 3)
+
+        response = self.post(reverse('api:api-bulk_block_users'), {'ids': ids + [999999]})
+        self.assertEqual([r['result'] for r in response.data['results']],
+                         ['blocked', 'blocked', 'not_enough_warnings', 'not_found'])
+        self.assertEqual(list(User.objects.filter(id__in=ids).order_by('id').values_list('is_blocked', flat=True)),
+                         [True, True, False])
+
+        response = self.post(reverse('api:api-bulk_ban_users'), {'ids': ids[2:]})
+        self.assertEqual(response.data['results'], [{'id': ids[2], 'result': 'banned'}])
+        self.assertFalse(User.objects.get(id=ids[2]).is_active)
+        self.assertEqual(AdminAction.objects.filter(action_type='warning_created').count(), 6)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.process('1,2').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.process([1], 'maybe').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.process(list(range(moderation.MAX_BULK_SIZE + 1))).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.spammers[0])
+        self.assertEqual(self.process([1]).status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(AUDIT_AUTOFLUSH=False)
+class AuditLogTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = User.objects.create_user(
+            username='moderator', email='moderator@example.com', password='test123', role='admin'
+        )
+        self.admin = Admin.objects.create(user=self.admin_user)
+        self.target = User.objects.create(username='target', email='target@example.com')
+        self.client.force_authenticate(user=self.admin_user)
+        self.addCleanup(audit.buffer.flush)
+
+    def test_entries_are_buffered_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api:api-ban_user', args=[self.target.id]))
+        self.assertFalse(AdminAction.objects.exists())
+        self.assertEqual(len(audit.buffer), 1)
+
+        self.assertEqual(audit.buffer.flush(), 1)
+        action = AdminAction.objects.get()
+        self.assertEqual((action.action_type, action.target_type, action.target_id), ('user_banned', 'user', self.target.id))
+        with self.assertRaises(ValueError):
+            action.save()
+
+    def test_rolled_back_action_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                audit.log(self.admin_user, 'user_banned', 'user', [self.target.id])
+                transaction.set_rollback(True)
+        self.assertEqual(len(audit.buffer), 0)
+
+    def seed(self):
+        now = timezone.now()
+        other = Admin.objects.create(user=User.objects.create(username='other', email='other@example.com', role='admin'))
+        AdminAction.objects.bulk_create(
+            [AdminAction(admin=self.admin, action_type='user_banned', target_type='user', target_id=i,
+                         created_at=now - timezone.timedelta(days=i)) for i in range(5)]
+            + [AdminAction(admin=other, action_type='user_blocked', target_type='user', target_id=9,
+                           created_at=now - timezone.timedelta(days=100, hours=h)) for h in range(3)]
+        )
+        return other
+
+    def test_filters_pagination_and_export(self):
+        other = self.seed()
+        url = reverse('api:api-audit_log')
+        page = self.client.get(url, {'admin': self.admin.id, 'page_size': 3}).data
+        self.assertEqual([a['target_id'] for a in page['results']], [0, 1, 2])
+        self.assertEqual([a['target_id'] for a in self.client.get(page['next']).data['results']], [3, 4])
+
+        since = (timezone.now() - timezone.timedelta(days=101)).date().isoformat()
+        until = (timezone.now() - timezone.timedelta(days=50)).date().isoformat()
+        recent = self.client.get(url, {'since': since, 'until': until, 'action_type': 'user_blocked'}).data['results']
+        self.assertEqual({a['admin_username'] for a in recent}, {'other'})
+        self.assertEqual(self.client.get(url, {'since': 'yesterday'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('api:api-audit_log_export'), {'admin': other.id})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])['action_type'], 'user_blocked')
+
+    def test_compact_rolls_old_entries_into_daily_counts(self):
+        other = self.seed()
+        call_command('compact_audit_log', '--days', '30', '--dry-run', stdout=StringIO())
+        self.assertEqual(AdminAction.objects.count(), 8)
+
+        call_command('compact_audit_log', '--days', '30', stdout=StringIO())
+        self.assertEqual(AdminAction.objects.count(), 5)
+        self.assertEqual(sum(AdminActionDaily.objects.filter(admin=other).values_list('count', flat=True)), 3)
+
+        AdminAction.objects.create(admin=other, action_type='user_blocked', target_id=9,
+                                   created_at=timezone.now() - timezone.timedelta(days=100))
+        call_command('compact_audit_log', '--days', '30', stdout=StringIO())
+        self.assertEqual(sum(AdminActionDaily.objects.filter(admin=other).values_list('count', flat=True)), 4)
+
+
+@override_settings(AUDIT_AUTOFLUSH=False, WARNING_MUTE_THRESHOLD=3, WARNING_BLOCK_THRESHOLD=5)
+class WarningEscalationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = User.objects.create_user(
+            username='moderator', email='moderator@example.com', password='test123', role='admin'
+        )
+        self.admin = Admin.objects.create(user=self.admin_user)
+        self.user = User.objects.create_user(username='offender', email='offender@example.com', password='test123')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='test123')
+
+    def warn(self, count=1, **fields):
+        fields.setdefault('is_accepted', True)
+        with self.captureOnCommitCallbacks(execute=True):
+            warnings = [
+                UserWarning.objects.create(user=self.user, admin=self.admin, reason='spam', **fields)
+                for _ in range(count)
+            ]
+        audit.buffer.flush()
+        self.user.refresh_from_db()
+        return warnings
+
+    def test_counter_follows_acceptance_and_deletion(self):
+        pending, = self.warn(is_accepted=None)
+        self.assertEqual(self.user.active_warnings_cnt, 0)
+        pending.is_accepted = True
+        pending.save()
+        pending.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_warnings_cnt, 1)
+        pending.delete()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.active_warnings_cnt, 0)
+
+    def test_mute_then_block_at_thresholds(self):
+        self.warn(2)
+        self.assertIsNone(self.user.muted_until)
+        self.warn()
+        self.assertTrue(sanctions.is_muted(self.user))
+        self.assertFalse(self.user.is_blocked)
+        self.warn(2)
+        self.assertTrue(self.user.is_blocked)
+        self.assertEqual(self.user.active_warnings_cnt, 5)
+        automatic = AdminAction.objects.filter(target_id=self.user.id, data__automatic=True)
+        self.assertEqual(sorted(automatic.values_list('action_type', flat=True)),
+                         ['user_blocked', 'user_muted', 'user_muted'])
+
+    def test_bulk_warn_escalates(self):
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                moderation.bulk_warn([self.user.id, self.other.id], self.admin, 'spam wave')
+        self.assertEqual(
+            list(User.objects.filter(id__in=[self.user.id, self.other.id]).values_list('active_warnings_cnt', flat=True).order_by('id')),
+            [3, 3]
+        )
+        self.assertEqual(User.objects.filter(muted_until__gt=timezone.now()).count(), 2)
+
+    def test_muted_user_cannot_write(self):
+        self.client.force_authenticate(user=self.other)
+        chat = self.client.post(reverse('api:chats-list'), {'user2': self.user.id}, format='json').data
+        self.warn(3)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('api:messages-list'), {'chat': chat['id'], 'content': 'hi'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(reverse('api:chats-list'), {'user2': self.admin_user.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Message.objects.exists())
+
+        User.objects.filter(id=self.user.id).update(muted_until=timezone.now() - timezone.timedelta(minutes=1))
+        self.user.refresh_from_db()
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('api:messages-list'), {'chat': chat['id'], 'content': 'hi'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_block_user_reads_counter(self):
+        self.warn(3)
+        self.client.force_authenticate(user=self.admin_user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('api:api-block_user', args=[self.user.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('core_userwarning' in query['sql'] for query in context.captured_queries))
+
+
+class UserDirectoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = User.objects.create_user(
+            username='moderator', email='moderator@example.com', password='test123', role='admin'
+        )
+        now = timezone.now()
+        self.students = [
+            User.objects.create_user(username=f'student{i}', email=f'student{i}@urfu.me', password='test123',
+                                     date_joined=now - timezone.timedelta(days=i))
+            for i in range(12)
+        ]
+        User.objects.filter(id=self.students[1].id).update(is_blocked=True, active_warnings_cnt=3)
+        User.objects.filter(id=self.students[2].id).update(is_active=False)
+        User.objects.filter(id=self.students[3].id).update(active_warnings_cnt=1)
+        self.client.force_authenticate(user=self.admin_user)
+
+    def ids(self, **params):
+        response = self.client.get(reverse('api:api-admin_user_list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user['id'] for user in response.data['results']]
+
+    def test_cursor_walks_all_users_once(self):
+        seen = []
+        url = reverse('api:api-admin_user_list') + '?page_size=5'
+        while url:
+            response = self.client.get(url)
+            seen += [user['id'] for user in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(len(seen), 13)
+        self.assertEqual(len(set(seen)), 13)
+        self.assertEqual(seen[0], self.students[0].id)
+        self.assertEqual(seen[-1], self.students[-1].id)
+
+    def test_filters(self):
+        self.assertEqual(self.ids(blocked='true'), [self.students[1].id])
+        self.assertEqual(self.ids(banned='true'), [self.students[2].id])
+        self.assertEqual(self.ids(min_warnings=1), [self.students[1].id, self.students[3].id])
+        self.assertEqual(self.ids(min_warnings=1, max_warnings=2), [self.students[3].id])
+        self.assertEqual(self.ids(role='admin'), [self.admin_user.id])
+        joined = self.ids(joined_before=self.students[9].date_joined.isoformat().replace('+00:00', 'Z'))
+        self.assertEqual(joined, [student.id for student in self.students[10:]])
+
+    def test_prefix_search(self):
+        self.assertEqual(self.ids(q='student1'), [self.students[1].id, self.students[10].id, self.students[11].id])
+        self.assertEqual(self.ids(q='moderator@'), [self.admin_user.id])
+        self.assertEqual(self.ids(q='tudent'), [])
+
+    def test_bad_params(self):
+        url = reverse('api:api-admin_user_list')
+        for params in ({'blocked': 'maybe'}, {'min_warnings': '-1'}, {'joined_after': 'yesterday'}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.students[0])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_streaming_export(self):
+        url = reverse('api:api-admin_user_export')
+        response = self.client.get(url, {'banned': 'false'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), list(directory.EXPORT_FIELDS))
+        self.assertEqual(len(lines), 13)
+
+        response = self.client.get(url, {'file_format': 'jsonl', 'q': 'student1'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['username'] for row in rows], ['student1', 'student10', 'student11'])
+        self.assertTrue(rows[0]['is_blocked'])
+        self.assertEqual(self.client.get(url, {'file_format': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -30,6 +30,7 @@ urlpatterns = [
     path('chats/<int:chat_id>/', views.chat_detail, name='chat_detail'),
     path('chats/<int:chat_id>/send/', views.send_message, name='send_message'),
     path('like/<str:target_type>/<int:target_id>/', views.add_like, name='add_like'),
+    path('like/<str:target_type>/<int:target_id>/remove/', views.remove_like, name='remove_like'),
     path('bookmarks/', views.bookmark_list, name='bookmark_list'),
     path('bookmarks/add/<int:post_id>/', views.add_bookmark, name='add_bookmark'),
     path('bookmarks/remove/<int:post_id>/', views.remove_bookmark, name='remove_bookmark'),
@@ -37,6 +38,7 @@ urlpatterns = [
     path('report/<str:target_type>/<int:target_id>/', views.create_report, name='create_report'),
     path('admin/reports/', views.admin_report_list, name='admin_report_list'),
     path('admin/reports/<int:report_id>/process/', views.process_report, name='process_report'),
+    path('admin/moderation/<int:item_id>/process/', views.process_moderation_item, name='process_moderation_item'),
     path('admin/warnings/create/<int:user_id>/', views.create_warning, name='create_warning'),
     path('warnings/<int:warning_id>/respond/', views.respond_to_warning, name='respond_to_warning'),
     path('admin/users/<int:user_id>/block/', views.block_user, name='block_user'),
@@ -1,10 +1,10 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.utils import timezone
-from django.db.models import Q
-from .models import User, Post, Comment, Course, Chat, Message, Code, CodeComment, Like, Bookmark, Report, Review, UserWarning, Admin, AdminAction
+from . import audit, chats, likes, moderation, profiles, sanctions, search
+from .models import User, Post, Comment, Course, Chat, Message, Code, CodeComment, Like, Bookmark, Report, ModerationItem, Review, UserWarning, Admin
 from core.api.serializers import PostSerializer, CourseSerializer, ChatSerializer, MessageSerializer, CodeSerializer, CodeCommentSerializer, ReportSerializer, ReviewSerializer, UserWarningSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
@@ -12,7 +12,7 @@ from rest_framework.decorators import permission_classes
 # Главная страница
 def index(request):
     """Главная страница с лентой постов"""
-    posts = Post.objects.all().order_by('-created_at')[:10]  # Первые 10 постов
+    posts = Post.objects.select_related('user').order_by('-created_at')[:10]  # Первые 10 постов
     return render(request, 'core/index.html', {'posts': posts})
 
 # Аутентификация
@@ -52,18 +52,19 @@ def logout_view(request):
 @login_required
 def profile_view(request, user_id):
     """Просмотр профиля пользователя"""
-    user = get_object_or_404(User, id=user_id)
+    profile = profiles.get_profile(user_id)
+    if profile is None:
+        raise Http404('No User matches the given query.')
+    user = profile['user']
     if user.is_blocked and request.user != user:
         return render(request, 'core/profile.html', {'error': 'Profile is blocked'})
     
-    posts = Post.objects.filter(user=user)
-    courses = Course.objects.filter(user=user)
-    reviews = Review.objects.filter(target_user=user)
     return render(request, 'core/profile.html', {
         'profile_user': user,
-        'posts': posts,
-        'courses': courses,
-        'reviews': reviews
+        'rating': profiles.rating_of(user),
+        'posts': profile['recent_posts'],
+        'courses': profile['recent_courses'],
+        'reviews': profile['reviews']
     })
 
 @login_required
@@ -72,7 +73,7 @@ def edit_profile(request):
     if request.method == 'POST':
         user = request.user
         user.profile_img_url = request.POST.get('profile_img_url', user.profile_img_url)
-        user.save()
+        user.save(update_fields=['profile_img_url'])
         return redirect('core:profile', user_id=user.id)
     return render(request, 'core/edit_profile.html')
 
@@ -81,14 +82,14 @@ def post_list(request):
     """Список постов"""
     search_query = request.GET.get('search', '')
     resolved = request.GET.get('resolved', None)
-    posts = Post.objects.all()
+    posts = Post.objects.select_related('user')
     
-    if search_query:
-        posts = posts.filter(Q(title__icontains=search_query) | Q(content__icontains=search_query))
     if resolved is not None:
         posts = posts.filter(is_resolved=(resolved.lower() == 'true'))
-    
-    posts = posts.order_by('-created_at')
+    if search_query:
+        posts = search.search_posts(search_query, posts)
+    else:
+        posts = posts.order_by('-created_at')
     return render(request, 'core/post_list.html', {'posts': posts})
 
 @login_required
@@ -112,8 +113,8 @@ def create_post(request):
 
 def post_detail(request, post_id):
     """Детальный просмотр поста"""
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all().order_by('-created_at')
+    post = get_object_or_404(Post.objects.select_related('user', 'code_blob'), id=post_id)
+    comments = post.comments.select_related('user', 'code_blob').order_by('-created_at')
     return render(request, 'core/post_detail.html', {'post': post, 'comments': comments})
 
 @login_required
@@ -125,7 +126,7 @@ def edit_post(request, post_id):
         post.content = request.POST.get('content', post.content)
         post.image_url = request.POST.get('image_url', post.image_url)
         post.code = request.POST.get('code', post.code)
-        post.save()
+        post.save(update_fields=['title', 'content', 'image_url', 'code_blob'])
         return redirect('core:post_detail', post_id=post.id)
     return render(request, 'core/edit_post.html', {'post': post})
 
@@ -144,7 +145,7 @@ def mark_post_resolved(request, post_id):
     post = get_object_or_404(Post, id=post_id, user=request.user)
     if request.method == 'POST':
         post.is_resolved = True
-        post.save()
+        post.save(update_fields=['is_resolved'])
         return redirect('core:post_detail', post_id=post.id)
     return render(request, 'core/mark_resolved.html', {'post': post})
 
@@ -174,7 +175,7 @@ def edit_comment(request, comment_id):
         comment.content = request.POST.get('content', comment.content)
         comment.code = request.POST.get('code', comment.code)
         comment.image_url = request.POST.get('image_url', comment.image_url)
-        comment.save()
+        comment.save(update_fields=['content', 'code_blob', 'image_url'])
         return redirect('core:post_detail', post_id=comment.post.id)
     return render(request, 'core/edit_comment.html', {'comment': comment})
 
@@ -189,7 +190,7 @@ def delete_comment(request, comment_id):
 # Курсы
 def course_list(request):
     """Список курсов"""
-    courses = Course.objects.all().order_by('-created_at')
+    courses = Course.objects.select_related('user').order_by('-created_at')
     return render(request, 'core/course_list.html', {'courses': courses})
 
 @login_required
@@ -212,7 +213,7 @@ def create_course(request):
 
 def course_detail(request, course_id):
     """Детальный просмотр курса"""
-    course = get_object_or_404(Course, id=course_id)
+    course = get_object_or_404(Course.objects.select_related('user', 'code_blob'), id=course_id)
     return render(request, 'core/course_detail.html', {'course': course})
 
 @login_required
@@ -224,7 +225,7 @@ def edit_course(request, course_id):
         course.content = request.POST.get('content', course.content)
         course.image_url = request.POST.get('image_url', course.image_url)
         course.code = request.POST.get('code', course.code)
-        course.save()
+        course.save(update_fields=['title', 'content', 'image_url', 'code_blob'])
         return redirect('core:course_detail', course_id=course.id)
     return render(request, 'core/edit_course.html', {'course': course})
 
@@ -239,8 +240,7 @@ def delete_course(request, course_id):
 @login_required
 def chat_list(request):
     """Список чатов"""
-    chats = Chat.objects.filter(Q(user1=request.user) | Q(user2=request.user)).order_by('-created_at')
-    return render(request, 'core/chat_list.html', {'chats': chats})
+    return render(request, 'core/chat_list.html', {'chats': chats.inbox(request.user)})
 
 @login_required
 def start_chat(request, user_id):
@@ -248,15 +248,13 @@ def start_chat(request, user_id):
     user2 = get_object_or_404(User, id=user_id)
     if request.user.is_blocked or user2.is_blocked:
         return render(request, 'core/start_chat.html', {'error': 'Blocked users cannot create chats'})
+    if sanctions.is_muted(request.user):
+        return render(request, 'core/start_chat.html', {'error': 'Muted users cannot create chats'})
     
-    existing_chat = Chat.objects.filter(
-        (Q(user1=request.user, user2=user2) | Q(user1=user2, user2=request.user))
-    ).first()
-    
-    if existing_chat:
-        return redirect('core:chat_detail', chat_id=existing_chat.id)
+    if user2 == request.user:
+        return render(request, 'core/start_chat.html', {'error': 'Cannot start a chat with yourself'})
     
-    chat = Chat.objects.create(user1=request.user, user2=user2)
+    chat, _ = chats.get_or_create_chat(request.user, user2)
     return redirect('core:chat_detail', chat_id=chat.id)
 
 @login_required
@@ -266,7 +264,8 @@ def chat_detail(request, chat_id):
     if chat.user1 != request.user and chat.user2 != request.user:
         return HttpResponse("Access denied", status=403)
     
-    messages = chat.messages.all().order_by('created_at')
+    chats.mark_read(chat, request.user)
+    messages = chat.messages.select_related('sender').prefetch_related('code_set__code_blob').order_by('created_at')
     return render(request, 'core/chat_detail.html', {'chat': chat, 'messages': messages})
 
 @login_required
@@ -277,14 +276,14 @@ def send_message(request, chat_id):
         return HttpResponse("Access denied", status=403)
     
     if request.method == 'POST':
+        if not sanctions.can_write(request.user):
+            return HttpResponse("You cannot send messages", status=403)
         content = request.POST.get('content')
         image_url = request.POST.get('image_url', '')
         is_code = request.POST.get('is_code', 'false') == 'true'
-        receiver = chat.user1 if chat.user2 == request.user else chat.user2
-        message = Message.objects.create(
-            chat=chat,
-            sender=request.user,
-            receiver=receiver,
+        message = chats.send_message(
+            chat,
+            request.user,
             content=content,
             image_url=image_url,
             is_code=is_code
@@ -307,39 +306,26 @@ def send_message(request, chat_id):
 @login_required
 def add_like(request, target_type, target_id):
     """Добавление лайка"""
-    valid_types = ['post', 'comment', 'course', 'chat']
-    if target_type not in valid_types:
+    if not likes.is_valid_target(target_type):
         return JsonResponse({'error': 'Invalid target type'}, status=400)
     
-    like, created = Like.objects.get_or_create(
-        user=request.user,
-        target_type=target_type,
-        target_id=target_id
-    )
-    if created:
-        if target_type == 'post':
-            obj = get_object_or_404(Post, id=target_id)
-            obj.likes_count += 1
-            obj.save()
-        elif target_type == 'comment':
-            obj = get_object_or_404(Comment, id=target_id)
-            obj.likes_count += 1
-            obj.save()
-        elif target_type == 'course':
-            obj = get_object_or_404(Course, id=target_id)
-            obj.likes_count += 1
-            obj.save()
-        elif target_type == 'chat':
-            obj = get_object_or_404(Chat, id=target_id)
-            obj.chat_likes_cnt += 1
-            obj.save()
+    likes.add_like(request.user, target_type, target_id)
+    return JsonResponse({'status': 'success'})
+
+@login_required
+def remove_like(request, target_type, target_id):
+    """Снятие лайка"""
+    if not likes.is_valid_target(target_type):
+        return JsonResponse({'error': 'Invalid target type'}, status=400)
+    
+    likes.remove_like(request.user, target_type, target_id)
     return JsonResponse({'status': 'success'})
 
 # Закладки
 @login_required
 def bookmark_list(request):
     """Список закладок"""
-    bookmarks = Bookmark.objects.filter(user=request.user)
+    bookmarks = Bookmark.objects.filter(user=request.user).select_related('post')
     return render(request, 'core/bookmark_list.html', {'bookmarks': bookmarks})
 
 @login_required
@@ -382,13 +368,29 @@ def create_report(request, target_type, target_id):
         return JsonResponse({'status': 'report created'})
     return render(request, 'core/create_report.html', {'target_type': target_type, 'target_id': target_id})
 
+# Сколько элементов очереди модерации показывать на странице
+MODERATION_PAGE_SIZE = 50
+
 @login_required
 def admin_report_list(request):
-    """Список жалоб для администратора"""
+    """Очередь модерации: жалобы, слитые по цели, самые срочные сверху"""
     if request.user.role != 'admin':
         return JsonResponse({'error': 'Access denied'}, status=403)
-    reports = Report.objects.filter(status='pending')
-    return render(request, 'core/admin_report_list.html', {'reports': reports})
+    items = moderation.queue()[:MODERATION_PAGE_SIZE]
+    return render(request, 'core/admin_report_list.html', {'items': items})
+
+@login_required
+def process_moderation_item(request, item_id):
+    """Решение сразу по всем жалобам на цель"""
+    if request.user.role != 'admin':
+        return JsonResponse({'error': 'Access denied'}, status=403)
+
+    item = get_object_or_404(ModerationItem, id=item_id)
+    if request.method == 'POST' and item.status == 'pending':
+        moderation.process(item, request.user, request.POST.get('action') == 'accept')
+        return redirect('core:admin_report_list')
+    reports = item.reports.select_related('reporting_user').order_by('-created_at', '-id')[:20]
+    return render(request, 'core/process_moderation_item.html', {'item': item, 'reports': reports})
 
 @login_required
 def process_report(request, report_id):
@@ -402,16 +404,10 @@ def process_report(request, report_id):
         report.status = 'resolved' if action == 'accept' else 'rejected'
         report.processed_by = request.user
         report.resolved_at = timezone.now()
-        report.save()
+        report.save(update_fields=['status', 'processed_by', 'resolved_at'])
+        moderation.report_processed(report)
         
-        admin = Admin.objects.filter(user=request.user).first()
-        if admin:
-            AdminAction.objects.create(
-                admin=admin,
-                action_type='report_processed',
-                target_id=report.id,
-                details=f"Report {report.id} {report.status} by {request.user.username}"
-            )
+        audit.log(request.user, 'report_processed', 'report', [report.id], {'status': report.status})
         return redirect('core:admin_report_list')
     return render(request, 'core/process_report.html', {'report': report})
 
@@ -431,12 +427,7 @@ def create_warning(request, user_id):
             reason=reason,
             is_accepted=True
         )
-        AdminAction.objects.create(
-            admin=admin,
-            action_type='warning_created',
-            target_id=user.id,
-            details=f"Warning issued to {user.username} by {request.user.username}"
-        )
+        audit.log(admin, 'warning_created', 'user', [user.id], {'warning_id': warning.id})
         return redirect('core:profile', user_id=user.id)
     return render(request, 'core/create_warning.html', {'target_user': user})
 
@@ -472,18 +463,11 @@ def block_user(request, user_id):
         return JsonResponse({'error': 'Access denied'}, status=403)
     
     user = get_object_or_404(User, id=user_id)
-    warnings_count = UserWarning.objects.filter(user=user, is_accepted=True).count()
-    if warnings_count >= 3:
+    warnings_count = user.active_warnings_cnt
+    if warnings_count >= moderation.WARNINGS_TO_BLOCK:
         user.is_blocked = True
-        user.save()
-        admin = Admin.objects.filter(user=request.user).first()
-        if admin:
-            AdminAction.objects.create(
-                admin=admin,
-                action_type='user_blocked',
-                target_id=user.id,
-                details=f"User {user.username} blocked by {request.user.username}"
-            )
+        user.save(update_fields=['is_blocked'])
+        audit.log(request.user, 'user_blocked', 'user', [user.id])
         return redirect('core:profile', user_id=user.id)
     return render(request, 'core/block_user.html', {'target_user': user, 'warnings_count': warnings_count})
 
@@ -495,26 +479,21 @@ def ban_user(request, user_id):
     
     user = get_object_or_404(User, id=user_id)
     user.is_active = False
-    user.save()
-    admin = Admin.objects.filter(user=request.user).first()
-    if admin:
-        AdminAction.objects.create(
-            admin=admin,
-            action_type='user_banned',
-            target_id=user.id,
-            details=f"User {user.username} banned by {request.user.username}"
-        )
+    user.save(update_fields=['is_active'])
+    audit.log(request.user, 'user_banned', 'user', [user.id])
     return redirect('core:profile', user_id=user.id)
 
 # Поиск
 def search_posts(request):
     """Поиск постов"""
     query = request.GET.get('query', '')
-    posts = Post.objects.filter(Q(title__icontains=query) | Q(content__icontains=query))
+    posts = Post.objects.select_related('user')
+    posts = search.search_posts(query, posts) if query else posts.order_by('-created_at')
     return render(request, 'core/post_list.html', {'posts': posts})
 
 def search_courses(request):
     """Поиск курсов"""
     query = request.GET.get('query', '')
-    courses = Course.objects.filter(Q(title__icontains=query) | Q(content__icontains=query))
+    courses = Course.objects.select_related('user')
+    courses = search.search_courses(query, courses) if query else courses.order_by('-created_at')
     return render(request, 'core/course_list.html', {'courses': courses})
\ No newline at end of file
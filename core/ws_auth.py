@@ -0,0 +1,36 @@
+# core/ws_auth.py
+#
+# Аутентификация WebSocket: JWT из ?token=<access> (как в REST API),
+# иначе — сессия Django через стандартный AuthMiddlewareStack.
+
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import User
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return AnonymousUser()
+    return User.objects.filter(id=token['user_id'], is_active=True).first() or AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    async def __call__(self, scope, receive, send):
+        params = parse_qs(scope.get('query_string', b'').decode())
+        if 'token' in params:
+            scope = dict(scope, user=await get_user_for_token(params['token'][0]))
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return JWTAuthMiddleware(AuthMiddlewareStack(inner))
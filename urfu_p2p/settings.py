@@ -10,6 +10,7 @@ DEBUG = True
 ALLOWED_HOSTS = []
 
 INSTALLED_APPS = [
+    "daphne",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -19,6 +20,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
+    'channels',
     "core",
 ]
 
@@ -41,6 +43,30 @@ AUTHENTICATION_BACKENDS = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Отложенная (пакетная) запись лайков, см. core/like_buffer.py
+LIKES_BUFFER_ENABLED = False
+LIKES_BUFFER_FLUSH_MS = 200
+LIKES_BUFFER_MAX_BATCH = 1000
+LIKES_BUFFER_AUTOFLUSH = True
+
+# Журнал действий администраторов (core/audit.py): записи пишутся пачками фоновым потоком
+AUDIT_BUFFER_ENABLED = True
+AUDIT_FLUSH_MS = 500
+AUDIT_MAX_BATCH = 500
+AUDIT_AUTOFLUSH = True
+# Записи старше стольких дней compact_audit_log сворачивает в дневные агрегаты
+AUDIT_RETENTION_DAYS = 90
+
+# Эскалация предупреждений (core/sanctions.py): с WARNING_MUTE_THRESHOLD принятых
+# предупреждений пользователь получает мут на WARNING_MUTE_HOURS часов (каждое
+# следующее предупреждение его продлевает), с WARNING_BLOCK_THRESHOLD — блокировку
+WARNING_MUTE_THRESHOLD = 3
+WARNING_MUTE_HOURS = 24
+WARNING_BLOCK_THRESHOLD = 5
+
+# Максимальное время ожидания long-poll запроса новых сообщений, секунд (core/longpoll.py)
+LONGPOLL_TIMEOUT = 25
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -74,6 +100,54 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "urfu_p2p.wsgi.application"
+ASGI_APPLICATION = "urfu_p2p.asgi.application"
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+# default хранит собранные профили (core/profiles.py): сигналы сбрасывают их при бане,
+# блокировке или правке, поэтому кэш должен быть общим для всех воркеров — Redis при
+# REDIS_URL. Без него кэш в памяти процесса годится только для одного процесса: другие
+# воркеры показывают старый профиль до PROFILE_CACHE_TIMEOUT секунд.
+# Кэш подсвеченного кода (core/highlighting.py) адресуется хэшем кода и не устаревает,
+# поэтому остаётся LRU по MAX_ENTRIES в памяти процесса
+CACHES = {
+    "default": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}
+        if REDIS_URL
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    ),
+    "highlight": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "highlight",
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+}
+
+# Время жизни собранного профиля в кэше, секунд (core/profiles.py)
+PROFILE_CACHE_TIMEOUT = 300
+
+# Баллы за события для пересчёта рейтинга (core/ratings.py, команда recompute_ratings).
+# По умолчанию совпадает с начислением в rate_for_help: +2 за оценку помощи в ЛС
+RATING_WEIGHTS = {
+    "chat_help": 2,
+    "post_likes": 0,
+    "comment_likes": 0,
+    "course_likes": 0,
+    "resolved_posts": 0,
+}
+
+# Channel layer для чатов: Redis в продакшене (REDIS_URL), в памяти процесса — локально и в тестах
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+    }
 
 DATABASES = {
     "default": {